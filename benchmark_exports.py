@@ -0,0 +1,154 @@
+"""
+Écriture des exports Excel : styles par cellule contre styles nommés
+
+Compare, sur des données synthétiques (500 lignes par défaut), deux façons
+d'écrire les mêmes feuilles :
+- l'ancienne : classeur normal, Font / PatternFill / Border / Alignment
+  créés et assignés cellule par cellule ;
+- FeuilleExport (pv.utils.styles_excel) : classeur write-only, un style
+  nommé référencé par ligne.
+
+Deux feuilles sont mesurées : une feuille d'émargement (4 colonnes) et
+l'export détaillé (12 ECUE par défaut, 5 colonnes par ECUE). Pour chacune :
+durée médiane d'écriture et d'enregistrement, pic mémoire (tracemalloc),
+taille du fichier et nombre de styles de cellules du classeur.
+
+Usage : python benchmark_exports.py [--lignes N] [--ecues N] [--repetitions N]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openpyxl
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+from pv.utils.styles_excel import LIGNE_EMARGEMENT, FeuilleExport
+
+
+def donnees(nb_lignes, nb_ecues):
+    aleatoire = random.Random(42)
+    return [
+        (n, f'24M{n:05d}', f'ETUDIANT {n}',
+         [round(aleatoire.uniform(0, 20), 2) for _ in range(nb_ecues * 3)])
+        for n in range(1, nb_lignes + 1)
+    ]
+
+
+def _bordure():
+    return Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+
+def emargement_ancien(lignes, nb_ecues):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for col_idx, entete in enumerate(['N°', 'MATRICULE', 'NOM & PRÉNOMS', 'SIGNATURE'], start=1):
+        cell = ws.cell(row=1, column=col_idx, value=entete)
+        cell.font = Font(bold=True, size=11)
+        cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell.border = _bordure()
+    for row, (numero, matricule, nom, _) in enumerate(lignes, start=2):
+        for col, valeur in enumerate([numero, matricule, nom, ''], start=1):
+            cell = ws.cell(row=row, column=col, value=valeur)
+            cell.alignment = Alignment(horizontal='center' if col < 3 else 'left', vertical='center')
+            cell.border = _bordure()
+        ws.row_dimensions[row].height = 30
+    return wb
+
+
+def emargement_nomme(lignes, nb_ecues):
+    wb = openpyxl.Workbook(write_only=True)
+    feuille = FeuilleExport(wb, 'Émargement', largeurs=[6, 18, 40, 30])
+    feuille.ecrire(['N°', 'MATRICULE', 'NOM & PRÉNOMS', 'SIGNATURE'], 'pv_entete_gris')
+    for numero, matricule, nom, _ in lignes:
+        feuille.ecrire([numero, matricule, nom, None], LIGNE_EMARGEMENT, hauteur=30)
+    return wb
+
+
+def detaille_ancien(lignes, nb_ecues):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    centre = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    for col in range(1, 4 + nb_ecues * 5):
+        cell = ws.cell(row=1, column=col, value=f'C{col}')
+        cell.fill = PatternFill(start_color='0066CC', end_color='0066CC', fill_type='solid')
+        cell.font = Font(bold=True, color='FFFFFF')
+        cell.alignment = centre
+        cell.border = _bordure()
+    for row, (numero, matricule, nom, notes) in enumerate(lignes, start=2):
+        ws.cell(row=row, column=1, value=numero).alignment = centre
+        ws.cell(row=row, column=2, value=matricule).alignment = centre
+        ws.cell(row=row, column=3, value=nom)
+        col = 4
+        for k in range(nb_ecues):
+            for valeur in notes[k * 3:k * 3 + 3] + [6, 'V']:
+                cell = ws.cell(row=row, column=col, value=valeur)
+                cell.alignment = centre
+                col += 1
+    for col in range(4, 4 + nb_ecues * 5):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 8
+    return wb
+
+
+def detaille_nomme(lignes, nb_ecues):
+    wb = openpyxl.Workbook(write_only=True)
+    feuille = FeuilleExport(wb, 'PV Export', largeurs=[5, 15, 35] + [8] * (nb_ecues * 5))
+    feuille.ecrire([f'C{col}' for col in range(1, 4 + nb_ecues * 5)], 'pv_entete_bleu')
+    styles = ('pv_centre', 'pv_centre', None) + ('pv_centre',) * (nb_ecues * 5)
+    for numero, matricule, nom, notes in lignes:
+        valeurs = [numero, matricule, nom]
+        for k in range(nb_ecues):
+            valeurs += notes[k * 3:k * 3 + 3] + [6, 'V']
+        feuille.ecrire(valeurs, styles)
+    return wb
+
+
+def mesurer(construire, lignes, nb_ecues, repetitions):
+    """(durée médiane en ms, pic mémoire en Mo, taille en Ko, styles de cellules)"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        construire(lignes, nb_ecues).save(io.BytesIO())
+        durees.append((time.perf_counter() - debut) * 1000)
+
+    tracemalloc.start()
+    sortie = io.BytesIO()
+    construire(lignes, nb_ecues).save(sortie)
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    nb_styles = len(openpyxl.load_workbook(io.BytesIO(sortie.getvalue()))._cell_styles)
+    return statistics.median(durees), pic / 1e6, len(sortie.getvalue()) / 1e3, nb_styles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lignes', type=int, default=500)
+    parser.add_argument('--ecues', type=int, default=12)
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    lignes = donnees(args.lignes, args.ecues)
+    print(f"{args.lignes} lignes, {args.ecues} ECUE")
+    print("=" * 82)
+    print(f"{'Feuille':<34}{'Durée (ms)':>12}{'Pic (Mo)':>12}{'Taille (Ko)':>13}{'Styles':>10}")
+    print("-" * 82)
+    for libelle, construire in [
+        ("Émargement, styles par cellule", emargement_ancien),
+        ("Émargement, styles nommés", emargement_nomme),
+        ("Export détaillé, styles par cellule", detaille_ancien),
+        ("Export détaillé, styles nommés", detaille_nomme),
+    ]:
+        duree, pic, taille, nb_styles = mesurer(construire, lignes, args.ecues, args.repetitions)
+        print(f"{libelle:<34}{duree:>12.1f}{pic:>12.1f}{taille:>13.1f}{nb_styles:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Filtres ECUE du dashboard et des exports : jointure + DISTINCT contre EXISTS
+
+Crée une base de test (celle des réglages Django), la remplit d'un PV
+synthétique (2 000 étudiants par défaut, voir benchmark_requetes.peupler),
+puis compare pour une et deux conditions ECUE :
+- l'ancienne forme : filter(notes__ecue__code=..., notes__decision=...).distinct(),
+  une jointure par condition ;
+- FiltreEtudiants.queryset : un sous-select EXISTS corrélé par condition.
+
+Pour chaque forme, mesure la durée médiane du COUNT (celui du Paginator) et
+de la page 1 (20 étudiants par numéro), et vérifie que les deux formes
+sélectionnent les mêmes étudiants.
+
+Usage : python benchmark_filtres.py [--etudiants N] [--ecues N] [--repetitions N] [--plans]
+"""
+import argparse
+import sys
+import time
+
+from benchmark_requetes import chronometrer, peupler
+
+from django.db import connection
+
+from pv.models import ECUE, ProcesVerbal
+from pv.utils.filtres import FiltreEtudiants
+
+
+def jointure_distinct(pv, filtre):
+    """Ancienne compilation des conditions ECUE : une jointure par condition, puis DISTINCT"""
+    etudiants = pv.etudiants.all()
+    for code, decision in filtre.conditions_ecue:
+        conditions = {'notes__ecue__code': code}
+        if decision:
+            conditions['notes__decision'] = decision
+        etudiants = etudiants.filter(**conditions)
+    return etudiants.distinct()
+
+
+class Compteur:
+    """Queryset.count() mesurable par chronometrer()"""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def all(self):
+        return [self.queryset.count()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--etudiants', type=int, default=2000)
+    parser.add_argument('--ecues', type=int, default=12)
+    parser.add_argument('--repetitions', type=int, default=20)
+    parser.add_argument('--plans', action='store_true', help="Afficher les plans complets")
+    args = parser.parse_args()
+
+    nom_base = connection.creation.create_test_db(verbosity=0)
+    try:
+        debut = time.perf_counter()
+        peupler(1, args.etudiants, args.ecues)
+        pv = ProcesVerbal.objects.get()
+        codes = list(ECUE.objects.filter(ue__pv=pv).order_by('ordre').values_list('code', flat=True))
+        print(f"Base {connection.vendor} : {args.etudiants} étudiants x {args.ecues} ECUE "
+              f"en {time.perf_counter() - debut:.1f} s")
+
+        cas = [
+            ("NV dans un ECUE", FiltreEtudiants(conditions_ecue=((codes[0], 'NV'),))),
+            ("Notes d'un ECUE", FiltreEtudiants(conditions_ecue=((codes[0], ''),))),
+            ("NV dans deux ECUE", FiltreEtudiants(conditions_ecue=((codes[0], 'NV'), (codes[1], 'NV')))),
+        ]
+
+        print("=" * 92)
+        print(f"{'Filtre':<22}{'Étudiants':>10}{'COUNT join':>14}{'COUNT exists':>14}"
+              f"{'Page join':>14}{'Page exists':>14}")
+        print("-" * 92)
+        ecarts = 0
+        for libelle, filtre in cas:
+            ancien, nouveau = jointure_distinct(pv, filtre), filtre.queryset(pv)
+            identiques = set(ancien.values_list('pk', flat=True)) == set(nouveau.values_list('pk', flat=True))
+            ecarts += not identiques
+            if args.plans:
+                print(f"{libelle} (jointure)\n{ancien.explain()}\n")
+                print(f"{libelle} (exists)\n{nouveau.explain()}\n")
+            print(
+                f"{libelle:<22}{nouveau.count():>10}"
+                f"{chronometrer(Compteur(ancien), args.repetitions):>14.2f}"
+                f"{chronometrer(Compteur(nouveau), args.repetitions):>14.2f}"
+                f"{chronometrer(ancien.order_by('numero')[:20], args.repetitions):>14.2f}"
+                f"{chronometrer(nouveau.order_by('numero')[:20], args.repetitions):>14.2f}"
+                + ("" if identiques else "  RÉSULTATS DIFFÉRENTS")
+            )
+        print("Durées médianes en ms")
+    finally:
+        connection.creation.destroy_test_db(nom_base, verbosity=0)
+
+    sys.exit(1 if ecarts else 0)
+
+
+if __name__ == '__main__':
+    main()
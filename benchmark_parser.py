@@ -0,0 +1,160 @@
+"""
+Benchmark du parser PV sur les fichiers d'exemple du dossier Docs/
+
+Compare, pour chaque fichier :
+- l'ancien schéma de lecture (load_workbook + 2 x pd.read_excel), soit trois
+  décompressions et trois analyses XML du classeur ;
+- PVExcelParser.parse(), qui ouvre le classeur une seule fois ;
+- PVExcelParser.parse(streaming=True), en lecture seule.
+
+Le micro-benchmark --plan mesure le coût d'extraction d'une ligne étudiant
+sur des en-têtes synthétiques de complexité croissante (colonnes annexes
+ajoutées autour des séquences ECUE) : redétection de l'en-tête à chaque ligne
+(ancienne méthode) contre lecture des colonnes du plan, converties par bloc.
+
+Usage : python benchmark_parser.py [--repetitions N] [--plan] [fichiers...]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pv.utils.excel_parser import PVExcelParser
+
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Docs')
+
+
+def chronometrer(fonction, repetitions):
+    """Retourne la durée médiane (en ms) de `repetitions` appels à `fonction`"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return statistics.median(durees)
+
+
+def lecture_ancienne(chemin):
+    """Lectures effectuées par l'ancien parser (sans l'extraction elle-même)"""
+    load_workbook(chemin)
+    pd.read_excel(chemin, header=None, nrows=11)
+    pd.read_excel(chemin, header=10)
+
+
+def benchmark_lecture(fichiers, repetitions):
+    print("=" * 80)
+    print("LECTURE UNIQUE DU CLASSEUR")
+    print("=" * 80)
+    print(f"{'Fichier':<28}{'Étudiants':>10}{'3 lectures':>12}{'parse()':>10}{'streaming':>11}{'Gain':>8}")
+    print(f"{'':<38}{'(ms)':>12}{'(ms)':>10}{'(ms)':>11}")
+    print("-" * 80)
+
+    for chemin in fichiers:
+        nb_etudiants = len(PVExcelParser(chemin).parse()['etudiants'])
+        ancien = chronometrer(lambda: lecture_ancienne(chemin), repetitions)
+        nouveau = chronometrer(lambda: PVExcelParser(chemin).parse(), repetitions)
+        streaming = chronometrer(lambda: PVExcelParser(chemin).parse(streaming=True), repetitions)
+        print(f"{os.path.basename(chemin):<28}{nb_etudiants:>10}{ancien:>12.1f}{nouveau:>10.1f}{streaming:>11.1f}"
+              f"{ancien / streaming:>7.1f}x")
+
+
+def entete_synthetique(nb_ecues, nb_colonnes_annexes):
+    """
+    En-tête de PV avec nb_ecues séquences ECUE (2 par UE, suivies d'une synthèse)
+    et nb_colonnes_annexes colonnes sans rapport (observations, absences...).
+    """
+    entete = ['N°', None, 'MATRICULE', 'NOMS & PRENOMS']
+    entete += [f'OBS {k}' for k in range(nb_colonnes_annexes)]
+    for k in range(nb_ecues):
+        entete += [' ', 'CC', 'EX', 'MOY', None, 'CA', None, 'DECISION']
+        if k % 2 == 1:
+            entete += ['MOY', None, 'CA', None, 'DECISION']
+    entete += ['MOYENNE/20', None, 'CREDITS  ACQUIS', None, 'DECISION']
+    return entete
+
+
+def ligne_synthetique(entete, numero):
+    """Ligne étudiant remplie selon les libellés de l'en-tête"""
+    valeurs = {'CC': 12, 'EX': 9.5, 'MOY': 10.25, 'CA': 3, 'DECISION': 'V'}
+    ligne = [valeurs.get(nom) for nom in entete]
+    ligne[0], ligne[2], ligne[3] = numero, f'MAT{numero:05d}', f'ETUDIANT {numero}'
+    return tuple(ligne)
+
+
+def extraction_par_rescan(parser, colonnes, ligne):
+    """Ancienne extraction : redétection des séquences sur chaque ligne"""
+    notes, syntheses = [], []
+    i = 0
+    while i < len(colonnes):
+        col_str = str(colonnes[i]).upper()
+        if ('CC' == col_str or 'CC.' in col_str) and i + 6 < len(colonnes):
+            next_cols = [str(colonnes[i+j]).upper() for j in range(1, 7)]
+            if 'EX' in next_cols[0] and 'MOY' in next_cols[1] and 'CA' in next_cols[3] and 'DECISION' in next_cols[5]:
+                notes.append((parser._safe_decimal(ligne[i]), parser._safe_decimal(ligne[i+1]),
+                              parser._safe_decimal(ligne[i+2]), parser._safe_int(ligne[i+4]),
+                              parser._extract_decision(ligne[i+6])))
+                i += 7
+                continue
+        if i > 0 and ('MOY' in col_str) and i + 4 < len(colonnes):
+            prev_col = str(colonnes[i-1]).upper()
+            if 'CC' not in prev_col and 'EX' not in prev_col:
+                next_cols = [str(colonnes[i+j]).upper() for j in range(1, 5)]
+                if ('CA' in next_cols[1] or 'UNNAMED' in next_cols[1]) and 'DECISION' in next_cols[3]:
+                    syntheses.append((parser._safe_decimal(ligne[i]), parser._safe_int(ligne[i+2]),
+                                      parser._extract_decision(ligne[i+4])))
+                    i += 5
+                    continue
+        i += 1
+    return notes, syntheses
+
+
+def benchmark_plan(repetitions, nb_lignes=500, nb_ecues=10):
+    print("=" * 80)
+    print(f"PLAN DE COLONNES : coût par ligne ({nb_ecues} ECUE, {nb_lignes} lignes)")
+    print("=" * 80)
+    print(f"{'Colonnes annexes':>17}{'Colonnes':>10}{'Rescan (µs/ligne)':>20}{'Plan (µs/ligne)':>18}")
+    print("-" * 80)
+
+    for nb_annexes in (0, 100, 500, 2000):
+        entete = entete_synthetique(nb_ecues, nb_annexes)
+        lignes = [ligne_synthetique(entete, n) for n in range(1, nb_lignes + 1)]
+
+        parser = PVExcelParser(None)
+        colonnes = parser._noms_colonnes(entete)
+        parser.plan = parser.compiler_plan(colonnes)
+        ecue_codes = [f'ECUE{k}' for k in range(nb_ecues)]
+        ue_codes = [f'UE{k}' for k in range(nb_ecues // 2)]
+
+        rescan = chronometrer(
+            lambda: [extraction_par_rescan(parser, colonnes, ligne) for ligne in lignes], repetitions)
+        plan = chronometrer(
+            lambda: (parser._conversions.clear(), parser.extract_student_block(lignes, 0, ecue_codes, ue_codes)),
+            repetitions)
+        print(f"{nb_annexes:>17}{len(colonnes):>10}{rescan * 1000 / nb_lignes:>20.1f}{plan * 1000 / nb_lignes:>18.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('fichiers', nargs='*', help="Fichiers PV (par défaut : Docs/*.xlsx)")
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--plan', action='store_true', help="Micro-benchmark du plan de colonnes")
+    args = parser.parse_args()
+
+    if args.plan:
+        benchmark_plan(args.repetitions)
+        return
+
+    fichiers = args.fichiers or sorted(glob.glob(os.path.join(DOCS_DIR, '*.xlsx')))
+    benchmark_lecture(fichiers, args.repetitions)
+
+
+if __name__ == '__main__':
+    main()
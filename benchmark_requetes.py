@@ -0,0 +1,154 @@
+"""
+Plans d'exécution des requêtes de filtrage du dashboard et des exports
+
+Crée une base de test (celle des réglages Django : SQLite par défaut,
+PostgreSQL si DATABASES pointe vers un serveur PostgreSQL), la remplit d'un
+jeu de PV synthétiques, puis, pour chaque requête des chemins de filtrage :
+- affiche le plan retourné par EXPLAIN et l'index composite utilisé ;
+- mesure la durée médiane de la requête avec les index, puis après leur
+  suppression (les index FK et unique_together restent en place).
+
+Le script échoue (code 1) si un plan n'utilise pas l'index attendu.
+
+Usage : python benchmark_requetes.py [--pvs N] [--etudiants N] [--ecues N] [--repetitions N]
+        DJANGO_SETTINGS_MODULE=... python benchmark_requetes.py   (autre base)
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pv_management.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+
+from pv.models import ProcesVerbal, UE, ECUE, Etudiant, Note
+from pv.utils.filtres import FiltreEtudiants, etudiants_filtres, requete_cles
+
+
+DECISIONS = [code for code, _ in Etudiant.DECISION_CHOICES]
+
+
+def peupler(nb_pvs, nb_etudiants, nb_ecues):
+    """PV synthétiques : nb_ecues ECUE (2 par UE), notes et décisions aléatoires"""
+    aleatoire = random.Random(42)
+    for p in range(nb_pvs):
+        pv = ProcesVerbal.objects.create(
+            filiere=f'FILIERE {p}', niveau=4, semestre='S7', annee_academique='2024-2025'
+        )
+        ues = UE.objects.bulk_create(
+            UE(pv=pv, code=f'UE{p}_{k}', intitule=f'UE {k}', ordre=k) for k in range(nb_ecues // 2)
+        )
+        ecues = ECUE.objects.bulk_create(
+            ECUE(ue=ues[k // 2], code=f'ECUE{p}_{k}', intitule=f'ECUE {k}', ordre=k) for k in range(nb_ecues)
+        )
+        etudiants = Etudiant.objects.bulk_create(
+            Etudiant(
+                pv=pv, numero=n, matricule=f'{p:03d}M{n:05d}', nom_prenom=f'ETUDIANT {n}',
+                moyenne_generale=Decimal(aleatoire.randint(400, 1800)) / 100,
+                decision_generale=aleatoire.choice(DECISIONS),
+            )
+            for n in range(1, nb_etudiants + 1)
+        )
+        Note.objects.bulk_create(
+            (
+                Note(etudiant=etudiant, ecue=ecue, moyenne=Decimal(aleatoire.randint(0, 2000)) / 100,
+                     decision=aleatoire.choice(DECISIONS))
+                for etudiant in etudiants for ecue in ecues
+            ),
+            batch_size=2000
+        )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def requetes():
+    """
+    (libellé, index attendu, queryset) pour un PV et un ECUE du milieu du jeu.
+    Les sélections filtrées sont les requêtes du dashboard et des exports
+    (pv.utils.filtres.requete_cles, mise en cache par cles_etudiants).
+    """
+    pv = ProcesVerbal.objects.order_by('pk')[ProcesVerbal.objects.count() // 2]
+    ecue = ECUE.objects.filter(ue__pv=pv).order_by('ordre').first()
+    return [
+        ("Étudiants du PV par numéro", 'etudiant_pv_numero_idx',
+         etudiants_filtres(pv, FiltreEtudiants()).order_by('numero')),
+        ("Décision générale, par numéro", 'etudiant_pv_decision_idx',
+         requete_cles(pv, FiltreEtudiants(decision='NV'))),
+        ("Moyenne générale entre 10 et 12", 'etudiant_pv_moyenne_idx',
+         requete_cles(pv, FiltreEtudiants(moy_min=Decimal('10'), moy_max=Decimal('12')))),
+        ("Notes NV d'un ECUE (émargement)", 'note_ecue_decision_idx',
+         Note.objects.filter(ecue=ecue, decision='NV').values('etudiant_id')),
+        ("Étudiants NV dans un ECUE (filtre)", 'note_ecue_decision_idx',
+         requete_cles(pv, FiltreEtudiants(conditions_ecue=((ecue.code, 'NV'),)))),
+    ]
+
+
+def chronometrer(queryset, repetitions):
+    """Durée médiane (ms) de l'évaluation du queryset"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        list(queryset.all())
+        durees.append((time.perf_counter() - debut) * 1000)
+    return statistics.median(durees)
+
+
+def index_composites():
+    return [(modele, index) for modele in (Etudiant, Note) for index in modele._meta.indexes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pvs', type=int, default=20)
+    parser.add_argument('--etudiants', type=int, default=300)
+    parser.add_argument('--ecues', type=int, default=12)
+    parser.add_argument('--repetitions', type=int, default=20)
+    parser.add_argument('--plans', action='store_true', help="Afficher les plans complets")
+    args = parser.parse_args()
+
+    nom_base = connection.creation.create_test_db(verbosity=0)
+    try:
+        debut = time.perf_counter()
+        peupler(args.pvs, args.etudiants, args.ecues)
+        print(f"Base {connection.vendor} : {args.pvs} PV x {args.etudiants} étudiants x {args.ecues} ECUE "
+              f"({Note.objects.count()} notes) en {time.perf_counter() - debut:.1f} s")
+        print("=" * 96)
+        print(f"{'Requête':<38}{'Index attendu':<28}{'Utilisé':>8}{'Avec (ms)':>11}{'Sans (ms)':>11}")
+        print("-" * 96)
+
+        mesures = []
+        for libelle, index, queryset in requetes():
+            plan = queryset.explain()
+            mesures.append((libelle, index, queryset, index in plan, chronometrer(queryset, args.repetitions)))
+            if args.plans:
+                print(f"{libelle}\n{plan}\n")
+
+        with connection.schema_editor() as editor:
+            for modele, index in index_composites():
+                editor.remove_index(modele, index)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        echecs = 0
+        for libelle, index, queryset, utilise, avec in mesures:
+            sans = chronometrer(queryset, args.repetitions)
+            echecs += not utilise
+            print(f"{libelle:<38}{index:<28}{'oui' if utilise else 'NON':>8}{avec:>11.2f}{sans:>11.2f}")
+    finally:
+        connection.creation.destroy_test_db(nom_base, verbosity=0)
+
+    sys.exit(1 if echecs else 0)
+
+
+if __name__ == '__main__':
+    main()
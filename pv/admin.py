@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ProcesVerbal, Etudiant, UE, ECUE, Note, SyntheseUE
+from .models import ProcesVerbal, Etudiant, UE, ECUE, Note, SyntheseUE, TacheImport, StatistiquesPV
+from .utils.cache_pv import invalider_caches_pv
 
 # Import Export (optionnel)
 try:
@@ -11,6 +12,36 @@ except ImportError:
     HAS_IMPORT_EXPORT = False
 
 
+class InvalidationPVAdmin:
+    """
+    Invalide les caches du PV (statistiques, sélections, exports...) après un
+    ajout, une modification ou une suppression depuis l'admin. `champ_pv` :
+    chemin du modèle vers son PV.
+    """
+    champ_pv = 'pv'
+
+    def _pvs(self, queryset):
+        return list(ProcesVerbal.objects.filter(pk__in=queryset.values(self.champ_pv)))
+
+    def _invalider(self, pvs):
+        for pv in pvs:
+            invalider_caches_pv(pv)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._invalider(self._pvs(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        pvs = self._pvs(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        self._invalider(pvs)
+
+    def delete_queryset(self, request, queryset):
+        pvs = self._pvs(queryset)
+        super().delete_queryset(request, queryset)
+        self._invalider(pvs)
+
+
 @admin.register(ProcesVerbal)
 class ProcesVerbalAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['id', 'filiere_display', 'niveau', 'semestre', 'annee_academique', 'formation_badge', 'date_import', 'stats_display']
@@ -18,6 +49,10 @@ class ProcesVerbalAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.M
     search_fields = ['filiere', 'annee_academique']
     readonly_fields = ['date_import', 'stats_detail']
 
+    def get_queryset(self, request):
+        # Effectifs par décision en une agrégation pour toute la page
+        return super().get_queryset(request).with_stats()
+
     def filiere_display(self, obj):
         return format_html(
             '<strong style="color: #0066CC;">{}</strong>',
@@ -67,7 +102,7 @@ class ProcesVerbalAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.M
 
 
 @admin.register(UE)
-class UEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
+class UEAdmin(InvalidationPVAdmin, ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['code_display', 'intitule', 'pv', 'ordre', 'nb_ecues']
     list_filter = ['pv']
     search_fields = ['code', 'intitule']
@@ -89,8 +124,9 @@ class UEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin)
 
 
 @admin.register(ECUE)
-class ECUEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
+class ECUEAdmin(InvalidationPVAdmin, ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['code_display', 'intitule_short', 'ue', 'ordre', 'credits_badge']
+    champ_pv = 'ue__pv'
     list_filter = ['ue__pv', 'ue', 'credits']
     search_fields = ['code', 'intitule']
 
@@ -114,7 +150,7 @@ class ECUEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmi
 
 
 @admin.register(Etudiant)
-class EtudiantAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
+class EtudiantAdmin(InvalidationPVAdmin, ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['numero', 'matricule_display', 'nom_prenom', 'moyenne_display', 'credits_acquis', 'decision_badge', 'pv']
     list_filter = ['decision_generale', 'pv']
     search_fields = ['matricule', 'nom_prenom']
@@ -150,8 +186,9 @@ class EtudiantAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.Model
 
 
 @admin.register(Note)
-class NoteAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
+class NoteAdmin(InvalidationPVAdmin, ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['etudiant_display', 'ecue_display', 'cc', 'examen', 'moyenne_display', 'credit_attribue', 'decision_badge']
+    champ_pv = 'etudiant__pv'
     list_filter = ['decision', 'ecue']
     search_fields = ['etudiant__nom_prenom', 'etudiant__matricule', 'ecue__code']
 
@@ -192,8 +229,9 @@ class NoteAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmi
 
 
 @admin.register(SyntheseUE)
-class SyntheseUEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
+class SyntheseUEAdmin(InvalidationPVAdmin, ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.ModelAdmin):
     list_display = ['etudiant_display', 'ue_display', 'moyenne_display', 'credits_attribues', 'decision_badge']
+    champ_pv = 'etudiant__pv'
     list_filter = ['decision', 'ue']
     search_fields = ['etudiant__nom_prenom', 'etudiant__matricule', 'ue__code']
 
@@ -231,3 +269,41 @@ class SyntheseUEAdmin(ImportExportModelAdmin if HAS_IMPORT_EXPORT else admin.Mod
             bg, obj.decision
         )
     decision_badge.short_description = 'Décision'
+
+
+@admin.register(TacheImport)
+class TacheImportAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nom_fichier', 'statut_badge', 'lignes_lues', 'lignes_ecrites', 'nb_pvs', 'date_creation', 'date_fin']
+    list_filter = ['statut', 'date_creation']
+    search_fields = ['nom_fichier']
+    readonly_fields = ['date_creation', 'date_debut', 'date_fin']
+
+    def statut_badge(self, obj):
+        colors = {
+            TacheImport.EN_ATTENTE: '#6c757d',
+            TacheImport.EN_COURS: '#0066CC',
+            TacheImport.TERMINE: '#28a745',
+            TacheImport.ECHEC: '#dc3545',
+        }
+        return format_html(
+            '<span style="background: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
+            colors.get(obj.statut, '#6c757d'), obj.get_statut_display()
+        )
+    statut_badge.short_description = 'Statut'
+
+    def nb_pvs(self, obj):
+        return obj.pvs.count()
+    nb_pvs.short_description = 'PV'
+
+
+@admin.register(StatistiquesPV)
+class StatistiquesPVAdmin(admin.ModelAdmin):
+    list_display = ['pv', 'nombre_etudiants', 'nombre_valides', 'nombre_non_valides', 'nombre_valides_compensation', 'taux_reussite', 'moyenne_moyenne', 'date_calcul']
+    list_select_related = ['pv']
+
+    def has_add_permission(self, request):
+        # Calculées à l'import et au recalcul des résultats
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -31,3 +31,46 @@ class PVUploadForm(forms.ModelForm):
                 raise forms.ValidationError("Le fichier ne doit pas dépasser 10 MB")
 
         return fichier
+
+
+class FichiersMultiplesInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class FichiersMultiplesField(forms.FileField):
+    """Champ fichier acceptant plusieurs fichiers (sélection multiple ou dossier)"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', FichiersMultiplesInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        clean_fichier = super().clean
+        if isinstance(data, (list, tuple)):
+            return [clean_fichier(d, initial) for d in data]
+        return [clean_fichier(data, initial)]
+
+
+class PVLotUploadForm(forms.Form):
+    """
+    Formulaire pour l'upload d'un lot de PV : archive ZIP ou plusieurs fichiers
+    Excel (contenu d'un dossier)
+    """
+    fichiers = FichiersMultiplesField(widget=FichiersMultiplesInput(attrs={
+        'class': 'form-control',
+        'accept': '.xlsx,.xls,.zip',
+    }))
+
+    def clean_fichiers(self):
+        fichiers = self.cleaned_data.get('fichiers') or []
+
+        for fichier in fichiers:
+            if not fichier.name.lower().endswith(('.xlsx', '.xls', '.zip')):
+                raise forms.ValidationError(
+                    f"{fichier.name} : seuls les fichiers Excel (.xlsx, .xls) et les archives ZIP sont acceptés"
+                )
+            # Vérifier la taille (max 50 MB par fichier, une archive regroupe plusieurs PV)
+            if fichier.size > 50 * 1024 * 1024:
+                raise forms.ValidationError(f"{fichier.name} : le fichier ne doit pas dépasser 50 MB")
+
+        return fichiers
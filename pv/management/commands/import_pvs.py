@@ -0,0 +1,62 @@
+"""
+Import d'un lot de PV : python manage.py import_pvs Docs/ [archive.zip ...]
+"""
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pv.utils.lot import fichiers_pv, importer_lot
+
+
+class Command(BaseCommand):
+    help = ("Importe tous les PV d'un ou plusieurs dossiers, archives ZIP ou fichiers : "
+            "parse en parallèle, écriture en base par un seul processus")
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help="Dossiers, archives ZIP ou fichiers .xlsx")
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Nombre de processus de parse (défaut : nombre de CPU)")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as dossier_extraction:
+            chemins = []
+            for source in options['sources']:
+                if not os.path.exists(source):
+                    raise CommandError(f"Introuvable : {source}")
+                try:
+                    chemins += fichiers_pv(source, dossier_extraction)
+                except ValueError as e:
+                    raise CommandError(f"{source} : {e}")
+            if not chemins:
+                raise CommandError("Aucun fichier PV trouvé")
+
+            resultats, duree = importer_lot(chemins, options['processus'])
+
+        self.stdout.write(f"{'Fichier':<32}{'PV':>12}{'Étudiants':>11}{'Lecture':>10}{'Écriture':>10}")
+        self.stdout.write('-' * 75)
+        for resultat in resultats:
+            nom = os.path.basename(resultat['fichier'])
+            if resultat['erreur']:
+                self.stdout.write(self.style.ERROR(f"{nom:<32}ÉCHEC : {resultat['erreur']}"))
+                continue
+            if resultat['doublon']:
+                self.stdout.write(self.style.WARNING(
+                    f"{nom:<32}déjà importé (PV {', '.join(str(pv.pk) for pv in resultat['pvs'])})"
+                ))
+                continue
+            self.stdout.write(
+                f"{nom:<32}{','.join(str(pv.pk) for pv in resultat['pvs']):>12}{resultat['etudiants']:>11}"
+                f"{resultat['lecture'] * 1000:>8.0f}ms{resultat['ecriture'] * 1000:>8.0f}ms"
+            )
+
+        nb_etudiants = sum(resultat['etudiants'] for resultat in resultats)
+        nb_echecs = sum(1 for resultat in resultats if resultat['erreur'])
+        nb_pvs = sum(len(resultat['pvs']) for resultat in resultats if not resultat['doublon'])
+        nb_doublons = sum(1 for resultat in resultats if resultat['doublon'])
+        self.stdout.write('-' * 75)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultats) - nb_echecs - nb_doublons}/{len(resultats)} fichiers importés ({nb_pvs} PV), "
+            f"{nb_doublons} déjà importés, {nb_etudiants} étudiants "
+            f"en {duree:.2f} s ({nb_etudiants / duree:.0f} étudiants/s)"
+        ))
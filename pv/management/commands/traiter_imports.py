@@ -0,0 +1,46 @@
+"""
+Worker des imports de PV en file d'attente (PV_IMPORT_MODE = 'file')
+
+Reprend aussi les imports perdus par un processus web arrêté (PV_IMPORT_MODE
+= 'thread') : tâches restées en attente, ou en cours depuis plus de
+PV_IMPORT_DELAI_REPRISE.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from pv.models import TacheImport
+from pv.utils.taches import executer_import, prochaine_tache, reprendre_taches_bloquees
+
+
+class Command(BaseCommand):
+    help = "Traite les tâches d'import de PV en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traite les tâches en attente puis s'arrête")
+        parser.add_argument('--intervalle', type=float, default=2,
+                            help="Délai (s) entre deux consultations de la file")
+        parser.add_argument('--delai-reprise', type=float, default=None,
+                            help="Durée (s) au-delà de laquelle une tâche en cours est reprise "
+                                 "(défaut : PV_IMPORT_DELAI_REPRISE)")
+
+    def handle(self, *args, **options):
+        while True:
+            reprendre_taches_bloquees(options['delai_reprise'])
+            tache_id = prochaine_tache()
+            if tache_id is None:
+                if options['une_fois']:
+                    return
+                time.sleep(options['intervalle'])
+                continue
+
+            executer_import(tache_id, reservee=True)
+            tache = TacheImport.objects.get(pk=tache_id)
+            if tache.statut == TacheImport.TERMINE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{tache.nom_fichier} : {tache.lignes_ecrites} lignes écrites "
+                    f"(PV {', '.join(str(pk) for pk in tache.pvs.values_list('pk', flat=True))})"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"{tache.nom_fichier} : {tache.erreur}"))
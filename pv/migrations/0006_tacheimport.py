@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0005_alter_procesverbal_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(upload_to='pv/', verbose_name='Fichier PV')),
+                ('nom_fichier', models.CharField(blank=True, max_length=255, verbose_name='Nom du fichier')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('lignes_lues', models.IntegerField(default=0, verbose_name='Lignes lues')),
+                ('lignes_ecrites', models.IntegerField(default=0, verbose_name='Lignes écrites')),
+                ('lignes_a_ecrire', models.IntegerField(default=0, verbose_name='Lignes à écrire')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('pv', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taches_import', to='pv.procesverbal')),
+            ],
+            options={
+                'verbose_name': "Tâche d'import",
+                'verbose_name_plural': "Tâches d'import",
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
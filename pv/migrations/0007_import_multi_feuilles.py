@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0006_tacheimport'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tacheimport',
+            name='pv',
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='nom_feuille',
+            field=models.CharField(blank=True, help_text='Nom de la feuille Excel source (si fichier multi-feuilles)', max_length=100, null=True, verbose_name='Nom de la feuille Excel'),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='pvs',
+            field=models.ManyToManyField(blank=True, help_text='Un PV par feuille du classeur', related_name='taches_import', to='pv.procesverbal', verbose_name='PV importés'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0007_import_multi_feuilles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procesverbal',
+            name='empreinte_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='Empreinte du fichier importé, pour détecter les réimports', max_length=64, verbose_name='Empreinte SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='empreinte_sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte SHA-256'),
+        ),
+    ]
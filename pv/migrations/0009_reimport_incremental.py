@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 21:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0008_empreinte_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procesverbal',
+            name='version_donnees',
+            field=models.PositiveIntegerField(default=1, help_text='Incrémentée à chaque modification des notes du PV (invalide ses caches)', verbose_name='Version des données'),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='pv_cible',
+            field=models.ForeignKey(blank=True, help_text="Réimport d'un PV corrigé : seules les différences sont appliquées", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reimports', to='pv.procesverbal', verbose_name='PV à mettre à jour'),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='resume',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Résumé des modifications'),
+        ),
+    ]
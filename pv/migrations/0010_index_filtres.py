@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0009_reimport_incremental'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['pv', 'numero'], name='etudiant_pv_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['pv', 'decision_generale', 'numero'], name='etudiant_pv_decision_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['pv', 'moyenne_generale'], name='etudiant_pv_moyenne_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['ecue', 'decision', 'etudiant'], name='note_ecue_decision_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pv', '0010_index_filtres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesPV',
+            fields=[
+                ('pv', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistiques', serialize=False, to='pv.procesverbal', verbose_name='Procès-Verbal')),
+                ('version_donnees', models.PositiveIntegerField(default=0, help_text='Version des données du PV au moment du calcul', verbose_name='Version des données')),
+                ('nombre_etudiants', models.PositiveIntegerField(default=0, verbose_name='Étudiants')),
+                ('nombre_valides', models.PositiveIntegerField(default=0, verbose_name='Validés')),
+                ('nombre_non_valides', models.PositiveIntegerField(default=0, verbose_name='Non validés')),
+                ('nombre_valides_compensation', models.PositiveIntegerField(default=0, verbose_name='Validés par compensation')),
+                ('taux_reussite', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Taux de réussite')),
+                ('moyenne_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Moyenne minimale')),
+                ('moyenne_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Moyenne maximale')),
+                ('moyenne_moyenne', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Moyenne de la promotion')),
+                ('repartition', models.JSONField(blank=True, default=list, help_text="Nombre d'étudiants par tranche d'un point de moyenne générale, de [0, 1[ à [19, 20]", verbose_name='Répartition des moyennes')),
+                ('date_calcul', models.DateTimeField(auto_now=True, verbose_name='Date du calcul')),
+            ],
+            options={
+                'verbose_name': 'Statistiques du PV',
+                'verbose_name_plural': 'Statistiques des PV',
+            },
+        ),
+    ]
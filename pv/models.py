@@ -1,6 +1,30 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Sum
+from django.db.models import Case, Count, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Round
+
+
+class ProcesVerbalQuerySet(models.QuerySet):
+
+    def with_stats(self):
+        """
+        Annote chaque PV de ses effectifs par décision et de son taux de
+        réussite, en une seule agrégation conditionnelle (stat_*), lus en
+        priorité par les propriétés nombre_* et taux_reussite
+        """
+        total = Count('etudiants')
+        reussis = Count('etudiants', filter=Q(etudiants__decision_generale__in=['V', 'VC']))
+        return self.annotate(
+            stat_nombre_etudiants=total,
+            stat_nombre_valides=Count('etudiants', filter=Q(etudiants__decision_generale='V')),
+            stat_nombre_non_valides=Count('etudiants', filter=Q(etudiants__decision_generale='NV')),
+            stat_nombre_valides_compensation=Count('etudiants', filter=Q(etudiants__decision_generale='VC')),
+            stat_taux_reussite=Case(
+                When(stat_nombre_etudiants=0, then=Value(0.0)),
+                default=Round(Cast(reussis, FloatField()) * 100 / Cast(total, FloatField()), 2),
+                output_field=FloatField()
+            ),
+        )
 
 
 class ProcesVerbal(models.Model):
@@ -13,38 +37,74 @@ class ProcesVerbal(models.Model):
     semestre = models.CharField(max_length=10, verbose_name="Semestre")
     annee_academique = models.CharField(max_length=20, verbose_name="Année académique")
     formation = models.CharField(max_length=100, verbose_name="Type de formation", blank=True, null=True)
+    nom_feuille = models.CharField(
+        max_length=100,
+        verbose_name="Nom de la feuille Excel",
+        help_text="Nom de la feuille Excel source (si fichier multi-feuilles)",
+        blank=True,
+        null=True
+    )
+    empreinte_sha256 = models.CharField(
+        max_length=64,
+        verbose_name="Empreinte SHA-256",
+        help_text="Empreinte du fichier importé, pour détecter les réimports",
+        blank=True,
+        db_index=True
+    )
+    version_donnees = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Version des données",
+        help_text="Incrémentée à chaque modification des notes du PV (invalide ses caches)"
+    )
     date_import = models.DateTimeField(auto_now_add=True, verbose_name="Date d'import")
 
+    objects = ProcesVerbalQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Procès-Verbal"
         verbose_name_plural = "Procès-Verbaux"
         ordering = ['-date_import']
 
     def __str__(self):
+        if self.nom_feuille:
+            return f"PV {self.filiere} - {self.niveau} - {self.semestre} ({self.annee_academique}) [{self.nom_feuille}]"
         return f"PV {self.filiere} - {self.niveau} - {self.semestre} ({self.annee_academique})"
 
+    def get_statistiques(self):
+        """
+        Statistiques enregistrées du PV (StatistiquesPV), recalculées si elles
+        manquent ou datent d'une version antérieure des données. Charger les PV
+        avec select_related('statistiques') évite une requête par PV.
+        """
+        from .utils.statistiques import statistiques_pv
+        return statistiques_pv(self)
+
+    def _statistique(self, nom):
+        """Valeur annotée par with_stats() si disponible, sinon statistique enregistrée"""
+        valeur = getattr(self, f'stat_{nom}', None)
+        if valeur is None:
+            valeur = getattr(self.get_statistiques(), nom)
+        return valeur
+
     @property
     def nombre_etudiants(self):
-        return self.etudiants.count()
+        return self._statistique('nombre_etudiants')
 
     @property
     def nombre_valides(self):
-        return self.etudiants.filter(decision_generale='V').count()
+        return self._statistique('nombre_valides')
 
     @property
     def nombre_non_valides(self):
-        return self.etudiants.filter(decision_generale='NV').count()
+        return self._statistique('nombre_non_valides')
 
     @property
     def nombre_valides_compensation(self):
-        return self.etudiants.filter(decision_generale='VC').count()
+        return self._statistique('nombre_valides_compensation')
 
     @property
     def taux_reussite(self):
-        total = self.nombre_etudiants
-        if total == 0:
-            return 0
-        return round((self.nombre_valides + self.nombre_valides_compensation) / total * 100, 2)
+        return float(self._statistique('taux_reussite'))
 
 
 class UE(models.Model):
@@ -129,6 +189,12 @@ class Etudiant(models.Model):
         verbose_name_plural = "Étudiants"
         ordering = ['numero']
         unique_together = ['pv', 'matricule']
+        # Chemins de filtrage du dashboard et des exports (toujours restreints à un PV)
+        indexes = [
+            models.Index(fields=['pv', 'numero'], name='etudiant_pv_numero_idx'),
+            models.Index(fields=['pv', 'decision_generale', 'numero'], name='etudiant_pv_decision_idx'),
+            models.Index(fields=['pv', 'moyenne_generale'], name='etudiant_pv_moyenne_idx'),
+        ]
 
     def __str__(self):
         return f"{self.numero} - {self.nom_prenom} ({self.matricule})"
@@ -239,14 +305,16 @@ class Etudiant(models.Model):
         """
         Met à jour la moyenne générale, les crédits acquis et la décision de l'étudiant.
         Utilise les méthodes de calcul automatique.
-        Sauvegarde l'instance après mise à jour.
+        Sauvegarde l'instance après mise à jour et invalide les caches du PV.
         """
         from django.db.models import Sum
+        from .utils.cache_pv import invalider_caches_pv
 
         self.moyenne_generale = self.calculer_moyenne_generale()
         self.credits_acquis = self.calculer_credits_acquis()
         self.decision_generale = self.determiner_decision()
         self.save()
+        invalider_caches_pv(self.pv)
 
 
 class Note(models.Model):
@@ -303,6 +371,10 @@ class Note(models.Model):
         verbose_name_plural = "Notes"
         ordering = ['ecue__ordre']
         unique_together = ['etudiant', 'ecue']
+        # Étudiants ayant une décision donnée dans un ECUE (filtre ECUE, émargements)
+        indexes = [
+            models.Index(fields=['ecue', 'decision', 'etudiant'], name='note_ecue_decision_idx'),
+        ]
 
     def __str__(self):
         return f"{self.etudiant.nom_prenom} - {self.ecue.code}: {self.moyenne}/20"
@@ -365,3 +437,105 @@ class SyntheseUE(models.Model):
             'NV': 'bg-danger',
             'VC': 'bg-warning text-dark',
         }.get(self.decision, 'bg-secondary')
+
+
+class TacheImport(models.Model):
+    """
+    Import d'un fichier PV exécuté en arrière-plan (voir pv.utils.taches)
+    """
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    ECHEC = 'echec'
+    STATUT_CHOICES = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINE, 'Terminé'),
+        (ECHEC, 'Échec'),
+    ]
+
+    fichier = models.FileField(upload_to='pv/', verbose_name="Fichier PV")
+    nom_fichier = models.CharField(max_length=255, verbose_name="Nom du fichier", blank=True)
+    empreinte_sha256 = models.CharField(max_length=64, verbose_name="Empreinte SHA-256", blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=EN_ATTENTE, verbose_name="Statut")
+    lignes_lues = models.IntegerField(default=0, verbose_name="Lignes lues")
+    lignes_ecrites = models.IntegerField(default=0, verbose_name="Lignes écrites")
+    lignes_a_ecrire = models.IntegerField(default=0, verbose_name="Lignes à écrire")
+    erreur = models.TextField(blank=True, verbose_name="Erreur")
+    pv_cible = models.ForeignKey(
+        ProcesVerbal,
+        on_delete=models.CASCADE,
+        related_name='reimports',
+        null=True,
+        blank=True,
+        verbose_name="PV à mettre à jour",
+        help_text="Réimport d'un PV corrigé : seules les différences sont appliquées"
+    )
+    resume = models.JSONField(default=dict, blank=True, verbose_name="Résumé des modifications")
+    pvs = models.ManyToManyField(
+        ProcesVerbal,
+        related_name='taches_import',
+        blank=True,
+        verbose_name="PV importés",
+        help_text="Un PV par feuille du classeur"
+    )
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    date_debut = models.DateTimeField(null=True, blank=True, verbose_name="Début")
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+
+    class Meta:
+        verbose_name = "Tâche d'import"
+        verbose_name_plural = "Tâches d'import"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"Import {self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def est_finie(self):
+        return self.statut in (self.TERMINE, self.ECHEC)
+
+
+class StatistiquesPV(models.Model):
+    """
+    Statistiques d'un PV (effectifs par décision, taux de réussite, répartition
+    des moyennes générales), enregistrées à l'import et au recalcul des
+    résultats (voir pv.utils.statistiques)
+    """
+    pv = models.OneToOneField(
+        ProcesVerbal,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='statistiques',
+        verbose_name="Procès-Verbal"
+    )
+    version_donnees = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Version des données",
+        help_text="Version des données du PV au moment du calcul"
+    )
+    nombre_etudiants = models.PositiveIntegerField(default=0, verbose_name="Étudiants")
+    nombre_valides = models.PositiveIntegerField(default=0, verbose_name="Validés")
+    nombre_non_valides = models.PositiveIntegerField(default=0, verbose_name="Non validés")
+    nombre_valides_compensation = models.PositiveIntegerField(default=0, verbose_name="Validés par compensation")
+    taux_reussite = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="Taux de réussite")
+    moyenne_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
+                                      verbose_name="Moyenne minimale")
+    moyenne_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
+                                      verbose_name="Moyenne maximale")
+    moyenne_moyenne = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
+                                          verbose_name="Moyenne de la promotion")
+    repartition = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Répartition des moyennes",
+        help_text="Nombre d'étudiants par tranche d'un point de moyenne générale, de [0, 1[ à [19, 20]"
+    )
+    date_calcul = models.DateTimeField(auto_now=True, verbose_name="Date du calcul")
+
+    class Meta:
+        verbose_name = "Statistiques du PV"
+        verbose_name_plural = "Statistiques des PV"
+
+    def __str__(self):
+        return f"Statistiques {self.pv}"
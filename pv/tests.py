@@ -1,3 +1,1247 @@
-from django.test import TestCase
+import gc
+import hashlib
+import math
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.template.defaultfilters import floatformat
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+
+from .models import ProcesVerbal, Etudiant, UE, ECUE, Note, SyntheseUE, TacheImport, StatistiquesPV
+from .utils import filtres
+from .utils.cache_exports import fichier_export, nettoyer_cache_exports, supprimer_exports_perimes
+from .utils.cache_pv import invalider_caches_pv
+from .utils.excel_parser import PVExcelParser
+from .utils.emargement import ParametresEmargement, notes_par_ecue
+from .utils.filtres import FiltreEtudiants, ids_etudiants
+from .utils.pagination import PaginateurEtudiants, taille_page
+from .utils.styles_excel import LIGNE_EMARGEMENT, FeuilleExport
+from .utils.tableau import ColonnesTableau, lignes_tableau, prefetch_tableau
+from .utils.importer import PVImporter
+from .utils.lot import extraire_zip
+from .utils.taches import _Battements, _suivi, prendre_tache
+from .utils.reimport import texte_resume
+from .utils.resultats import mettre_a_jour_resultats_pv
+
+
+DOCS_DIR = Path(settings.BASE_DIR) / 'Docs'
+
+# Fichiers écrits par les tests (uploads, cache de parse, exports en cache,
+# progression des imports) : dossiers temporaires pour tout le module, jamais
+# le MEDIA_ROOT ni les caches du projet
+_dossiers_tests = override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+    CACHES=dict(settings.CACHES, imports=dict(settings.CACHES['imports'], LOCATION=tempfile.mkdtemp())),
+)
+
+
+def setUpModule():
+    _dossiers_tests.enable()
+
+
+def tearDownModule():
+    _dossiers_tests.disable()
+    shutil.rmtree(_dossiers_tests.options['MEDIA_ROOT'], ignore_errors=True)
+    shutil.rmtree(_dossiers_tests.options['PV_PARSE_CACHE_DIR'], ignore_errors=True)
+    shutil.rmtree(_dossiers_tests.options['CACHES']['imports']['LOCATION'], ignore_errors=True)
+
+
+class PVExcelParserTests(SimpleTestCase):
+    """Parser PV sur les fichiers d'exemple du dossier Docs/"""
+
+    # fichier: (nb UE, nb ECUE + synthèses, nb étudiants, nb notes)
+    ATTENDU = {
+        'PV_GL04_SEM7_ALT.xlsx': (5, 16, 35, 385),
+        'PV_GL04_SEM7_FI1.xlsx': (5, 16, 172, 1892),
+        'PV_GLO5.xlsx': (4, 13, 120, 1080),
+        'PV_GRT4_SEM7_ALT.xlsx': (5, 16, 22, 242),
+        'PV_GRT4_SEM7_FI1.xlsx': (5, 16, 80, 880),
+        'PV_GRT5_SEM9_FI1.xlsx': (5, 15, 42, 420),
+    }
+
+    def test_structure_et_etudiants(self):
+        for fichier, (nb_ues, nb_ecues, nb_etudiants, nb_notes) in self.ATTENDU.items():
+            with self.subTest(fichier=fichier):
+                data = PVExcelParser(DOCS_DIR / fichier).parse()
+                self.assertEqual(len(data['ues']), nb_ues)
+                self.assertEqual(len(data['ecues']), nb_ecues)
+                self.assertEqual(len(data['etudiants']), nb_etudiants)
+                self.assertEqual(sum(len(e['notes']) for e in data['etudiants']), nb_notes)
+
+    def test_premier_etudiant(self):
+        data = PVExcelParser(DOCS_DIR / 'PV_GRT5_SEM9_FI1.xlsx').parse()
+        self.assertEqual(data['metadata']['semestre'], 'S9')
+        self.assertEqual(data['metadata']['annee_academique'], '2022/2023')
+
+        etudiant = data['etudiants'][0]
+        self.assertEqual(etudiant['numero'], 1)
+        self.assertEqual(etudiant['matricule'], '21G00038')
+        self.assertEqual(etudiant['notes'][0], {
+            'cc': Decimal('11'),
+            'examen': Decimal('14'),
+            'moyenne': Decimal('13.1'),
+            'credit_attribue': 2,
+            'decision': 'V',
+            'ecue_code': 'EPDGIT5111',
+        })
+        self.assertEqual(etudiant['syntheses_ue'][0], {
+            'moyenne_ue': Decimal('11.55'),
+            'credits_attribues': 4,
+            'decision': 'V',
+            'ue_code': 'EPDGIT511',
+        })
+
+    def test_plan_colonnes(self):
+        parser = PVExcelParser(DOCS_DIR / 'PV_GRT5_SEM9_FI1.xlsx')
+        parser.parse(streaming=True)
+        plan = parser.plan
+
+        self.assertEqual((plan.numero, plan.matricule, plan.nom_prenom), (0, 2, 3))
+        self.assertEqual((plan.moyenne_generale, plan.credits_acquis), (130, 132))
+        self.assertEqual(len(plan.ecues), 12)
+        self.assertEqual(len(plan.syntheses), 6)
+        self.assertEqual(tuple(plan.ecues[0]), (5, 6, 7, 9, 11))
+        self.assertEqual(tuple(plan.syntheses[0]), (20, 22, 24))
+        with self.assertRaises(AttributeError):
+            plan.ecues[0].cc = 0
+
+    def test_extraction_par_blocs(self):
+        """Le découpage en blocs de lignes ne change pas le résultat"""
+        chemin = DOCS_DIR / 'PV_GL04_SEM7_FI1.xlsx'
+        reference = PVExcelParser(chemin).parse(streaming=True)
+
+        parser = PVExcelParser(chemin)
+        parser.TAILLE_BLOC = 7
+        self.assertEqual(parser.parse(streaming=True), reference)
+
+    def test_classeur_multi_feuilles(self):
+        feuilles = PVExcelParser(DOCS_DIR / 'MAPRO_GIT5_SN_SEM1.xlsx').parse_classeur()
+
+        self.assertEqual(
+            [(nom, len(data['ues']), len(data['etudiants'])) for nom, data in feuilles],
+            [('PV_M2PDGL2_02_FEV_14', 5, 30), ('PV_M2PDGRT2_02_FEV_14', 5, 13),
+             ('PV_M2PDCC2_02_FEV_14', 5, 41), ('PV_M2PDSSI2_02_FEV_14', 5, 15)]
+        )
+        self.assertEqual(feuilles[1][1]['metadata']['filiere'], 'Génie Réseaux et Télécommunication')
+        # Feuille active : même résultat que parse()
+        self.assertEqual(
+            feuilles[3][1],
+            PVExcelParser(DOCS_DIR / 'MAPRO_GIT5_SN_SEM1.xlsx').parse(streaming=True)
+        )
+
+    def test_classeur_une_feuille(self):
+        chemin = DOCS_DIR / 'PV_GRT4_SEM7_ALT.xlsx'
+        feuilles = PVExcelParser(chemin).parse_classeur()
+        self.assertEqual(len(feuilles), 1)
+        self.assertEqual(feuilles[0][1], PVExcelParser(chemin).parse(streaming=True))
+
+
+def generer_pv_agrandi(modele, nb_etudiants):
+    """
+    Crée un PV de nb_etudiants lignes en répétant les étudiants du fichier
+    modèle (matricules et noms rendus uniques). Retourne le chemin du fichier.
+    """
+    wb_modele = load_workbook(modele, read_only=True, data_only=True)
+    lignes = list(wb_modele.active.iter_rows(values_only=True))
+    wb_modele.close()
+    entete = lignes[:11]
+    etudiants = [ligne for ligne in lignes[11:] if ligne[2]]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for ligne in entete:
+        ws.append(ligne)
+    for k in range(nb_etudiants):
+        ligne = list(etudiants[k % len(etudiants)])
+        ligne[0] = k + 1
+        ligne[2] = f"{ligne[2]}-{k}"
+        ligne[3] = f"{ligne[3]} {k}"
+        ws.append(ligne)
+
+    fd, chemin = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    wb.save(chemin)
+    return chemin
+
+
+@tag('lent')
+class PVExcelParserStreamingTests(SimpleTestCase):
+    """Mode streaming (lecture seule) sur des PV agrandis"""
+
+    MODELE = DOCS_DIR / 'PV_GRT5_SEM9_FI1.xlsx'
+
+    def _memoire_transitoire(self, chemin):
+        """
+        Mémoire allouée pendant parse(streaming=True) au-delà du résultat
+        retourné (pic - mémoire encore occupée une fois le classeur libéré).
+        """
+        gc.collect()
+        tracemalloc.start()
+        try:
+            data = PVExcelParser(chemin).parse(streaming=True)
+            gc.collect()
+            courant, pic = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return data, pic - courant
+
+    def test_resultat_identique(self):
+        chemin = generer_pv_agrandi(self.MODELE, 150)
+        try:
+            self.assertEqual(
+                PVExcelParser(chemin).parse(streaming=True),
+                PVExcelParser(chemin).parse(streaming=False),
+            )
+        finally:
+            os.remove(chemin)
+
+    def test_memoire_stable(self):
+        tailles = (200, 2000)
+        mesures = []
+        for nb_etudiants in tailles:
+            chemin = generer_pv_agrandi(self.MODELE, nb_etudiants)
+            try:
+                data, transitoire = self._memoire_transitoire(chemin)
+            finally:
+                os.remove(chemin)
+            self.assertEqual(len(data['etudiants']), nb_etudiants)
+            mesures.append(transitoire)
+
+        # Le chargement complet coûte ~40 Ko par ligne de 135 colonnes ; en
+        # streaming seule la table des chaînes partagées grandit (matricules et
+        # noms uniques), soit quelques centaines d'octets par ligne.
+        par_ligne = (mesures[1] - mesures[0]) / (tailles[1] - tailles[0])
+        self.assertLess(par_ligne, 1024)
+
+
+class PVImporterTests(TestCase):
+    """Import en base par insertions groupées"""
+
+    @override_settings(PV_IMPORT_JOURNAL_DUREES=True)
+    def test_import_complet(self):
+        data = PVExcelParser(DOCS_DIR / 'PV_GRT5_SEM9_FI1.xlsx').parse(streaming=True)
+        nb_notes = sum(len(e['notes']) for e in data['etudiants'])
+        nb_syntheses = sum(len(e['syntheses_ue']) for e in data['etudiants'])
+
+        importer = PVImporter(batch_size=100)
+        with CaptureQueriesContext(connection) as requetes, self.assertLogs('pv.utils.importer', 'INFO') as logs:
+            pv = importer.importer(data)
+
+        self.assertEqual(pv.filiere, 'Génie Réseaux Et Télécommunications (GRT)')
+        self.assertEqual(UE.objects.filter(pv=pv).count(), 5)
+        self.assertEqual(ECUE.objects.filter(ue__pv=pv).count(), 10)
+        self.assertEqual(pv.etudiants.count(), 42)
+        self.assertEqual(Note.objects.filter(etudiant__pv=pv).count(), nb_notes)
+        self.assertEqual(SyntheseUE.objects.filter(etudiant__pv=pv).count(), nb_syntheses)
+
+        # Une insertion par lot : PV, UE, ECUE, étudiants, notes, synthèses, statistiques
+        insertions = [q for q in requetes.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(insertions), 5 + math.ceil(nb_notes / 100) + math.ceil(nb_syntheses / 100))
+        self.assertEqual(
+            set(importer.timings),
+            {'pv', 'ues', 'ecues', 'etudiants', 'notes', 'syntheses', 'resultats', 'statistiques'}
+        )
+        self.assertIn('notes', logs.output[0])
+
+    def test_resultats_calcules_si_absents(self):
+        # PV_GLO5 : la décision générale n'est pas lue (colonne hors tableau)
+        data = PVExcelParser(DOCS_DIR / 'PV_GLO5.xlsx').parse(streaming=True)
+        pv = PVImporter().importer(data)
+
+        self.assertFalse(pv.etudiants.filter(decision_generale__isnull=True).exists())
+
+
+class ResultatsPVTests(TestCase):
+    """Calcul des résultats de tout un PV en une passe"""
+
+    def test_identique_au_calcul_par_etudiant(self):
+        data = PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True)
+        pv = PVImporter().importer(data)
+
+        attendu = {}
+        for etudiant in pv.etudiants.all():
+            etudiant.moyenne_generale = etudiant.calculer_moyenne_generale()
+            attendu[etudiant.pk] = (
+                etudiant.moyenne_generale,
+                etudiant.calculer_credits_acquis(),
+                etudiant.determiner_decision(),
+            )
+
+        # Crédits du semestre, étudiants, notes, une mise à jour groupée,
+        # invalidation des caches (incrément et relecture de la version),
+        # puis agrégation et enregistrement des statistiques du PV
+        with self.assertNumQueries(8):
+            mettre_a_jour_resultats_pv(pv)
+
+        obtenu = {
+            pk: (moyenne, credits, decision)
+            for pk, moyenne, credits, decision in pv.etudiants.values_list(
+                'pk', 'moyenne_generale', 'credits_acquis', 'decision_generale')
+        }
+        self.assertEqual(obtenu, attendu)
+
+
+def fichier_docs(nom):
+    with open(DOCS_DIR / nom, 'rb') as f:
+        return SimpleUploadedFile(nom, f.read())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='sync')
+class ImportViewTests(TestCase):
+
+    def test_import_redirige_vers_dashboard(self):
+        response = self.client.post(reverse('pv:import'), {'fichier': fichier_docs('PV_GRT4_SEM7_ALT.xlsx')})
+
+        pv = ProcesVerbal.objects.get()
+        self.assertRedirects(response, reverse('pv:dashboard', args=[pv.pk]), fetch_redirect_response=False)
+        self.assertEqual(pv.etudiants.count(), 22)
+        self.assertIsNone(pv.nom_feuille)
+
+    def test_import_multi_feuilles(self):
+        response = self.client.post(reverse('pv:import'), {'fichier': fichier_docs('MAPRO_GIT5_SN_SEM1.xlsx')})
+
+        self.assertRedirects(response, reverse('pv:home'), fetch_redirect_response=False)
+        tache = TacheImport.objects.get()
+        self.assertEqual(
+            list(tache.pvs.order_by('pk').values_list('nom_feuille', flat=True)),
+            ['PV_M2PDGL2_02_FEV_14', 'PV_M2PDGRT2_02_FEV_14', 'PV_M2PDCC2_02_FEV_14', 'PV_M2PDSSI2_02_FEV_14']
+        )
+        self.assertEqual(Etudiant.objects.count(), 30 + 13 + 41 + 15)
+        self.assertEqual({pv.fichier.name for pv in tache.pvs.all()}, {tache.fichier.name})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='file')
+class TacheImportTests(TestCase):
+    """Imports en file d'attente, traités par la commande traiter_imports"""
+
+    def test_import_en_arriere_plan(self):
+        response = self.client.post(reverse('pv:import'), {'fichier': fichier_docs('PV_GRT4_SEM7_ALT.xlsx')})
+
+        tache = TacheImport.objects.get()
+        self.assertRedirects(response, f"{reverse('pv:import')}?tache={tache.pk}", fetch_redirect_response=False)
+        self.assertEqual(tache.statut, TacheImport.EN_ATTENTE)
+        self.assertFalse(ProcesVerbal.objects.exists())
+        with open(DOCS_DIR / 'PV_GRT4_SEM7_ALT.xlsx', 'rb') as f:
+            self.assertEqual(tache.empreinte_sha256, hashlib.sha256(f.read()).hexdigest())
+
+        call_command('traiter_imports', une_fois=True, stdout=open(os.devnull, 'w'))
+
+        etat = self.client.get(reverse('pv:import_statut', args=[tache.pk])).json()
+        pv = ProcesVerbal.objects.get()
+        self.assertEqual(etat['statut'], TacheImport.TERMINE)
+        self.assertEqual(etat['lignes_lues'], 22)
+        self.assertEqual(etat['lignes_ecrites'], etat['lignes_a_ecrire'])
+        self.assertEqual(etat['lignes_a_ecrire'], pv.etudiants.count() + Note.objects.count() + SyntheseUE.objects.count())
+        self.assertEqual(etat['url_suite'], reverse('pv:dashboard', args=[pv.pk]))
+        self.assertEqual(pv.fichier.name, tache.fichier.name)
+
+    def test_reprise_tache_bloquee(self):
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs('PV_GRT4_SEM7_ALT.xlsx')})
+        tache = TacheImport.objects.get()
+        # Processus arrêté pendant l'import : tâche en cours, jamais terminée
+        TacheImport.objects.filter(pk=tache.pk).update(
+            statut=TacheImport.EN_COURS, date_debut=timezone.now() - timedelta(hours=1), lignes_lues=10
+        )
+
+        call_command('traiter_imports', une_fois=True, delai_reprise=24 * 60 * 60, stdout=open(os.devnull, 'w'))
+        self.assertEqual(TacheImport.objects.get().statut, TacheImport.EN_COURS)
+
+        # Import long, toujours en cours : son processus publie des battements
+        with _Battements([tache.pk]):
+            call_command('traiter_imports', une_fois=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(TacheImport.objects.get().statut, TacheImport.EN_COURS)
+
+        with self.assertLogs('pv.utils.taches', 'WARNING'):
+            call_command('traiter_imports', une_fois=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(TacheImport.objects.get().statut, TacheImport.TERMINE)
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+
+    def test_progression_partagee(self):
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs('PV_GRT4_SEM7_ALT.xlsx')})
+        tache = TacheImport.objects.get()
+        prendre_tache(tache.pk)
+
+        # Écrite par un autre processus, dans sa transaction : lue depuis le cache
+        _, lignes_ecrites = _suivi(tache.pk)
+        lignes_ecrites(120)
+        etat = self.client.get(reverse('pv:import_statut', args=[tache.pk])).json()
+        self.assertEqual(etat['statut'], TacheImport.EN_COURS)
+        self.assertEqual(etat['lignes_ecrites'], 120)
+        # Cache sur disque, partagé avec les autres processus (traiter_imports, workers web)
+        self.assertEqual(caches['imports'].get(f"import:{tache.pk}:lignes_ecrites"), 120)
+
+    def test_echec_enregistre(self):
+        self.client.post(reverse('pv:import'), {'fichier': SimpleUploadedFile('vide.xlsx', b'pas un classeur')})
+
+        with self.assertLogs('pv.utils.taches', 'ERROR'):
+            call_command('traiter_imports', une_fois=True, stdout=open(os.devnull, 'w'))
+
+        etat = self.client.get(reverse('pv:import_statut', args=[TacheImport.objects.get().pk])).json()
+        self.assertEqual(etat['statut'], TacheImport.ECHEC)
+        self.assertTrue(etat['erreur'])
+        self.assertFalse(ProcesVerbal.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='sync')
+class ImportLotTests(TestCase):
+    """Import d'un lot de PV : parse en pool de processus, un seul écrivain"""
+
+    FICHIERS = ['PV_GRT4_SEM7_ALT.xlsx', 'PV_GRT5_SEM9_FI1.xlsx']
+
+    def test_commande_import_pvs(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            for nom in self.FICHIERS:
+                with open(DOCS_DIR / nom, 'rb') as source, open(os.path.join(dossier, nom), 'wb') as copie:
+                    copie.write(source.read())
+            with open(os.path.join(dossier, '~$PV_GRT4_SEM7_ALT.xlsx'), 'wb') as verrou:
+                verrou.write(b'fichier temporaire Excel')
+
+            sortie = io.StringIO()
+            call_command('import_pvs', dossier, processus=2, stdout=sortie)
+
+        self.assertEqual(ProcesVerbal.objects.count(), 2)
+        self.assertEqual(Etudiant.objects.count(), 22 + 42)
+        self.assertIn('2/2 fichiers importés (2 PV), 0 déjà importés, 64 étudiants', sortie.getvalue())
+        self.assertIn('étudiants/s', sortie.getvalue())
+
+    def test_upload_zip(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            for nom in self.FICHIERS:
+                zf.write(DOCS_DIR / nom, f'departement/{nom}')
+            zf.writestr('__MACOSX/departement/._PV_GLO5.xlsx', b'')
+            zf.writestr('departement/lisez-moi.txt', b'')
+
+        response = self.client.post(reverse('pv:import_lot'), {
+            'fichiers': [SimpleUploadedFile('departement.zip', archive.getvalue())]
+        })
+
+        self.assertEqual(response.status_code, 202)
+        taches = response.json()['taches']
+        self.assertEqual([tache['fichier'] for tache in taches], self.FICHIERS)
+        self.assertEqual({tache['statut'] for tache in taches}, {TacheImport.TERMINE})
+        self.assertEqual(ProcesVerbal.objects.count(), 2)
+
+    @override_settings(PV_LOT_TAILLE_FICHIER_MAX=1024)
+    def test_upload_zip_fichier_trop_volumineux(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('PV_bombe.xlsx', b'\0' * 4096)
+
+        response = self.client.post(reverse('pv:import_lot'), {
+            'fichiers': [SimpleUploadedFile('bombe.zip', archive.getvalue())]
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bombe.zip', response.json()['erreurs']['fichiers'][0])
+        self.assertFalse(TacheImport.objects.exists())
+
+    @override_settings(PV_LOT_TAILLE_TOTALE_MAX=6000)
+    def test_extraction_bornee_taille_totale(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('PV_1.xlsx', b'\0' * 4096)
+            zf.writestr('PV_2.xlsx', b'\0' * 4096)
+        with tempfile.TemporaryDirectory() as dossier:
+            with self.assertRaises(ValueError):
+                extraire_zip(io.BytesIO(archive.getvalue()), dossier)
+            self.assertEqual(os.listdir(dossier), [])
+
+    def test_upload_refuse_autres_formats(self):
+        response = self.client.post(reverse('pv:import_lot'), {
+            'fichiers': [SimpleUploadedFile('notes.csv', b'a;b')]
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TacheImport.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='sync')
+class EmpreinteImportTests(TestCase):
+    """Réimport d'un fichier identique : PV existant ou cache de parse"""
+
+    FICHIER = 'PV_GRT4_SEM7_ALT.xlsx'
+
+    def test_reimport_redirige_vers_pv_existant(self):
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+        pv = ProcesVerbal.objects.get()
+        self.assertEqual(len(pv.empreinte_sha256), 64)
+        fichiers_stockes = len(os.listdir(Path(settings.MEDIA_ROOT) / 'pv'))
+
+        with mock.patch('pv.utils.taches.soumettre_import') as soumettre:
+            response = self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+
+        soumettre.assert_not_called()
+        self.assertRedirects(response, reverse('pv:dashboard', args=[pv.pk]), fetch_redirect_response=False)
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+        self.assertEqual(TacheImport.objects.count(), 1)
+        self.assertEqual(len(os.listdir(Path(settings.MEDIA_ROOT) / 'pv')), fichiers_stockes)
+
+    @override_settings(PV_IMPORT_MODE='file')
+    def test_reimport_pendant_import_en_attente(self):
+        premier = self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+        tache = TacheImport.objects.get()
+        fichiers_stockes = len(os.listdir(Path(settings.MEDIA_ROOT) / 'pv'))
+
+        for statut in (TacheImport.EN_ATTENTE, TacheImport.EN_COURS):
+            with self.subTest(statut=statut):
+                TacheImport.objects.filter(pk=tache.pk).update(statut=statut)
+                response = self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+                self.assertRedirects(response, premier.url, fetch_redirect_response=False)
+                self.assertEqual(TacheImport.objects.count(), 1)
+                self.assertEqual(len(os.listdir(Path(settings.MEDIA_ROOT) / 'pv')), fichiers_stockes)
+
+        TacheImport.objects.filter(pk=tache.pk).update(statut=TacheImport.EN_ATTENTE)
+        call_command('traiter_imports', une_fois=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+
+    def test_fichiers_identiques_dans_un_lot(self):
+        response = self.client.post(reverse('pv:import_lot'), {
+            'fichiers': [fichier_docs(self.FICHIER), SimpleUploadedFile('copie.xlsx', fichier_docs(self.FICHIER).read())]
+        })
+
+        self.assertEqual(response.status_code, 202)
+        tache = TacheImport.objects.get()
+        self.assertEqual([t['id'] for t in response.json()['taches']], [tache.pk])
+        doublon, = response.json()['doublons']
+        self.assertEqual(doublon['fichier'], 'copie.xlsx')
+        self.assertEqual(doublon['tache']['id'], tache.pk)
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+
+    def test_cache_de_parse(self):
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+        reference = list(Etudiant.objects.values_list('matricule', 'moyenne_generale', 'decision_generale'))
+        ProcesVerbal.objects.all().delete()
+
+        with mock.patch('pv.utils.taches.PVExcelParser') as parser:
+            self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+
+        parser.assert_not_called()
+        self.assertEqual(
+            list(Etudiant.objects.values_list('matricule', 'moyenne_generale', 'decision_generale')),
+            reference
+        )
+
+
+def fichier_docs_modifie(nom, modifications=None, lignes_supprimees=()):
+    """
+    Copie d'un fichier de Docs avec des cellules modifiées ({'F12': valeur}).
+    Les formules sont remplacées par leurs valeurs : openpyxl ne réécrit pas
+    les valeurs calculées qu'Excel y a enregistrées.
+    """
+    wb = load_workbook(DOCS_DIR / nom, data_only=True)
+    modifications = modifications or {}
+    for cellule, valeur in modifications.items():
+        wb.active[cellule] = valeur
+    for ligne in lignes_supprimees:
+        wb.active.delete_rows(ligne)
+    contenu = io.BytesIO()
+    wb.save(contenu)
+    return SimpleUploadedFile(nom, contenu.getvalue())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='sync')
+class ReimportTests(TestCase):
+    """Réimport incrémental d'un fichier corrigé dans un PV existant"""
+
+    FICHIER = 'PV_GRT4_SEM7_ALT.xlsx'
+
+    def setUp(self):
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+        self.pv = ProcesVerbal.objects.get()
+
+    def test_seule_la_note_corrigee_est_ecrite(self):
+        note = Note.objects.get(etudiant__matricule='24G01854', ecue__code='EPDGIT4151')
+        self.assertEqual(note.cc, Decimal('15'))
+        version = self.pv.version_donnees
+
+        # CC de BABEKI en EPDGIT4151 : 15 -> 16
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.post(
+                reverse('pv:reimport', args=[self.pv.pk]),
+                {'fichier': fichier_docs_modifie(self.FICHIER, {'F12': 16})}
+            )
+
+        self.assertRedirects(response, reverse('pv:dashboard', args=[self.pv.pk]), fetch_redirect_response=False)
+        tache = TacheImport.objects.get(pv_cible=self.pv)
+        self.assertEqual(tache.statut, TacheImport.TERMINE)
+        self.assertEqual(tache.resume['notes'], {'ajoutes': 0, 'modifies': 1, 'supprimes': 0})
+        self.assertEqual(tache.resume['lignes'], 1)
+        self.assertEqual(texte_resume(tache.resume), "1 note modifiée")
+        note.refresh_from_db()
+        self.assertEqual(note.cc, Decimal('16'))
+
+        mises_a_jour = [q['sql'] for q in requetes.captured_queries if q['sql'].startswith('UPDATE "pv_note"')]
+        self.assertEqual(len(mises_a_jour), 1)
+        self.pv.refresh_from_db()
+        self.assertEqual(self.pv.version_donnees, version + 1)
+        self.assertEqual(self.pv.empreinte_sha256, tache.empreinte_sha256)
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+
+    def test_etudiant_retire_du_fichier(self):
+        etudiant = Etudiant.objects.get(matricule='24G01854')
+        nb_notes = etudiant.notes.count()
+        self.client.post(
+            reverse('pv:reimport', args=[self.pv.pk]),
+            {'fichier': fichier_docs_modifie(self.FICHIER, lignes_supprimees=[12])}
+        )
+
+        resume = TacheImport.objects.get(pv_cible=self.pv).resume
+        self.assertEqual(resume['etudiants']['supprimes'], 1)
+        self.assertEqual(resume['notes']['supprimes'], 0)  # supprimées avec l'étudiant
+        self.assertFalse(Etudiant.objects.filter(matricule='24G01854').exists())
+        self.assertEqual(Note.objects.filter(etudiant_id=etudiant.pk).count(), 0)
+        self.assertGreater(nb_notes, 0)
+
+    def test_fichier_identique(self):
+        version = self.pv.version_donnees
+        response = self.client.post(reverse('pv:reimport', args=[self.pv.pk]), {'fichier': fichier_docs(self.FICHIER)})
+
+        self.assertRedirects(response, reverse('pv:dashboard', args=[self.pv.pk]), fetch_redirect_response=False)
+        self.assertFalse(TacheImport.objects.filter(pv_cible=self.pv).exists())
+        self.pv.refresh_from_db()
+        self.assertEqual(self.pv.version_donnees, version)
+
+    def test_structure_differente(self):
+        notes = list(Note.objects.values_list('pk', 'cc', 'examen'))
+        with self.assertLogs('pv.utils.taches', 'ERROR'):
+            self.client.post(reverse('pv:reimport', args=[self.pv.pk]), {'fichier': fichier_docs('PV_GRT5_SEM9_FI1.xlsx')})
+
+        tache = TacheImport.objects.get(pv_cible=self.pv)
+        self.assertEqual(tache.statut, TacheImport.ECHEC)
+        self.assertIn('structure', tache.erreur)
+        self.assertEqual(list(Note.objects.values_list('pk', 'cc', 'examen')), notes)
+
+
+class IndexFiltresTests(TestCase):
+    """Les filtres du dashboard et des émargements passent par les index composites"""
+
+    def test_plans(self):
+        pv = ProcesVerbal.objects.create(filiere='GRT', niveau=4, semestre='S7', annee_academique='2024-2025')
+        ecue = ECUE.objects.create(ue=UE.objects.create(pv=pv, code='UE1', intitule='UE 1', ordre=1),
+                                   code='ECUE1', intitule='ECUE 1', ordre=1)
+        etudiants = Etudiant.objects.filter(pv=pv)
+        plans = {
+            'etudiant_pv_decision_idx': etudiants.filter(decision_generale='ADMIS').order_by('numero'),
+            'etudiant_pv_moyenne_idx': etudiants.filter(moyenne_generale__gte=10, moyenne_generale__lte=12),
+            'note_ecue_decision_idx': Note.objects.filter(ecue=ecue, decision='NV').values('etudiant_id'),
+        }
+        for index, queryset in plans.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+
+class StatistiquesPVTests(TestCase):
+    """Statistiques enregistrées par PV, tenues à jour par l'import et les résultats"""
+
+    def setUp(self):
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GRT4_SEM7_ALT.xlsx').parse(streaming=True))
+
+    def test_calculees_a_l_import(self):
+        statistiques = StatistiquesPV.objects.get(pv=self.pv)
+        etudiants = self.pv.etudiants.all()
+        self.assertEqual(statistiques.nombre_etudiants, etudiants.count())
+        self.assertEqual(statistiques.nombre_valides, etudiants.filter(decision_generale='V').count())
+        self.assertEqual(statistiques.nombre_non_valides, etudiants.filter(decision_generale='NV').count())
+        self.assertEqual(statistiques.nombre_valides_compensation, etudiants.filter(decision_generale='VC').count())
+        self.assertEqual(sum(statistiques.repartition), etudiants.filter(moyenne_generale__isnull=False).count())
+        self.assertEqual(statistiques.moyenne_max, max(e.moyenne_generale for e in etudiants))
+        self.assertEqual(statistiques.version_donnees, self.pv.version_donnees)
+
+    def test_liste_en_une_requete(self):
+        for _ in range(3):
+            PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GRT4_SEM7_ALT.xlsx').parse(streaming=True))
+
+        with self.assertNumQueries(1):
+            lignes = [
+                (pv.nombre_etudiants, pv.nombre_valides, pv.nombre_non_valides,
+                 pv.nombre_valides_compensation, pv.taux_reussite)
+                for pv in ProcesVerbal.objects.select_related('statistiques')
+            ]
+        self.assertEqual(len(set(lignes)), 1)
+
+    def test_recalculees_avec_les_resultats(self):
+        Etudiant.objects.filter(pv=self.pv).update(decision_generale=None, moyenne_generale=None)
+        mettre_a_jour_resultats_pv(self.pv)
+
+        statistiques = StatistiquesPV.objects.get(pv=self.pv)
+        self.assertEqual(statistiques.nombre_etudiants, 22)
+        self.assertEqual(
+            statistiques.nombre_valides + statistiques.nombre_non_valides + statistiques.nombre_valides_compensation,
+            self.pv.etudiants.filter(decision_generale__isnull=False).count()
+        )
+
+    def test_perimees_apres_modification(self):
+        StatistiquesPV.objects.filter(pv=self.pv).delete()
+        pv = ProcesVerbal.objects.get(pk=self.pv.pk)
+        self.assertEqual(pv.nombre_etudiants, 22)  # recalculées à la demande
+        self.assertTrue(StatistiquesPV.objects.filter(pv=pv).exists())
+
+
+class WithStatsTests(TestCase):
+    """ProcesVerbal.objects.with_stats() : effectifs en une agrégation conditionnelle"""
+
+    def setUp(self):
+        for nom in ('PV_GRT4_SEM7_ALT.xlsx', 'PV_GL04_SEM7_ALT.xlsx', 'PV_GLO5.xlsx'):
+            PVImporter().importer(PVExcelParser(DOCS_DIR / nom).parse(streaming=True))
+
+    def test_identique_aux_statistiques_enregistrees(self):
+        with self.assertNumQueries(1):
+            annotes = [
+                (pv.pk, pv.nombre_etudiants, pv.nombre_valides, pv.nombre_non_valides,
+                 pv.nombre_valides_compensation, pv.taux_reussite)
+                for pv in ProcesVerbal.objects.with_stats().order_by('pk')
+            ]
+        enregistres = [
+            (s.pv_id, s.nombre_etudiants, s.nombre_valides, s.nombre_non_valides,
+             s.nombre_valides_compensation, float(s.taux_reussite))
+            for s in StatistiquesPV.objects.order_by('pv_id')
+        ]
+        self.assertEqual(annotes, enregistres)
+
+    def test_liste_admin_en_nombre_de_requetes_constant(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        url = reverse('admin:pv_procesverbal_changelist')
+
+        with CaptureQueriesContext(connection) as trois_pv:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GRT5_SEM9_FI1.xlsx').parse(streaming=True))
+        with CaptureQueriesContext(connection) as quatre_pv:
+            self.client.get(url)
+
+        self.assertEqual(len(quatre_pv), len(trois_pv))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PV_PARSE_CACHE_DIR=tempfile.mkdtemp(),
+                   PV_IMPORT_MODE='sync')
+class StatistiquesECUETests(TestCase):
+    """Statistiques par ECUE et UE, calculées en une passe et mises en cache par PV"""
+
+    FICHIER = 'PV_GRT4_SEM7_ALT.xlsx'
+
+    def setUp(self):
+        cache.clear()
+        self.client.post(reverse('pv:import'), {'fichier': fichier_docs(self.FICHIER)})
+        self.pv = ProcesVerbal.objects.get()
+
+    def test_statistiques_ecue(self):
+        ecue = ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre').first()
+        notes = list(Note.objects.filter(ecue=ecue))
+        moyennes = [float(note.moyenne) for note in notes if note.moyenne is not None]
+
+        statistiques = self.client.get(reverse('pv:stats', args=[self.pv.pk])).json()
+
+        resultat = statistiques['ecues'][0]
+        self.assertEqual(resultat['code'], ecue.code)
+        self.assertEqual(resultat['effectif'], len(notes))
+        self.assertEqual(resultat['decisions']['NV'], sum(note.decision == 'NV' for note in notes))
+        self.assertEqual(resultat['moyenne']['moyenne'], round(statistics.mean(moyennes), 2))
+        self.assertEqual(resultat['moyenne']['mediane'], round(statistics.median(moyennes), 2))
+        self.assertEqual(resultat['moyenne']['ecart_type'], round(statistics.pstdev(moyennes), 2))
+        self.assertEqual(sum(resultat['histogramme']), len(moyennes))
+        self.assertEqual(len(statistiques['ues']), self.pv.ues.count())
+        self.assertEqual(statistiques['ues'][0]['effectif'], self.pv.etudiants.count())
+
+    def test_cache_par_version_des_donnees(self):
+        url = reverse('pv:stats', args=[self.pv.pk])
+        premiere = self.client.get(url).json()
+        with self.assertNumQueries(1):  # le PV seulement
+            self.assertEqual(self.client.get(url).json(), premiere)
+
+        self.client.post(reverse('pv:reimport', args=[self.pv.pk]),
+                         {'fichier': fichier_docs_modifie(self.FICHIER, {'F12': 16})})
+
+        seconde = self.client.get(url).json()
+        self.assertEqual(seconde['version'], premiere['version'] + 1)
+        self.assertNotEqual(seconde['ecues'][0]['cc'], premiere['ecues'][0]['cc'])
+
+
+class DashboardDonneesTests(TestCase):
+    """API JSON de la grille AG Grid : fenêtres de lignes, tris et filtres en base"""
+
+    def setUp(self):
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+        self.url = reverse('pv:dashboard_donnees', args=[self.pv.pk])
+        self.ecue = ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre').first()
+
+    def donnees(self, **params):
+        for cle in ('sortModel', 'filterModel'):
+            if cle in params:
+                params[cle] = json.dumps(params[cle])
+        return self.client.get(self.url, params)
+
+    def test_fenetre(self):
+        with self.assertNumQueries(5):  # PV, étudiants de la fenêtre, leurs notes et synthèses, total
+            reponse = self.donnees(startRow=10, endRow=20).json()
+
+        self.assertEqual(reponse['lastRow'], 35)
+        self.assertEqual([ligne['numero'] for ligne in reponse['rows']], list(range(11, 21)))
+        note = Note.objects.get(etudiant_id=reponse['rows'][0]['id'], ecue=self.ecue)
+        self.assertEqual(reponse['rows'][0][f'ecue_{self.ecue.code}_moy'], float(note.moyenne))
+        self.assertEqual(reponse['rows'][0][f'ecue_{self.ecue.code}_dec'], note.decision)
+
+    def test_tri_sur_une_note(self):
+        colonne = f'ecue_{self.ecue.code}_moy'
+        lignes = self.donnees(startRow=0, endRow=100, sortModel=[{'colId': colonne, 'sort': 'desc'}]).json()['rows']
+
+        moyennes = [ligne[colonne] for ligne in lignes if ligne.get(colonne) is not None]
+        self.assertEqual(moyennes, sorted(moyennes, reverse=True))
+
+    def test_filtres(self):
+        colonne = f'ecue_{self.ecue.code}_dec'
+        reponse = self.donnees(startRow=0, endRow=100, filterModel={
+            colonne: {'filterType': 'text', 'type': 'equals', 'filter': 'NV'},
+            'moyenne_generale': {'filterType': 'number', 'operator': 'AND', 'conditions': [
+                {'type': 'greaterThanOrEqual', 'filter': 0}, {'type': 'lessThan', 'filter': 20},
+            ]},
+        }).json()
+
+        attendus = Note.objects.filter(ecue=self.ecue, decision='NV').count()
+        self.assertEqual(reponse['lastRow'], attendus)
+        self.assertTrue(all(ligne[colonne] == 'NV' for ligne in reponse['rows']))
+
+    def test_colonne_inconnue(self):
+        reponse = self.donnees(sortModel=[{'colId': 'ecue_INCONNU_moy', 'sort': 'asc'}])
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_valeur_invalide(self):
+        for colonne in ('moyenne_generale', 'credits_acquis', f'ecue_{self.ecue.code}_moy'):
+            with self.subTest(colonne=colonne):
+                reponse = self.donnees(filterModel={colonne: {'filterType': 'number', 'type': 'lessThan',
+                                                              'filter': 'abc'}})
+                self.assertEqual(reponse.status_code, 400)
+                self.assertIn('abc', reponse.json()['erreur'])
+
+
+class FiltresEtudiantsTests(TestCase):
+    """Filtres partagés du dashboard, des exports et de l'impression"""
+
+    def setUp(self):
+        filtres._selections.clear()
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+        self.ecue = ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre').first()
+        self.params = {'ecue': self.ecue.code, 'decision_ecue': 'NV', 'moy_min': '0'}
+        self.attendus = list(
+            self.pv.etudiants.filter(notes__ecue=self.ecue, notes__decision='NV', moyenne_generale__gte=0)
+            .order_by('numero').values_list('matricule', flat=True)
+        )
+
+    def test_normalisation_des_parametres(self):
+        filtre = FiltreEtudiants.depuis_get({'search': '  dupont ', 'moy_min': '8.5', 'moy_max': 'abc', 'ue': 'UE1'})
+        self.assertEqual(filtre.search, 'dupont')
+        self.assertEqual(filtre.moy_min, Decimal('8.5'))
+        self.assertIsNone(filtre.moy_max)
+        self.assertTrue(filtre.filtre_etudiants)
+        self.assertFalse(FiltreEtudiants(ue='UE1').filtre_etudiants)
+        self.assertTrue(FiltreEtudiants(moy_min=Decimal('0')).filtre_etudiants)
+
+    def test_moyenne_non_finie_ignoree(self):
+        for valeur in ('nan', 'Infinity', '-inf', 'sNaN'):
+            with self.subTest(valeur=valeur):
+                self.assertIsNone(FiltreEtudiants.depuis_get({'moy_min': valeur}).moy_min)
+                # Données du dashboard (JSON) et export : même filtre que la page du dashboard
+                for vue in ('pv:dashboard_donnees', 'pv:export'):
+                    reponse = self.client.get(reverse(vue, args=[self.pv.pk]), {'moy_min': valeur})
+                    self.assertEqual(reponse.status_code, 200)
+
+    def test_selection_en_cache(self):
+        filtre = FiltreEtudiants.depuis_get(self.params)
+        ids = ids_etudiants(self.pv, filtre)
+        with self.assertNumQueries(0):
+            self.assertEqual(ids_etudiants(self.pv, FiltreEtudiants.depuis_get(self.params)), ids)
+
+        Note.objects.filter(etudiant_id=ids[0], ecue=self.ecue).update(decision='V')
+        mettre_a_jour_resultats_pv(self.pv)
+        self.assertEqual(ids_etudiants(self.pv, filtre), ids[1:])
+
+    def test_export_excel_et_impression(self):
+        reponse = self.client.get(reverse('pv:export', args=[self.pv.pk]), self.params)
+        feuille = load_workbook(io.BytesIO(b''.join(reponse.streaming_content))).active
+        matricules = [ligne[0] for ligne in feuille.iter_rows(min_row=11, min_col=2, max_col=2, values_only=True)
+                      if ligne[0]]
+        self.assertEqual(matricules, self.attendus)
+
+        reponse = self.client.get(reverse('pv:print', args=[self.pv.pk]), self.params)
+        self.assertEqual([etudiant.matricule for etudiant in reponse.context['etudiants']], self.attendus)
+
+    def test_conditions_ecue_combinees_sans_distinct(self):
+        autre = ECUE.objects.filter(ue__pv=self.pv).exclude(pk=self.ecue.pk).order_by('ue__ordre', 'ordre').first()
+        params = QueryDict(mutable=True)
+        params.setlist('ecue', [self.ecue.code, autre.code])
+        params.setlist('decision_ecue', ['NV', 'NV'])
+        filtre = FiltreEtudiants.depuis_get(params)
+        self.assertEqual(filtre.conditions_ecue, ((self.ecue.code, 'NV'), (autre.code, 'NV')))
+
+        sql = str(filtre.queryset(self.pv).query)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertEqual(sql.count('EXISTS'), 2)
+        attendus = set(
+            Note.objects.filter(ecue=self.ecue, decision='NV').values_list('etudiant_id', flat=True)
+        ) & set(Note.objects.filter(ecue=autre, decision='NV').values_list('etudiant_id', flat=True))
+        self.assertTrue(attendus)
+        self.assertEqual(set(ids_etudiants(self.pv, filtre)), attendus)
+
+
+class PaginationEtudiantsTests(TestCase):
+    """Pagination du dashboard sur les clés en cache de la sélection"""
+
+    def setUp(self):
+        filtres._selections.clear()
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+
+    def test_taille_page_bornee(self):
+        self.assertEqual(taille_page('50'), 50)
+        self.assertEqual(taille_page('abc'), 20)
+        self.assertEqual(taille_page(None), 20)
+        self.assertEqual(taille_page('0'), 1)
+        with override_settings(PV_PAGE_TAILLE_MAX=30):
+            self.assertEqual(taille_page('100000'), 30)
+
+    def test_pages_profondes_au_cout_de_la_premiere(self):
+        paginateur = PaginateurEtudiants(self.pv, FiltreEtudiants(), 10)
+        with self.assertNumQueries(1):  # clés de la sélection, une fois
+            self.assertEqual(paginateur.count, 35)
+        self.assertEqual(paginateur.num_pages, 4)
+
+        for numero in (1, 4):
+            with self.assertNumQueries(1):
+                page = list(paginateur.page(numero))
+            attendus = list(self.pv.etudiants.order_by('numero', 'pk')[(numero - 1) * 10:numero * 10])
+            self.assertEqual(page, attendus)
+
+        with self.assertNumQueries(0):  # total en cache pour un nouveau paginateur
+            self.assertEqual(PaginateurEtudiants(self.pv, FiltreEtudiants(), 10).count, 35)
+
+    def test_selection_filtree(self):
+        filtre = FiltreEtudiants(decision='NV')
+        paginateur = PaginateurEtudiants(self.pv, filtre, 5)
+        attendus = list(self.pv.etudiants.filter(decision_generale='NV').order_by('numero', 'pk'))
+        self.assertEqual(paginateur.count, len(attendus))
+        self.assertEqual([e for n in paginateur.page_range for e in paginateur.page(n)], attendus)
+
+
+class TableauDashboardTests(TestCase):
+    """Modèle de colonnes et matrice des cellules du tableau détaillé"""
+
+    def setUp(self):
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+
+    def tableau(self, **filtres_colonnes):
+        with self.assertNumQueries(2):  # UE, ECUE affichées
+            colonnes = ColonnesTableau(self.pv, **filtres_colonnes)
+        with self.assertNumQueries(3):  # étudiants de la page, notes, synthèses
+            lignes = lignes_tableau(prefetch_tableau(self.pv.etudiants.order_by('numero'))[:10], colonnes)
+        return colonnes, lignes
+
+    def test_requetes_constantes(self):
+        UE.objects.filter(pv=self.pv).order_by('-ordre').first().delete()
+        colonnes_reduites, _ = self.tableau()
+        autre_ue = self.pv.ues.order_by('ordre').first()
+        self.pv.ues.create(code='UE_SUP', intitule='UE supplémentaire', ordre=99)
+        ECUE.objects.bulk_create(
+            ECUE(ue=self.pv.ues.get(code='UE_SUP'), code=f'SUP{k}', intitule=f'ECUE {k}', ordre=k) for k in range(4)
+        )
+        colonnes, _ = self.tableau()
+        self.assertEqual(len(colonnes.ues), len(colonnes_reduites.ues) + 1)
+        self.tableau(ue=autre_ue.code)
+
+    def test_colonnes_et_cellules_alignees(self):
+        colonnes, lignes = self.tableau()
+        nb_ecues = ECUE.objects.filter(ue__pv=self.pv).count()
+        self.assertEqual(len(colonnes.ligne_ecue), nb_ecues + len(colonnes.ues))
+        self.assertEqual(len(colonnes.ligne_details), sum(entete['colspan'] for entete in colonnes.ligne_ecue))
+        self.assertEqual(colonnes.total_colonnes, 6 + len(colonnes.ligne_details))
+        self.assertTrue(all(len(ligne['cellules']) == len(colonnes.ligne_details) for ligne in lignes))
+
+        etudiant = lignes[0]['etudiant']
+        ecue = colonnes.ues[0].ecues_affichees[0]
+        note = Note.objects.get(etudiant=etudiant, ecue=ecue)
+        moyenne, decision = lignes[0]['cellules'][3], lignes[0]['cellules'][7]
+        self.assertEqual(moyenne['valeur'], floatformat(note.moyenne, 2))
+        self.assertEqual((decision['valeur'], decision['badge']), (note.decision, note.get_decision_badge_class()))
+
+    def test_valeurs_nulles_masquees(self):
+        etudiant = self.pv.etudiants.order_by('numero').first()
+        ecue = ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre').first()
+        Note.objects.filter(etudiant=etudiant, ecue=ecue).update(cc=0, examen=0, moyenne=0, credit_attribue=0)
+        SyntheseUE.objects.filter(etudiant=etudiant, ue=ecue.ue).update(moyenne_ue=0, credits_attribues=0)
+
+        _, lignes = self.tableau()
+        nb_ecues_ue = ecue.ue.ecues.count()
+        cellules = lignes[0]['cellules']
+        note, synthese = cellules[:8], cellules[8 * nb_ecues_ue:8 * nb_ecues_ue + 7]
+        for cellule in (note[1], note[2], note[3], note[5], synthese[1], synthese[3]):
+            self.assertIsNone(cellule['valeur'])
+            self.assertNotIn('danger', cellule['classe'])
+
+    def test_colonnes_des_ecue_filtrees(self):
+        ecues = list(ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre')[:2])
+        colonnes, lignes = self.tableau(codes_ecue=[ecue.code for ecue in ecues])
+        self.assertEqual(colonnes.ecues, ecues)
+        self.assertEqual(len(lignes[0]['cellules']), sum(entete['colspan'] for entete in colonnes.ligne_ecue))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExportExcelTests(TestCase):
+    """Export détaillé write-only, envoyé depuis un fichier"""
+
+    def setUp(self):
+        # Les pk des PV se répètent d'un test à l'autre : pas d'entrée de cache héritée
+        shutil.rmtree(Path(settings.MEDIA_ROOT) / 'exports', ignore_errors=True)
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+
+    def test_export_complet(self):
+        # PV, version relue, UE, ECUE, étudiants, notes, synthèses, version relue après l'écriture
+        with self.assertNumQueries(8):
+            reponse = self.client.get(reverse('pv:export', args=[self.pv.pk]))
+            contenu = b''.join(reponse.streaming_content)
+        self.assertIn('attachment', reponse['Content-Disposition'])
+
+        wb = load_workbook(io.BytesIO(contenu))
+        feuille = wb.active
+        lignes = list(feuille.iter_rows(min_row=11, values_only=True))
+        etudiants = list(self.pv.etudiants.order_by('numero'))
+        self.assertEqual([ligne[1] for ligne in lignes], [etudiant.matricule for etudiant in etudiants])
+
+        ecue = ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre').first()
+        note = Note.objects.get(etudiant=etudiants[0], ecue=ecue)
+        self.assertEqual(feuille.cell(row=9, column=4).value, f"{ecue.code} ({ecue.credits} crédits)")
+        self.assertEqual(lignes[0][5], float(note.moyenne) if note.moyenne else None)
+        self.assertEqual(lignes[0][-1], etudiants[0].get_decision_generale_display())
+
+        # Un style par nom, quel que soit le nombre de cellules
+        self.assertEqual(feuille['D10'].style, 'pv_entete_bleu')
+        self.assertLessEqual(len(wb._cell_styles), 10)
+
+    def test_emargements_nv(self):
+        reponse = self.client.get(reverse('pv:export_emargements_nv', args=[self.pv.pk]))
+        wb = load_workbook(io.BytesIO(b''.join(reponse.streaming_content)))
+
+        ecues = [ecue for ecue in ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre')
+                 if ecue.notes.filter(decision='NV').exists()]
+        self.assertEqual(wb.sheetnames, [ecue.code[:31] for ecue in ecues])
+        feuille = wb[wb.sheetnames[0]]
+        attendus = list(Note.objects.filter(ecue=ecues[0], decision='NV')
+                        .order_by('etudiant__nom_prenom').values_list('etudiant__matricule', flat=True))
+        self.assertEqual([feuille.cell(row=11 + k, column=2).value for k in range(len(attendus))], attendus)
+        self.assertEqual(feuille['A10'].style, 'pv_entete_gris')
+        self.assertEqual(feuille['C11'].style, 'pv_cellule')
+        self.assertEqual(feuille.row_dimensions[11].height, 30)
+
+    def test_emargements_requetes_constantes(self):
+        # PV, version relue, toutes les notes retenues quel que soit le nombre d'ECUE, version relue
+        for nom_url in ('pv:export_emargements_nv', 'pv:export_emargements_v_vc'):
+            with self.assertNumQueries(4):
+                reponse = self.client.get(reverse(nom_url, args=[self.pv.pk]))
+                b''.join(reponse.streaming_content)
+
+    def test_emargements_generique(self):
+        url = reverse('pv:export_emargements', args=[self.pv.pk])
+        with self.assertNumQueries(4):
+            reponse = self.client.get(url, {'decisions': 'vc,NV', 'notes': '1', 'ordre': 'matricule'})
+            contenu = b''.join(reponse.streaming_content)
+        self.assertIn('Emargements_NV_VC_', reponse['Content-Disposition'])
+
+        wb = load_workbook(io.BytesIO(contenu))
+        ecues = [ecue for ecue in ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre')
+                 if ecue.notes.filter(decision__in=['NV', 'VC']).exists()]
+        self.assertEqual(wb.sheetnames, [ecue.code[:31] for ecue in ecues])
+        feuille = wb[ecues[0].code]
+        self.assertEqual([cellule.value for cellule in feuille[10]],
+                         ['N°', 'MATRICULE', 'NOM & PRÉNOMS', 'CC', 'EX', 'MOY', 'SIGNATURE'])
+        notes = list(Note.objects.filter(ecue=ecues[0], decision__in=['NV', 'VC'])
+                     .order_by('etudiant__matricule').select_related('etudiant'))
+        self.assertEqual([feuille.cell(row=11 + k, column=2).value for k in range(len(notes))],
+                         [note.etudiant.matricule for note in notes])
+        self.assertEqual([feuille.cell(row=11 + k, column=6).value for k in range(len(notes))],
+                         [None if note.moyenne is None else float(note.moyenne) for note in notes])
+        self.assertIn('A2:G2', [str(plage) for plage in feuille.merged_cells.ranges])
+
+    def test_emargements_decisions_invalides(self):
+        reponse = self.client.get(reverse('pv:export_emargements', args=[self.pv.pk]), {'decisions': 'X'})
+        self.assertRedirects(reponse, reverse('pv:dashboard', args=[self.pv.pk]), fetch_redirect_response=False)
+
+    def test_notes_par_ecue(self):
+        with self.assertNumQueries(1):
+            groupes = [(ecue, [note.etudiant.nom_prenom for note in notes])
+                       for ecue, notes in notes_par_ecue(self.pv, ['V', 'VC'])]
+
+        attendues = [ecue for ecue in ECUE.objects.filter(ue__pv=self.pv).order_by('ue__ordre', 'ordre')
+                     if ecue.notes.filter(decision__in=['V', 'VC']).exists()]
+        self.assertEqual([ecue for ecue, _ in groupes], attendues)
+        for ecue, noms in groupes:
+            self.assertEqual(noms, list(ecue.notes.filter(decision__in=['V', 'VC'])
+                                        .order_by('etudiant__nom_prenom')
+                                        .values_list('etudiant__nom_prenom', flat=True)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CacheExportsTests(TestCase):
+    """Exports servis depuis le cache disque tant que les données du PV ne changent pas"""
+
+    def setUp(self):
+        shutil.rmtree(Path(settings.MEDIA_ROOT) / 'exports', ignore_errors=True)
+        self.pv = PVImporter().importer(PVExcelParser(DOCS_DIR / 'PV_GL04_SEM7_ALT.xlsx').parse(streaming=True))
+
+    def telecharger(self, nom_url, **params):
+        reponse = self.client.get(reverse(nom_url, args=[self.pv.pk]), params)
+        return b''.join(reponse.streaming_content)
+
+    def entrees(self):
+        dossier = Path(settings.MEDIA_ROOT) / 'exports' / f'pv_{self.pv.pk}'
+        return sorted(dossier.iterdir(), key=lambda chemin: chemin.name) if dossier.exists() else []
+
+    def test_export_servi_depuis_le_cache(self):
+        contenu = self.telecharger('pv:export', decision='NV')
+        with self.assertNumQueries(2):  # le PV et sa version relue
+            self.assertEqual(self.telecharger('pv:export', decision='NV'), contenu)
+
+        # Autres paramètres, autres entrées
+        self.telecharger('pv:export')
+        self.telecharger('pv:export_emargement', decision='NV')
+        self.telecharger('pv:export_emargements', decisions='NV')
+        self.telecharger('pv:export_emargements', decisions='NV', notes='1')
+        with self.assertNumQueries(2):
+            self.telecharger('pv:export_emargements_nv')  # mêmes paramètres que decisions=NV
+        self.assertEqual(len(self.entrees()), 5)
+        self.assertTrue(all(chemin.name.startswith(f'v{self.pv.version_donnees}_') for chemin in self.entrees()))
+
+    def test_invalidation_par_les_donnees(self):
+        self.telecharger('pv:export_emargements_nv')
+        note = Note.objects.filter(ecue__ue__pv=self.pv, decision='V').select_related('ecue', 'etudiant').first()
+        Note.objects.filter(pk=note.pk).update(decision='NV')
+        mettre_a_jour_resultats_pv(self.pv)
+        self.assertEqual(self.entrees(), [])
+
+        wb = load_workbook(io.BytesIO(self.telecharger('pv:export_emargements_nv')))
+        self.assertIn(note.etudiant.matricule, [ligne[1] for ligne in wb[note.ecue.code].iter_rows(values_only=True)])
+        self.assertEqual(len(self.entrees()), 1)
+
+    def test_modification_depuis_admin(self):
+        self.telecharger('pv:export_emargements_nv')
+        version = self.pv.version_donnees
+        note = Note.objects.filter(ecue__ue__pv=self.pv).first()
+        note.decision = 'NV'
+        admin.site._registry[Note].save_model(None, note, None, True)
+        self.pv.refresh_from_db()
+        self.assertEqual(self.pv.version_donnees, version + 1)
+        self.assertEqual(self.entrees(), [])
+
+        admin.site._registry[Etudiant].delete_queryset(None, self.pv.etudiants.filter(pk=note.etudiant_id))
+        self.pv.refresh_from_db()
+        self.assertEqual(self.pv.version_donnees, version + 2)
+
+    def test_pv_lu_avant_un_reimport(self):
+        # PV chargé par la vue avant la validation d'un réimport
+        pv_lu = ProcesVerbal.objects.get(pk=self.pv.pk)
+        invalider_caches_pv(self.pv)
+        contenu = self.telecharger('pv:export')
+        recente, = self.entrees()
+
+        # Entrée de la version en base servie, rien n'est écrit sous l'ancienne
+        with fichier_export(pv_lu, 'pv', FiltreEtudiants(), lambda f: f.write(b'ancien')) as fichier:
+            self.assertEqual(fichier.read(), contenu)
+        self.assertEqual(self.entrees(), [recente])
+
+    def test_reimport_pendant_l_ecriture(self):
+        self.telecharger('pv:export_emargements_nv')
+        version = self.pv.version_donnees
+
+        # Réimport validé pendant l'écriture : l'entrée écrite, antérieure, est élaguée
+        def ecrire(fichier):
+            invalider_caches_pv(ProcesVerbal.objects.get(pk=self.pv.pk))
+            fichier.write(b'ancien')
+
+        fichier_export(self.pv, 'pv', FiltreEtudiants(), ecrire).close()
+        self.assertEqual(self.entrees(), [])
+
+        # Jamais les entrées d'une version plus récente que celle relue
+        self.telecharger('pv:export')
+        recente, = self.entrees()
+        self.assertEqual(supprimer_exports_perimes(self.pv.pk, version), 0)
+        self.assertEqual(self.entrees(), [recente])
+
+    def test_eviction(self):
+        self.telecharger('pv:export')
+        self.telecharger('pv:export_emargements_nv')
+        ancienne, recente = self.entrees()
+        maintenant = time.time()
+        os.utime(ancienne, (maintenant - 60, maintenant - 60))
+
+        # Taille : les moins récemment servies d'abord
+        with override_settings(PV_EXPORT_CACHE_TAILLE_MAX=recente.stat().st_size):
+            self.assertEqual(nettoyer_cache_exports(), 1)
+        self.assertEqual(self.entrees(), [recente])
+
+        # Âge
+        self.assertEqual(nettoyer_cache_exports(maintenant=maintenant + settings.PV_EXPORT_CACHE_AGE_MAX + 1), 1)
+        self.assertEqual(self.entrees(), [])
+
+
+class ParametresEmargementTests(SimpleTestCase):
+    """Normalisation des paramètres d'un export d'émargements"""
+
+    def test_depuis_get(self):
+        parametres = ParametresEmargement.depuis_get(
+            QueryDict('decisions=vc,%20V&decisions=VC&ordre=inconnu&notes=oui&feuilles=intitule'))
+        self.assertEqual(parametres, ParametresEmargement(decisions=('V', 'VC'), notes=True, feuilles='intitule'))
+        self.assertEqual(parametres.prefixe_fichier, 'Emargements_V_VC')
+        self.assertEqual(parametres.libelle_aucun, "Aucun étudiant Validé (V ou VC) trouvé dans ce PV.")
+        with self.assertRaises(ValueError):
+            ParametresEmargement.depuis_get(QueryDict('decisions=X,'))
+
+    def test_nom_feuille(self):
+        ecue = ECUE(code='EPDGIT4031', intitule='Architectures / big data [avancé]')
+        self.assertEqual(ParametresEmargement().nom_feuille(ecue), 'EPDGIT4031')
+        nom = ParametresEmargement(feuilles='intitule').nom_feuille(ecue)
+        self.assertEqual(nom, 'EPDGIT4031 - Architectures -...')
+        self.assertEqual(len(nom), 31)
+
+
+class FeuilleExportTests(SimpleTestCase):
+    """Écriture par lignes avec styles nommés"""
+
+    def test_styles_par_ligne(self):
+        wb = Workbook(write_only=True)
+        feuille = FeuilleExport(wb, 'Feuille', largeurs=[6, 18])
+        feuille.ecrire(['Titre'], 'pv_titre', fusion=4)
+        feuille.vide()
+        for k in range(50):
+            feuille.ecrire([k, f'M{k}', 'NOM', None], LIGNE_EMARGEMENT, hauteur=30)
+        sortie = io.BytesIO()
+        wb.save(sortie)
+
+        ws = load_workbook(sortie).active
+        self.assertEqual(ws.max_row, 52)
+        self.assertEqual([str(plage) for plage in ws.merged_cells.ranges], ['A1:D1'])
+        self.assertEqual(ws['A1'].style, 'pv_titre')
+        self.assertEqual([ws.cell(row=52, column=k).style for k in range(1, 5)], list(LIGNE_EMARGEMENT))
+        self.assertEqual(ws.column_dimensions['B'].width, 18)
+        self.assertEqual(ws.row_dimensions[52].height, 30)
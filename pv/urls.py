@@ -6,10 +6,16 @@ app_name = 'pv'
 urlpatterns = [
     path('', views.home, name='home'),
     path('import/', views.import_pv, name='import'),
+    path('import/lot/', views.import_lot, name='import_lot'),
+    path('import/statut/<int:pk>/', views.import_statut, name='import_statut'),
+    path('reimport/<int:pk>/', views.reimport_pv, name='reimport'),
     path('dashboard/<int:pk>/', views.dashboard, name='dashboard'),
+    path('stats/<int:pk>/', views.stats_ecues, name='stats'),
     path('dashboard-aggrid/<int:pk>/', views.dashboard_aggrid, name='dashboard_aggrid'),
+    path('dashboard-aggrid/<int:pk>/donnees/', views.dashboard_donnees, name='dashboard_donnees'),
     path('export/<int:pk>/', views.export_excel, name='export'),
     path('export-emargement/<int:pk>/', views.export_feuille_emargement, name='export_emargement'),
+    path('export-emargements/<int:pk>/', views.export_emargements, name='export_emargements'),
     path('export-emargements-nv/<int:pk>/', views.export_emargements_nv_complets, name='export_emargements_nv'),
     path('export-emargements-v-vc/<int:pk>/', views.export_emargements_v_vc, name='export_emargements_v_vc'),
     path('print/<int:pk>/', views.print_view, name='print'),
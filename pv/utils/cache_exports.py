@@ -0,0 +1,162 @@
+"""
+Cache disque des exports Excel d'un PV, sous MEDIA_ROOT
+
+Un export (détaillé, feuille d'émargement, émargements par ECUE) est écrit
+une fois par PV, version des données (ProcesVerbal.version_donnees) et
+paramètres normalisés (FiltreEtudiants, ParametresEmargement), puis servi
+depuis le fichier tant que les données du PV ne changent pas :
+
+    MEDIA_ROOT/PV_EXPORT_CACHE_DIR/pv_<pk>/v<version>_<nature>_<hmac>.xlsx
+
+Le nom contient un HMAC (SECRET_KEY) des paramètres : il ne se devine pas
+depuis l'URL de MEDIA_ROOT. La version est relue en base avant de chercher
+l'entrée (le PV de la vue a pu être chargé avant un réimport validé depuis),
+puis après l'écriture : si un réimport a été validé entre-temps, l'entrée
+écrite appartient à une version antérieure et est supprimée, comme toutes
+celles des versions antérieures (jamais celles d'une version plus récente).
+
+Il n'y a pas de verrou entre processus : deux requêtes simultanées sans
+entrée en cache écrivent chacune le classeur complet dans leur propre fichier
+temporaire ; le remplacement est atomique et la dernière écriture, identique,
+reste en cache.
+
+Après chaque écriture, les entrées plus anciennes que PV_EXPORT_CACHE_AGE_MAX
+sont supprimées, puis les moins récemment servies tant que le total dépasse
+PV_EXPORT_CACHE_TAILLE_MAX.
+"""
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+from ..models import ProcesVerbal
+
+
+EXTENSION = '.xlsx'
+
+
+def _racine():
+    return os.path.join(str(settings.MEDIA_ROOT), getattr(settings, 'PV_EXPORT_CACHE_DIR', 'exports'))
+
+
+def _dossier_pv(pk):
+    return os.path.join(_racine(), f"pv_{pk}")
+
+
+def chemin_export(pv, nature, parametres, version=None):
+    """
+    Chemin de l'entrée de cache d'un export du PV pour des paramètres
+    normalisés, à la `version` des données (par défaut pv.version_donnees)
+    """
+    version = pv.version_donnees if version is None else version
+    # La date d'import distingue deux PV de même pk (pk réutilisé après suppression)
+    signature = salted_hmac('pv.exports', f"{pv.date_import.isoformat()}:{nature}:{parametres!r}").hexdigest()[:32]
+    return os.path.join(_dossier_pv(pv.pk), f"v{version}_{nature}_{signature}{EXTENSION}")
+
+
+def _version_en_base(pk):
+    return ProcesVerbal.objects.filter(pk=pk).order_by().values_list('version_donnees', flat=True).first()
+
+
+def _supprimer(chemin):
+    try:
+        os.remove(chemin)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def fichier_export(pv, nature, parametres, ecrire):
+    """
+    Fichier (ouvert en lecture binaire) de l'export `nature` du PV pour les
+    `parametres` : l'entrée du cache si elle existe, sinon l'export écrit par
+    ecrire(fichier) dans un fichier temporaire puis mis en cache (écriture atomique).
+    """
+    chemin = chemin_export(pv, nature, parametres, _version_en_base(pv.pk))
+    try:
+        fichier = open(chemin, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        # Date de dernier usage : l'éviction par taille retire les moins récemment servis
+        os.utime(chemin)
+        return fichier
+
+    dossier = os.path.dirname(chemin)
+    os.makedirs(dossier, exist_ok=True)
+    fd, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as brut:
+            ecrire(brut)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        _supprimer(temporaire)
+        raise
+
+    fichier = open(chemin, 'rb')
+    # Version relue : un réimport a pu l'incrémenter pendant l'écriture de l'export
+    version = _version_en_base(pv.pk)
+    if version is not None:
+        supprimer_exports_perimes(pv.pk, version)
+    nettoyer_cache_exports()
+    return fichier
+
+
+def _version(nom):
+    """Version des données dans le nom d'une entrée (v<version>_...), None si illisible"""
+    try:
+        return int(nom[1:nom.index('_')]) if nom.startswith('v') else None
+    except ValueError:
+        return None
+
+
+def supprimer_exports_perimes(pk, version):
+    """
+    Supprime les entrées du PV `pk` écrites pour une version de ses données
+    strictement antérieure à `version` (jamais celles d'une version plus récente)
+    """
+    dossier = _dossier_pv(pk)
+    try:
+        noms = os.listdir(dossier)
+    except FileNotFoundError:
+        return 0
+    return sum(
+        _supprimer(os.path.join(dossier, nom))
+        for nom in noms
+        if nom.endswith(EXTENSION) and _version(nom) is not None and _version(nom) < version
+    )
+
+
+def nettoyer_cache_exports(maintenant=None):
+    """
+    Éviction : entrées (et fichiers temporaires abandonnés) plus anciennes que
+    l'âge maximal, puis les moins récemment servies au-delà de la taille
+    maximale. Retourne le nombre de fichiers supprimés.
+    """
+    maintenant = time.time() if maintenant is None else maintenant
+    age_max = getattr(settings, 'PV_EXPORT_CACHE_AGE_MAX', 7 * 24 * 60 * 60)
+    taille_max = getattr(settings, 'PV_EXPORT_CACHE_TAILLE_MAX', 500 * 1024 * 1024)
+
+    supprimes = 0
+    entrees = []
+    for dossier, _, noms in os.walk(_racine()):
+        for nom in noms:
+            chemin = os.path.join(dossier, nom)
+            try:
+                etat = os.stat(chemin)
+            except FileNotFoundError:
+                continue
+            if maintenant - etat.st_mtime > age_max:
+                supprimes += _supprimer(chemin)
+            elif nom.endswith(EXTENSION):
+                entrees.append((etat.st_mtime, etat.st_size, chemin))
+
+    total = sum(taille for _, taille, _ in entrees)
+    for _, taille, chemin in sorted(entrees):
+        if total <= taille_max:
+            break
+        supprimes += _supprimer(chemin)
+        total -= taille
+    return supprimes
@@ -0,0 +1,24 @@
+"""
+Clés des caches calculés pour un PV (statistiques, dashboard, exports)
+
+Chaque clé contient la version des données du PV (ProcesVerbal.version_donnees) :
+invalider les caches d'un PV revient à incrémenter sa version, sans toucher
+aux entrées des autres PV. Les anciennes entrées expirent d'elles-mêmes ; les
+exports en cache disque du PV (pv.utils.cache_exports) sont supprimés.
+"""
+from django.db.models import F
+
+from ..models import ProcesVerbal
+from .cache_exports import supprimer_exports_perimes
+
+
+def cle_cache(pv, *parties):
+    """Clé de cache propre à un PV et à la version courante de ses données"""
+    return ':'.join(['pv', str(pv.pk), f"v{pv.version_donnees}", *(str(partie) for partie in parties)])
+
+
+def invalider_caches_pv(pv):
+    """Invalide toutes les entrées de cache d'un PV après modification de ses données"""
+    ProcesVerbal.objects.filter(pk=pv.pk).update(version_donnees=F('version_donnees') + 1)
+    pv.refresh_from_db(fields=['version_donnees'])
+    supprimer_exports_perimes(pv.pk, pv.version_donnees)
@@ -0,0 +1,220 @@
+"""
+Feuilles d'émargement : par ECUE pour un ensemble de décisions, ou feuille
+unique des étudiants filtrés
+
+Les notes d'un PV retenues pour l'émargement (décisions données) sont lues
+en une seule requête, triées par UE, ECUE puis étudiant, et regroupées par
+ECUE au fil de la lecture : le nombre de requêtes ne dépend pas du nombre
+d'ECUE, et seules les ECUE ayant au moins une note retenue ont une feuille.
+
+Les paramètres d'un export (décisions, ordre des étudiants, colonnes de
+notes, nommage des feuilles) sont normalisés en un ParametresEmargement,
+depuis les paramètres GET : ?decisions=NV,VC&ordre=matricule&notes=1&feuilles=intitule
+"""
+import re
+from itertools import groupby
+from typing import NamedTuple, Tuple
+
+import openpyxl
+
+from ..models import ECUE, Note
+from .filtres import etudiants_filtres
+from .styles_excel import LIGNE_EMARGEMENT, FeuilleExport
+
+
+TAILLE_PAQUET = 500
+
+DECISIONS = [code for code, _ in Note.DECISION_CHOICES]
+
+# ordre -> tri des étudiants dans chaque feuille
+ORDRES = {
+    'nom': 'etudiant__nom_prenom',
+    'matricule': 'etudiant__matricule',
+    'numero': 'etudiant__numero',
+}
+
+# Nommage des feuilles : code de l'ECUE, ou code et intitulé
+FEUILLES = ('code', 'intitule')
+
+# décisions -> (sous-titre, libellé du total, libellé si aucun étudiant)
+LIBELLES = {
+    ('NV',): ("ÉTUDIANTS NON VALIDÉS", "NV", "Non Validé (NV)"),
+    ('V', 'VC'): ("ÉTUDIANTS VALIDÉS (V et VC)", "validés (V et VC)", "Validé (V ou VC)"),
+}
+
+NOM_FEUILLE_MAX = 31  # limite Excel
+CARACTERES_INTERDITS = re.compile(r'[\\*?:/\[\]]')
+
+
+def notes_par_ecue(pv, decisions, ordre='nom'):
+    """
+    Itère sur (ecue, notes) pour les ECUE du PV, dans l'ordre des UE et des
+    ECUE ; `notes` est la liste des notes dont la décision est dans
+    `decisions`, étudiant et ECUE (avec son UE) joints, triées selon `ordre`.
+    """
+    notes = Note.objects.filter(ecue__ue__pv=pv, decision__in=decisions) \
+        .select_related('etudiant', 'ecue__ue') \
+        .only('decision', 'cc', 'examen', 'moyenne',
+              'etudiant__matricule', 'etudiant__nom_prenom',
+              'ecue__code', 'ecue__intitule', 'ecue__ue__code', 'ecue__ue__intitule') \
+        .order_by('ecue__ue__ordre', 'ecue__ue_id', 'ecue__ordre', 'ecue_id', ORDRES[ordre], 'etudiant_id')
+
+    for _, groupe in groupby(notes.iterator(chunk_size=TAILLE_PAQUET), key=lambda note: note.ecue_id):
+        groupe = list(groupe)
+        yield groupe[0].ecue, groupe
+
+
+class ParametresEmargement(NamedTuple):
+    """Paramètres normalisés d'un export d'émargements (hashable)"""
+    decisions: Tuple[str, ...] = ('NV',)
+    ordre: str = 'nom'
+    notes: bool = False  # colonnes CC, EX, MOY avant la signature
+    feuilles: str = 'code'
+
+    @classmethod
+    def depuis_get(cls, params):
+        """
+        Paramètres à partir des paramètres GET. Décisions séparées par des
+        virgules (ou répétées), remises dans l'ordre des choix du modèle ; un
+        ordre ou un nommage inconnu prend la valeur par défaut. ValueError si
+        aucune décision valide n'est donnée.
+        """
+        valeurs = params.getlist('decisions') if hasattr(params, 'getlist') else [params.get('decisions')]
+        demandees = {code.strip().upper() for valeur in valeurs for code in (valeur or '').split(',')}
+        decisions = tuple(code for code in DECISIONS if code in demandees)
+        if not decisions:
+            raise ValueError(f"Décisions attendues parmi {', '.join(DECISIONS)}")
+
+        ordre = (params.get('ordre') or '').strip()
+        feuilles = (params.get('feuilles') or '').strip()
+        return cls(
+            decisions=decisions,
+            ordre=ordre if ordre in ORDRES else 'nom',
+            notes=(params.get('notes') or '').strip().lower() in ('1', 'true', 'oui'),
+            feuilles=feuilles if feuilles in FEUILLES else 'code',
+        )
+
+    @property
+    def _libelles(self):
+        return LIBELLES.get(self.decisions) or (
+            f"ÉTUDIANTS {', '.join(self.decisions)}",
+            ' / '.join(self.decisions),
+            f"({' ou '.join(self.decisions)})",
+        )
+
+    @property
+    def sous_titre(self):
+        return f"FEUILLE D'ÉMARGEMENT - {self._libelles[0]}"
+
+    def libelle_total(self, nombre):
+        return f"Total étudiants {self._libelles[1]} pour cette matière : {nombre}"
+
+    @property
+    def libelle_aucun(self):
+        return f"Aucun étudiant {self._libelles[2]} trouvé dans ce PV."
+
+    @property
+    def prefixe_fichier(self):
+        return f"Emargements_{'_'.join(self.decisions)}"
+
+    @property
+    def entetes(self):
+        notes = ['CC', 'EX', 'MOY'] if self.notes else []
+        return ['N°', 'MATRICULE', 'NOM & PRÉNOMS'] + notes + ['SIGNATURE']
+
+    def nom_feuille(self, ecue):
+        """Nom de la feuille d'une ECUE, sans caractère interdit, limité à 31 caractères"""
+        nom = ecue.code if self.feuilles == 'code' else f"{ecue.code} - {ecue.intitule}"
+        nom = CARACTERES_INTERDITS.sub('-', nom)
+        return nom if len(nom) <= NOM_FEUILLE_MAX else nom[:NOM_FEUILLE_MAX - 3] + "..."
+
+
+def _nombre(valeur):
+    return float(valeur) if valeur is not None else None
+
+
+def ecrire_emargements(pv, parametres, fichier):
+    """
+    Écrit dans `fichier` (chemin ou fichier binaire ouvert) un classeur d'une
+    feuille par ECUE ayant des étudiants aux décisions demandées ; une feuille
+    « Information » si aucune.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    entetes = parametres.entetes
+    nb_colonnes = len(entetes)
+    largeurs = [6, 18, 40] + [8] * (nb_colonnes - 4) + [30]
+    styles = LIGNE_EMARGEMENT[:3] + ('pv_cellule_centre',) * (nb_colonnes - 4) + LIGNE_EMARGEMENT[3:]
+
+    feuilles_creees = 0
+    for ecue, notes in notes_par_ecue(pv, parametres.decisions, parametres.ordre):
+        ue = ecue.ue
+        feuille = FeuilleExport(wb, parametres.nom_feuille(ecue), largeurs=largeurs)
+
+        # ===== EN-TÊTE DE LA FEUILLE =====
+        feuille.vide()
+        feuille.ecrire(["ÉCOLE NATIONALE SUPÉRIEURE POLYTECHNIQUE DE DOUALA"], 'pv_titre', fusion=nb_colonnes)
+        feuille.ecrire([parametres.sous_titre], 'pv_sous_titre', fusion=nb_colonnes)
+        feuille.vide()
+        feuille.ecrire([f"Matière : {ecue.code} - {ecue.intitule}"], 'pv_info_gras', fusion=nb_colonnes)
+        feuille.ecrire([f"UE : {ue.code} - {ue.intitule}"], 'pv_info', fusion=nb_colonnes)
+        feuille.ecrire([f"Niveau : {pv.filiere} {pv.niveau} | Semestre : {pv.semestre}"], 'pv_info',
+                       fusion=nb_colonnes)
+        feuille.ecrire([f"Année académique : {pv.annee_academique}"], 'pv_info', fusion=nb_colonnes)
+        feuille.vide()
+
+        # ===== EN-TÊTES DU TABLEAU (Ligne 10) =====
+        feuille.ecrire(entetes, 'pv_entete_gris')
+
+        # ===== DONNÉES (hauteur de ligne pour signature manuscrite) =====
+        for idx, note in enumerate(notes, start=1):
+            etudiant = note.etudiant
+            valeurs = [idx, etudiant.matricule, etudiant.nom_prenom]
+            if parametres.notes:
+                valeurs += [_nombre(note.cc), _nombre(note.examen), _nombre(note.moyenne)]
+            feuille.ecrire(valeurs + [None], styles, hauteur=30)
+
+        # ===== PIED DE PAGE =====
+        feuille.vide(2)
+        feuille.ecrire([parametres.libelle_total(len(notes))], 'pv_info_gras', fusion=nb_colonnes)
+        feuille.vide()
+        feuille.ecrire(["Date : _______________    Signature enseignant : _______________"], 'pv_info',
+                       fusion=nb_colonnes)
+
+        feuilles_creees += 1
+
+    if feuilles_creees == 0:
+        feuille = FeuilleExport(wb, "Information")
+        feuille.ecrire([parametres.libelle_aucun], 'pv_sous_titre', hauteur=30, fusion=nb_colonnes + 1)
+
+    wb.save(fichier)
+
+
+def ecrire_feuille_emargement(pv, filtre, fichier):
+    """
+    Écrit dans `fichier` la feuille d'émargement unique des étudiants
+    sélectionnés par `filtre` (FiltreEtudiants), triés par nom
+    """
+    etudiants = etudiants_filtres(pv, filtre).order_by('nom_prenom')
+    ecue = ECUE.objects.filter(code=filtre.ecue, ue__pv=pv).first() if filtre.ecue else None
+
+    wb = openpyxl.Workbook(write_only=True)
+    feuille = FeuilleExport(wb, "Feuille Émargement", largeurs=[6, 18, 40, 30])
+
+    # En-tête du document
+    feuille.ecrire(['UNIVERSITÉ DE DOUALA'], 'pv_titre', fusion=4)
+    feuille.ecrire(['École Nationale Supérieure Polytechnique de Douala'], 'pv_sous_titre', fusion=4)
+    feuille.ecrire([f"FEUILLE D'ÉMARGEMENT - {pv.filiere} - {pv.niveau} - {pv.semestre}"], 'pv_sous_titre', fusion=4)
+    feuille.ecrire([f"Année académique: {pv.annee_academique}"], 'pv_info_centre', fusion=4)
+
+    # Ligne 5 : Matière filtrée (si applicable)
+    if ecue:
+        feuille.ecrire([f"Matière : {ecue.code} - {ecue.intitule}"], 'pv_info_gras', fusion=4)
+
+    feuille.vide()
+    feuille.ecrire(['N°', 'MATRICULE', 'NOM & PRÉNOMS', 'SIGNATURE'], 'pv_entete_gris')
+
+    # Données des étudiants (hauteur de ligne augmentée pour la signature manuscrite)
+    for idx, etudiant in enumerate(etudiants.only('matricule', 'nom_prenom'), start=1):
+        feuille.ecrire([idx, etudiant.matricule, etudiant.nom_prenom, None], LIGNE_EMARGEMENT, hauteur=30)
+
+    wb.save(fichier)
@@ -0,0 +1,93 @@
+"""
+Empreinte SHA-256 des fichiers PV et cache disque des résultats du parser
+
+Le cache contient la sortie de PVExcelParser.parse_classeur() sérialisée
+(pickle compressé gzip), un fichier par empreinte, dans PV_PARSE_CACHE_DIR.
+Réimporter un fichier identique évite ainsi de le parser à nouveau.
+"""
+import gzip
+import hashlib
+import os
+import pickle
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+
+from ..models import ProcesVerbal
+
+
+# À incrémenter quand le format de sortie du parser change
+VERSION_CACHE = 1
+
+
+class FichierEmpreinte(File):
+    """
+    Fichier dont l'empreinte SHA-256 est calculée pendant son écriture dans le
+    stockage (au fil des chunks lus par le storage)
+    """
+
+    def __init__(self, fichier):
+        super().__init__(fichier, name=fichier.name)
+        self._sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        self._sha256 = hashlib.sha256()
+        for chunk in super().chunks(chunk_size):
+            self._sha256.update(chunk)
+            yield chunk
+
+    @property
+    def empreinte(self):
+        return self._sha256.hexdigest()
+
+
+def empreinte_fichier(chemin, taille_bloc=1024 * 1024):
+    """Empreinte SHA-256 d'un fichier sur disque"""
+    sha256 = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b''):
+            sha256.update(bloc)
+    return sha256.hexdigest()
+
+
+def pvs_existants(empreinte):
+    """PV déjà importés à partir d'un fichier de même contenu"""
+    if not empreinte:
+        return []
+    return list(ProcesVerbal.objects.filter(empreinte_sha256=empreinte).order_by('pk'))
+
+
+def _chemin_cache(empreinte):
+    dossier = getattr(settings, 'PV_PARSE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'parse'))
+    return os.path.join(str(dossier), f"{empreinte}.v{VERSION_CACHE}.pkl.gz")
+
+
+def lire_cache(empreinte):
+    """Feuilles parsées d'un fichier déjà vu, ou None"""
+    if not empreinte:
+        return None
+    try:
+        with gzip.open(_chemin_cache(empreinte), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Entrée corrompue ou illisible : elle sera réécrite
+        return None
+
+
+def ecrire_cache(empreinte, feuilles):
+    """Enregistre le résultat de parse_classeur() (écriture atomique)"""
+    if not empreinte:
+        return
+    chemin = _chemin_cache(empreinte)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    fd, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as brut, gzip.GzipFile(fileobj=brut, mode='wb', compresslevel=6) as f:
+            pickle.dump(feuilles, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.remove(temporaire)
+        raise
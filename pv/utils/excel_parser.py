@@ -1,30 +1,122 @@
 """
 Parser Excel FINAL - Gère correctement CC, EX, MOY, [vide], CA, [vide], DECISION
+
+Le classeur est ouvert une seule fois et la feuille parcourue en une seule passe :
+les 11 premières lignes alimentent les métadonnées, la structure UE/ECUE et
+l'en-tête des colonnes, les lignes suivantes les données des étudiants.
 """
-import pandas as pd
-import openpyxl
-from openpyxl import load_workbook
+import time
+from collections import defaultdict, namedtuple
 from decimal import Decimal
 
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+
+# Valeurs considérées comme vides (mêmes conventions que pandas.read_excel)
+VALEURS_VIDES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null',
+]) | frozenset(ERROR_CODES)
+
+PREFIXES_CODES = ('EPDGIT', 'EPDTCO', 'EPDCSC', 'MPSSI', 'MAPRO', 'MPGIT', 'MPGR')
+
+# Plan de lecture des colonnes, calculé une fois à partir de l'en-tête :
+# positions (index 0) des valeurs à lire sur chaque ligne étudiant
+BlocECUE = namedtuple('BlocECUE', ['cc', 'examen', 'moyenne', 'credit_attribue', 'decision'])
+BlocSynthese = namedtuple('BlocSynthese', ['moyenne_ue', 'credits_attribues', 'decision'])
+PlanColonnes = namedtuple('PlanColonnes', [
+    'largeur', 'numero', 'matricule', 'nom_prenom', 'moyenne_generale', 'credits_acquis',
+    'ecues', 'syntheses',
+])
+
+
+def _est_vide(value):
+    """Indique si une valeur de cellule doit être traitée comme vide"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value in VALEURS_VIDES
+    if isinstance(value, float):
+        return value != value
+    return False
+
 
 class PVExcelParser:
     """Parser optimisé pour les fichiers PV ENSPD"""
 
+    # Nombre de lignes étudiants converties ensemble, colonne par colonne : petit
+    # et fixe, pour que la mémoire transitoire ne croisse pas avec la feuille
+    TAILLE_BLOC = 64
+
     def __init__(self, file_path):
         self.file_path = file_path
-        self.wb = load_workbook(file_path)
-        self.ws = self.wb.active
         self.metadata = {}
         self.ues = []
         self.ecues = []
         self.etudiants = []
+        self.colonnes = []
+        self.plan = None
         self.header_row = 11
-
-    def parse(self):
-        """Parse complet"""
-        self.extract_metadata()
-        self.extract_structure()
-        self.extract_student_data()
+        self._conversions = {}
+        self._progression = None
+
+    def parse(self, streaming=False, progression=None, feuille=None):
+        """
+        Parse complet en une seule lecture du classeur.
+
+        Avec streaming=True, le classeur est ouvert en lecture seule : les lignes
+        sont lues au fil de l'eau sans charger les cellules, styles et fusions en
+        mémoire, qui reste stable quel que soit le nombre d'étudiants ou de colonnes.
+
+        `feuille` est le nom de la feuille à lire (par défaut la feuille active).
+        `progression`, si fourni, est appelé après chaque bloc de lignes avec le
+        nombre d'étudiants lus jusque-là.
+        """
+        self._progression = progression
+        wb = load_workbook(self.file_path, read_only=streaming, data_only=True)
+        try:
+            ws = wb[feuille] if feuille else wb.active
+            entete, lignes = self._lire_entete(ws, streaming)
+            self._parse_feuille(entete, lignes)
+        finally:
+            wb.close()
+
+        return self.resultat()
+
+    def parse_classeur(self, streaming=True, progression=None):
+        """
+        Parse toutes les feuilles PV d'un classeur multi-feuilles (MAPRO) en un
+        seul chargement. Les feuilles sont lues l'une après l'autre : en lecture
+        seule, elles partagent le même accès à l'archive du classeur.
+
+        Retourne [(nom de la feuille, data), ...] dans l'ordre du classeur, en
+        ignorant les feuilles sans en-tête de PV (voir est_entete_pv).
+        `progression` reçoit le nombre cumulé d'étudiants lus.
+        """
+        feuilles = []
+        lus = 0
+        wb = load_workbook(self.file_path, read_only=streaming, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                entete, lignes = self._lire_entete(ws, streaming)
+                if not self.est_entete_pv(entete):
+                    continue
+
+                parser = type(self)(self.file_path)
+                parser.TAILLE_BLOC = self.TAILLE_BLOC
+                if progression:
+                    parser._progression = lambda nombre, lus=lus: progression(lus + nombre)
+                parser._parse_feuille(entete, lignes)
+                lus += len(parser.etudiants)
+                feuilles.append((ws.title, parser.resultat()))
+        finally:
+            wb.close()
+
+        return feuilles
+
+    def resultat(self):
         return {
             'metadata': self.metadata,
             'ues': self.ues,
@@ -32,28 +124,76 @@ class PVExcelParser:
             'etudiants': self.etudiants
         }
 
-    def extract_metadata(self):
+    def _lire_entete(self, ws, streaming):
+        """
+        Lit les lignes 1 à 11 d'une feuille (métadonnées, structure UE/ECUE et
+        en-tête des colonnes). Retourne (entete, itérateur des lignes suivantes).
+        """
+        if streaming:
+            # Les dimensions déclarées dans le fichier peuvent être fausses :
+            # on lit les lignes telles qu'elles sont stockées
+            ws.reset_dimensions()
+        lignes = ws.iter_rows(values_only=True)
+
+        entete = []
+        for ligne in lignes:
+            entete.append(ligne)
+            if len(entete) == self.header_row:
+                break
+        return entete, lignes
+
+    def est_entete_pv(self, entete):
+        """La ligne d'en-tête contient les colonnes MATRICULE et CC d'un PV"""
+        if len(entete) < self.header_row:
+            return False
+        noms = {str(v).strip().upper() for v in entete[self.header_row - 1] if not _est_vide(v)}
+        return 'MATRICULE' in noms and 'CC' in noms
+
+    def _parse_feuille(self, entete, lignes):
+        self.extract_metadata(entete)
+        self.extract_structure(entete)
+        self.extract_student_data(lignes, entete)
+
+    @staticmethod
+    def _cellule(lignes, row, col):
+        """Valeur de la cellule (row, col) en numérotation Excel, None si absente"""
+        if row > len(lignes):
+            return None
+        ligne = lignes[row - 1]
+        return ligne[col - 1] if col <= len(ligne) else None
+
+    @staticmethod
+    def _largeur(ligne):
+        """Largeur utile d'une ligne (sans les cellules vides en fin de ligne)"""
+        largeur = len(ligne)
+        while largeur and (ligne[largeur - 1] is None or ligne[largeur - 1] == ''):
+            largeur -= 1
+        return largeur
+
+    def extract_metadata(self, entete):
         """Extrait les métadonnées"""
-        self.metadata['universite'] = self.ws['F1'].value or "UNIVERSITE DE DOUALA"
-        self.metadata['ecole'] = self.ws['F3'].value or "École Nationale Supérieure Polytechnique de Douala"
+        cellule = lambda row, col: self._cellule(entete, row, col)
+
+        self.metadata['universite'] = cellule(1, 6) or "UNIVERSITE DE DOUALA"
+        self.metadata['ecole'] = cellule(3, 6) or "École Nationale Supérieure Polytechnique de Douala"
 
-        niveau_val = self.ws['I4'].value
+        niveau_val = cellule(4, 9)
         self.metadata['niveau'] = int(niveau_val) if niveau_val else 4
 
-        filiere_val = self.ws['F8'].value
+        filiere_val = cellule(8, 6)
         if filiere_val and ':' in str(filiere_val):
             self.metadata['filiere'] = str(filiere_val).split(':', 1)[1].strip()
         else:
-            self.metadata['filiere'] = str(filiere_val) if filiere_val else "GRT"
+            self.metadata['filiere'] = str(filiere_val).strip() if filiere_val else "GRT"
 
-        semestre_s7 = self.ws['H7'].value
+        semestre_s7 = cellule(7, 8)
         self.metadata['semestre'] = str(semestre_s7) if semestre_s7 else "S7"
 
         # Année académique
         annee_found = False
         for row in range(5, 7):
             for col in range(6, 12):
-                cell_val = self.ws.cell(row=row, column=col).value
+                cell_val = cellule(row, col)
                 if cell_val and '/' in str(cell_val) and len(str(cell_val).strip()) <= 12:
                     self.metadata['annee_academique'] = str(cell_val).strip()
                     annee_found = True
@@ -67,7 +207,7 @@ class PVExcelParser:
         formation_found = False
         for row in range(1, 10):
             for col in range(1, 15):
-                cell_val = self.ws.cell(row=row, column=col).value
+                cell_val = cellule(row, col)
                 if cell_val and 'ALTERNANCE' in str(cell_val).upper():
                     self.metadata['formation'] = "ALTERNANCE"
                     formation_found = True
@@ -81,24 +221,22 @@ class PVExcelParser:
         if not formation_found:
             self.metadata['formation'] = "ALTERNANCE"
 
-    def extract_structure(self):
-        """Extrait UE/ECUE de la structure Excel"""
-        df_structure = pd.read_excel(self.file_path, header=None, nrows=11)
-
-        ue_row = df_structure.iloc[8]  # Ligne 9
-        ecue_row = df_structure.iloc[9]  # Ligne 10
+    def extract_structure(self, entete):
+        """Extrait UE/ECUE de la structure Excel (lignes 9 et 10)"""
+        largeur = max((self._largeur(ligne) for ligne in entete), default=0)
+        ue_row = entete[8] if len(entete) > 8 else ()
+        ecue_row = entete[9] if len(entete) > 9 else ()
 
         ue_ordre = 1
         ecue_ordre = 1
         current_ue_code = None
 
-        col_idx = 0
-        while col_idx < len(ue_row):
-            ue_val = ue_row.iloc[col_idx] if col_idx < len(ue_row) else None
-            ecue_val = ecue_row.iloc[col_idx] if col_idx < len(ecue_row) else None
+        for col_idx in range(largeur):
+            ue_val = ue_row[col_idx] if col_idx < len(ue_row) else None
+            ecue_val = ecue_row[col_idx] if col_idx < len(ecue_row) else None
 
             # Nouvelle UE
-            if pd.notna(ue_val) and ('EPDGIT' in str(ue_val) or 'EPDTCO' in str(ue_val) or 'MPSSI' in str(ue_val) or 'MAPRO' in str(ue_val) or 'MPGIT' in str(ue_val)):
+            if not _est_vide(ue_val) and any(prefix in str(ue_val) for prefix in PREFIXES_CODES):
                 parts = str(ue_val).split(':', 1)
                 if len(parts) == 2:
                     ue_code = parts[0].strip()
@@ -114,11 +252,11 @@ class PVExcelParser:
                         ue_ordre += 1
 
             # Nouvelle ECUE
-            if pd.notna(ecue_val):
+            if not _est_vide(ecue_val):
                 ecue_str = str(ecue_val).strip()
 
                 # ECUE normale
-                if '(' in ecue_str and ')' in ecue_str and ('EPDGIT' in ecue_str or 'EPDTCO' in ecue_str or 'MPSSI' in ecue_str or 'MAPRO' in ecue_str or 'MPGIT' in ecue_str):
+                if '(' in ecue_str and ')' in ecue_str and any(prefix in ecue_str for prefix in PREFIXES_CODES):
                     code_part = ecue_str.split(')')[0]
                     ecue_code = code_part.replace('(', '').strip()
                     ecue_intitule = ecue_str.split(')', 1)[1].strip() if ')' in ecue_str else ''
@@ -146,118 +284,249 @@ class PVExcelParser:
                         })
                         ecue_ordre += 1
 
-            col_idx += 1
-
-    def extract_student_data(self):
-        """Extrait les données des étudiants"""
-        df = pd.read_excel(self.file_path, header=self.header_row - 1)
-        df.columns = [str(col).strip() if pd.notna(col) else f"Unnamed_{i}"
-                      for i, col in enumerate(df.columns)]
-
-        for idx, row in df.iterrows():
-            numero = row.get('N°', idx + 1)
-            matricule = str(row.get('MATRICULE', '')).strip()
-            nom_prenom = str(row.get('NOMS & PRENOMS', '')).strip()
-
-            if not matricule or matricule == 'nan':
-                continue
-
-            moyenne_generale = self._safe_decimal(row.get('MOYENNE/20', 0))
-            credits_acquis = self._safe_int(row.get('CREDITS  ACQUIS', 0))
-            decision_generale = self._extract_decision(row, df.columns[-1])
+    def _noms_colonnes(self, ligne_entete):
+        """
+        Noms des colonnes de la ligne d'en-tête : cellules vides nommées
+        "Unnamed: i" et doublons suffixés ".1", ".2"... comme pandas.
+        """
+        noms = []
+        compteurs = defaultdict(int)
+        for i, valeur in enumerate(ligne_entete):
+            nom = f"Unnamed: {i}" if valeur is None or valeur == '' else str(valeur)
+            compteur = compteurs[nom]
+            while compteur > 0:
+                compteurs[nom] = compteur + 1
+                nom = f"{nom}.{compteur}"
+                compteur = compteurs[nom]
+            compteurs[nom] = compteur + 1
+            noms.append(nom.strip())
+        return noms
+
+    def compiler_plan(self, colonnes):
+        """
+        Analyse une seule fois les noms de colonnes de l'en-tête et retourne le
+        plan (immuable) des positions à lire sur chaque ligne étudiant.
+
+        Séquences reconnues, dans l'ordre des colonnes :
+        - ECUE : CC, EX, MOY, [vide], CA, [vide], DECISION
+        - SYNTHESE UE : MOY, [vide], CA, [vide], DECISION (sans CC/EX avant)
+        """
+        index_colonnes = {}
+        for i, nom in enumerate(colonnes):
+            index_colonnes.setdefault(nom, i)
+
+        noms = [nom.upper() for nom in colonnes]
+        blocs_ecue = []
+        blocs_synthese = []
+
+        i = 0
+        while i < len(noms):
+            col_str = noms[i]
+
+            # Séquence ECUE
+            if ('CC' == col_str or 'CC.' in col_str) and i + 6 < len(noms):
+                next_cols = noms[i+1:i+7]
+
+                # Vérifier: EX, MOY, ?, CA, ?, DECISION
+                if 'EX' in next_cols[0] and 'MOY' in next_cols[1] and 'CA' in next_cols[3] and 'DECISION' in next_cols[5]:
+                    blocs_ecue.append(BlocECUE(i, i + 1, i + 2, i + 4, i + 6))
+                    i += 7  # Sauter toute la séquence
+                    continue
+
+            # Séquence SYNTHESE UE
+            if i > 0 and ('MOY' in col_str) and i + 4 < len(noms):
+                prev_col = noms[i-1]
+                # Vérifier qu'il n'y a pas CC/EX juste avant
+                if 'CC' not in prev_col and 'EX' not in prev_col:
+                    next_cols = noms[i+1:i+5]
+
+                    # Vérifier: ?, CA, ?, DECISION
+                    if ('CA' in next_cols[1] or 'UNNAMED' in next_cols[1]) and 'DECISION' in next_cols[3]:
+                        blocs_synthese.append(BlocSynthese(i, i + 2, i + 4))
+                        i += 5
+                        continue
 
-            # Extraire notes et synthèses
+            i += 1
+
+        return PlanColonnes(
+            largeur=len(colonnes),
+            numero=index_colonnes.get('N°'),
+            matricule=index_colonnes.get('MATRICULE'),
+            nom_prenom=index_colonnes.get('NOMS & PRENOMS'),
+            moyenne_generale=index_colonnes.get('MOYENNE/20'),
+            credits_acquis=index_colonnes.get('CREDITS  ACQUIS'),
+            ecues=tuple(blocs_ecue),
+            syntheses=tuple(blocs_synthese),
+        )
+
+    def extract_student_data(self, lignes, entete):
+        """
+        Extrait les données des étudiants à partir des lignes restantes de la feuille.
+
+        Les lignes sont traitées par blocs de TAILLE_BLOC : chaque colonne du plan
+        est convertie d'un seul tenant (voir extract_student_block), ce qui garde
+        une mémoire bornée en mode streaming.
+        """
+        # La dernière colonne du tableau est la plus à droite de toute la feuille :
+        # elle n'est connue qu'en fin de parcours, on conserve donc pour chaque
+        # étudiant la fin de sa ligne à partir de la dernière colonne de l'en-tête.
+        largeur_feuille = max((self._largeur(ligne) for ligne in entete), default=0)
+        ligne_entete = entete[self.header_row - 1] if len(entete) >= self.header_row else ()
+        largeur_entete = self._largeur(ligne_entete)
+        debut_fin = max(largeur_entete - 1, 0)
+
+        self.colonnes = self._noms_colonnes(ligne_entete[:largeur_entete])
+        self.plan = self.compiler_plan(self.colonnes)
+
+        ecue_codes = [e['code'] for e in self.ecues if not e.get('is_synthese', False)]
+        ue_codes = [ue['code'] for ue in self.ues]
+        fins_de_ligne = []
+        bloc, fins_bloc = [], []
+        idx = 0
+
+        def traiter_bloc():
+            etudiants = self.extract_student_block(bloc, idx - len(bloc), ecue_codes, ue_codes)
+            for etudiant_data, fin in zip(etudiants, fins_bloc):
+                if etudiant_data is not None:
+                    self.etudiants.append(etudiant_data)
+                    fins_de_ligne.append(fin)
+            bloc.clear()
+            fins_bloc.clear()
+            if self._progression:
+                self._progression(len(self.etudiants))
+
+        for ligne in lignes:
+            largeur = self._largeur(ligne)
+            if largeur == 0 or all(v is None or v == '' for v in ligne[:largeur]):
+                continue  # lignes vides ignorées
+            largeur_feuille = max(largeur_feuille, largeur)
+
+            if len(ligne) < self.plan.largeur:
+                ligne = tuple(ligne) + (None,) * (self.plan.largeur - len(ligne))
+            bloc.append(ligne)
+            fins_bloc.append(ligne[debut_fin:largeur])
+            idx += 1
+
+            if len(bloc) >= self.TAILLE_BLOC:
+                traiter_bloc()
+        traiter_bloc()
+
+        # Décision générale : dernière colonne de la feuille
+        position = largeur_feuille - 1 - debut_fin
+        for etudiant_data, fin in zip(self.etudiants, fins_de_ligne):
+            if 0 <= position < len(fin):
+                etudiant_data['decision_generale'] = self._extract_decision(fin[position])
+
+    def _convertir_colonne(self, valeurs, conversion):
+        """
+        Convertit une colonne entière : chaque valeur distincte n'est convertie
+        qu'une fois (table partagée par le parser pour toute la feuille), puis la
+        colonne est projetée par une seule correspondance. Réservé aux colonnes
+        de notes, crédits et décisions, dont les valeurs se répètent.
+        """
+        table = self._conversions.setdefault(conversion.__name__, {})
+        for cle in {(v.__class__, v) for v in valeurs}.difference(table):
+            table[cle] = conversion(cle[1])
+        return [table[(v.__class__, v)] for v in valeurs]
+
+    def extract_student_block(self, lignes, idx_debut, ecue_codes, ue_codes):
+        """
+        Extrait un bloc de lignes (au moins aussi larges que l'en-tête) colonne
+        par colonne selon le plan. Retourne une liste alignée sur `lignes`,
+        avec None pour les lignes sans matricule.
+        """
+        plan = self.plan
+
+        def colonne(index, defaut, sources):
+            if index is None:
+                return [defaut] * len(sources)
+            return [ligne[index] for ligne in sources]
+
+        # Lignes retenues : celles qui ont un matricule
+        matricules = []
+        for valeur in colonne(plan.matricule, '', lignes):
+            matricule = '' if _est_vide(valeur) else str(valeur).strip()
+            matricules.append(None if not matricule or matricule == 'nan' else matricule)
+        retenues = [k for k, matricule in enumerate(matricules) if matricule is not None]
+        lignes_retenues = [lignes[k] for k in retenues]
+
+        decimal = lambda index, defaut=None: self._convertir_colonne(
+            colonne(index, defaut, lignes_retenues), self._safe_decimal)
+        entier = lambda index, defaut=None: self._convertir_colonne(
+            colonne(index, defaut, lignes_retenues), self._safe_int)
+        decision = lambda index: self._convertir_colonne(
+            colonne(index, None, lignes_retenues), self._extract_decision)
+
+        if plan.numero is not None:
+            # Valeurs toutes différentes : conversion directe, sans table partagée
+            numeros = [self._safe_int(valeur) for valeur in colonne(plan.numero, None, lignes_retenues)]
+        else:
+            numeros = [idx_debut + k + 1 for k in retenues]
+        noms = [
+            '' if _est_vide(valeur) else str(valeur).strip()
+            for valeur in colonne(plan.nom_prenom, '', lignes_retenues)
+        ]
+        moyennes = decimal(plan.moyenne_generale, 0)
+        credits = entier(plan.credits_acquis, 0)
+
+        colonnes_ecues = [
+            (decimal(bloc.cc), decimal(bloc.examen), decimal(bloc.moyenne),
+             entier(bloc.credit_attribue), decision(bloc.decision))
+            for bloc in plan.ecues
+        ]
+        colonnes_syntheses = [
+            (decimal(bloc.moyenne_ue), entier(bloc.credits_attribues), decision(bloc.decision))
+            for bloc in plan.syntheses
+        ]
+
+        etudiants = [None] * len(lignes)
+        for r, k in enumerate(retenues):
+            # Notes : seules les séquences non vides sont retenues, puis associées
+            # aux ECUE par ordre
             notes_par_ecue = []
+            for cc, ex, moy, ca, dec in colonnes_ecues:
+                if len(notes_par_ecue) == len(ecue_codes):
+                    break
+                if cc[r] is not None or ex[r] is not None or moy[r] is not None or ca[r] is not None or dec[r] is not None:
+                    notes_par_ecue.append({
+                        'cc': cc[r],
+                        'examen': ex[r],
+                        'moyenne': moy[r],
+                        'credit_attribue': ca[r],
+                        'decision': dec[r],
+                        'ecue_code': ecue_codes[len(notes_par_ecue)]
+                    })
+
+            # Synthèses : associées aux UE par ordre
             syntheses_par_ue = []
-
-            # Stratégie: parcourir TOUTES les colonnes CC et associer avec les ECUE par ordre
-            ecue_notes = []
-            synthese_ues = []
-
-            i = 0
-            while i < len(df.columns):
-                col_str = str(df.columns[i]).upper()
-
-                # Détecter séquence ECUE: CC, EX, MOY, [vide], CA, [vide], DECISION
-                if ('CC' == col_str or 'CC.' in col_str) and i + 6 < len(df.columns):
-                    next_cols = [str(df.columns[i+j]).upper() for j in range(1, 7)]
-
-                    # Vérifier: EX, MOY, ?, CA, ?, DECISION
-                    if 'EX' in next_cols[0] and 'MOY' in next_cols[1] and 'CA' in next_cols[3] and 'DECISION' in next_cols[5]:
-                        cc = self._safe_decimal(row.iloc[i])
-                        ex = self._safe_decimal(row.iloc[i+1])
-                        moy = self._safe_decimal(row.iloc[i+2])
-                        ca = self._safe_int(row.iloc[i+4])
-                        dec = self._extract_decision(row, df.columns[i+6])
-
-                        # Ajouter la note même si toutes les valeurs sont None (pour fidélité Excel)
-                        # On ajoute seulement si au moins une valeur n'est pas None
-                        if cc is not None or ex is not None or moy is not None or ca is not None or dec is not None:
-                            ecue_notes.append({
-                                'cc': cc,
-                                'examen': ex,
-                                'moyenne': moy,
-                                'credit_attribue': ca,
-                                'decision': dec
-                            })
-                        i += 7  # Sauter toute la séquence
-                        continue
-
-                # Détecter séquence SYNTHESE UE: MOY, [vide], CA, [vide], DECISION (sans CC/EX avant)
-                if i > 0 and ('MOY' in col_str) and i + 4 < len(df.columns):
-                    prev_col = str(df.columns[i-1]).upper()
-                    # Vérifier qu'il n'y a pas CC/EX juste avant
-                    if 'CC' not in prev_col and 'EX' not in prev_col:
-                        next_cols = [str(df.columns[i+j]).upper() for j in range(1, 5)]
-
-                        # Vérifier: ?, CA, ?, DECISION
-                        if ('CA' in next_cols[1] or 'UNNAMED' in next_cols[1]) and 'DECISION' in next_cols[3]:
-                            moy = self._safe_decimal(row.iloc[i])
-                            ca = self._safe_int(row.iloc[i+2])
-                            dec = self._extract_decision(row, df.columns[i+4])
-
-                            # Ajouter la synthèse seulement si au moins une valeur n'est pas None
-                            if moy is not None or ca is not None or dec is not None:
-                                synthese_ues.append({
-                                    'moyenne_ue': moy,
-                                    'credits_attribues': ca,
-                                    'decision': dec
-                                })
-                            i += 5
-                            continue
-
-                i += 1
-
-            # Associer les notes extraites aux ECUE par ordre
-            ecue_reelles = [e for e in self.ecues if not e.get('is_synthese', False)]
-            for idx_note, note in enumerate(ecue_notes):
-                if idx_note < len(ecue_reelles):
-                    note['ecue_code'] = ecue_reelles[idx_note]['code']
-                    notes_par_ecue.append(note)
-
-            # Associer les synthèses aux UE par ordre
-            for idx_synth, synthese in enumerate(synthese_ues):
-                if idx_synth < len(self.ues):
-                    synthese['ue_code'] = self.ues[idx_synth]['code']
-                    syntheses_par_ue.append(synthese)
-
-            etudiant_data = {
-                'numero': self._safe_int(numero),
-                'matricule': matricule,
-                'nom_prenom': nom_prenom,
-                'moyenne_generale': moyenne_generale,
-                'credits_acquis': credits_acquis,
-                'decision_generale': decision_generale,
+            for moy, ca, dec in colonnes_syntheses:
+                if len(syntheses_par_ue) == len(ue_codes):
+                    break
+                if moy[r] is not None or ca[r] is not None or dec[r] is not None:
+                    syntheses_par_ue.append({
+                        'moyenne_ue': moy[r],
+                        'credits_attribues': ca[r],
+                        'decision': dec[r],
+                        'ue_code': ue_codes[len(syntheses_par_ue)]
+                    })
+
+            etudiants[k] = {
+                'numero': numeros[r],
+                'matricule': matricules[k],
+                'nom_prenom': noms[r],
+                'moyenne_generale': moyennes[r],
+                'credits_acquis': credits[r],
+                'decision_generale': None,
                 'notes': notes_par_ecue,
                 'syntheses_ue': syntheses_par_ue
             }
 
-            self.etudiants.append(etudiant_data)
+        return etudiants
 
     def _safe_decimal(self, value):
         """Convertit en Decimal ou retourne None si vide"""
         try:
-            if pd.isna(value):
+            if _est_vide(value):
                 return None
             val = Decimal(str(value))
             # Si la valeur est 0, vérifier si c'est vraiment 0 ou juste vide
@@ -272,22 +541,17 @@ class PVExcelParser:
     def _safe_int(self, value):
         """Convertit en int ou retourne None si vide"""
         try:
-            if pd.isna(value):
-                return None
-            val = int(float(value))
-            # Si la valeur est 0, vérifier si c'est vraiment 0 ou juste vide
-            if val == 0 and (value == '' or pd.isna(value)):
+            if _est_vide(value):
                 return None
-            return val
+            return int(float(value))
         except:
             return None
 
-    def _extract_decision(self, row, column_name):
+    def _extract_decision(self, decision_val):
         """Extrait la décision ou retourne None si vide"""
         try:
-            decision_val = row.get(column_name)
             # Si la valeur est vide/NaN, retourner None
-            if pd.isna(decision_val) or decision_val == '' or decision_val == 'nan':
+            if _est_vide(decision_val) or decision_val == 'nan':
                 return None
 
             decision_val = str(decision_val).strip().upper()
@@ -303,3 +567,21 @@ class PVExcelParser:
                 return None
         except:
             return None
+
+
+def parser_fichier(chemin):
+    """
+    Parse toutes les feuilles PV d'un fichier en mode streaming, sans lever
+    d'exception.
+
+    Fonction de module sans dépendance à Django, exécutable dans un pool de
+    processus (voir pv.utils.lot). Retourne (feuilles, erreur, durée en
+    secondes), feuilles étant le résultat de parse_classeur() ou None en cas
+    d'erreur.
+    """
+    debut = time.perf_counter()
+    try:
+        feuilles, erreur = PVExcelParser(chemin).parse_classeur(), None
+    except Exception as e:
+        feuilles, erreur = None, str(e) or e.__class__.__name__
+    return feuilles, erreur, time.perf_counter() - debut
@@ -0,0 +1,118 @@
+"""
+Export Excel détaillé d'un PV (notes par ECUE, synthèses UE et générale)
+
+Le classeur est écrit en mode write-only : les lignes sont ajoutées dans
+l'ordre et envoyées au fichier temporaire de la feuille au fil de l'eau,
+sans garder de cellules en mémoire. Les étudiants sont lus par paquets
+(iterator avec préchargement des notes et synthèses), et chaque cellule
+référence un style nommé (voir pv.utils.styles_excel.FeuilleExport).
+
+Disposition : informations du PV en A1:A6, trois lignes d'en-têtes à partir
+de la ligne 8 (UE, ECUE et synthèses, détails CC/EX/MOY/CA/DEC), puis une
+ligne par étudiant.
+"""
+import openpyxl
+
+from .styles_excel import FeuilleExport
+from .tableau import ColonnesTableau, prefetch_tableau
+
+
+LIGNE_ENTETES = 8
+COLONNES_NOTE = ['CC', 'EX', 'MOY', 'CA', 'DEC']
+COLONNES_SYNTHESE = ['MOY', 'CRED', 'DEC']
+TAILLE_PAQUET = 200
+
+
+def _nombre(valeur):
+    """Valeur numérique de la cellule ; vide si absente ou nulle (comme l'export historique)"""
+    return float(valeur) if valeur else None
+
+
+def _entetes(feuille, ues):
+    """Les trois lignes d'en-têtes, et leurs fusions"""
+    lignes = [[None] * 3 for _ in range(3)]
+    for k, libelle in enumerate(['N°', 'MATRICULE', 'NOMS & PRÉNOMS']):
+        lignes[0][k] = (libelle, 'pv_entete_bleu')
+        feuille.fusionner(LIGNE_ENTETES, k + 1, LIGNE_ENTETES + 2, k + 1)
+
+    for ue in ues:
+        debut = len(lignes[0]) + 1
+        largeur = len(ue.ecues_affichees) * len(COLONNES_NOTE) + len(COLONNES_SYNTHESE)
+        lignes[0] += [(f"{ue.code} - {ue.intitule}", 'pv_entete_info')] + [None] * (largeur - 1)
+        feuille.fusionner(LIGNE_ENTETES, debut, LIGNE_ENTETES, debut + largeur - 1)
+
+        for ecue in ue.ecues_affichees:
+            colonne = len(lignes[1]) + 1
+            lignes[1] += [(f"{ecue.code} ({ecue.credits} crédits)", 'pv_entete_bleu')] + [None] * 4
+            lignes[2] += [(libelle, 'pv_entete_bleu') for libelle in COLONNES_NOTE]
+            feuille.fusionner(LIGNE_ENTETES + 1, colonne, LIGNE_ENTETES + 1, colonne + 4)
+
+        colonne = len(lignes[1]) + 1
+        lignes[1] += [(f"SYNTHÈSE UE {ue.code}", 'pv_entete_orange'), None, None]
+        lignes[2] += [(libelle, 'pv_entete_orange') for libelle in COLONNES_SYNTHESE]
+        feuille.fusionner(LIGNE_ENTETES + 1, colonne, LIGNE_ENTETES + 1, colonne + 2)
+
+    colonne = len(lignes[0]) + 1
+    lignes[0] += [("SYNTHÈSE GÉNÉRALE", 'pv_entete_vert'), None, None]
+    lignes[1] += [None] * 3
+    lignes[2] += [(libelle, 'pv_entete_vert') for libelle in COLONNES_SYNTHESE]
+    feuille.fusionner(LIGNE_ENTETES, colonne, LIGNE_ENTETES + 1, colonne + 2)
+
+    for ligne in lignes:
+        feuille.ajouter(feuille.cellule(*entete) if entete else None for entete in ligne)
+
+
+def _ligne_etudiant(etudiant, ues):
+    """Valeurs de la ligne d'un étudiant (notes et synthèses préchargées)"""
+    notes = {note.ecue_id: note for note in etudiant.notes.all()}
+    syntheses = {synthese.ue_id: synthese for synthese in etudiant.syntheses_ue.all()}
+    valeurs = [etudiant.numero, etudiant.matricule, etudiant.nom_prenom]
+    for ue in ues:
+        for ecue in ue.ecues_affichees:
+            note = notes.get(ecue.pk)
+            if note:
+                valeurs += [_nombre(note.cc), _nombre(note.examen), _nombre(note.moyenne),
+                            note.credit_attribue or None, note.decision or None]
+            else:
+                valeurs += [None] * len(COLONNES_NOTE)
+        synthese = syntheses.get(ue.pk)
+        if synthese:
+            valeurs += [_nombre(synthese.moyenne_ue), synthese.credits_attribues or None, synthese.decision or None]
+        else:
+            valeurs += [None] * len(COLONNES_SYNTHESE)
+    moyenne = float(etudiant.moyenne_generale) if etudiant.moyenne_generale is not None else None
+    valeurs += [moyenne, etudiant.credits_acquis, etudiant.get_decision_generale_display()]
+    return valeurs
+
+
+def ecrire_export_pv(pv, etudiants, fichier):
+    """
+    Écrit l'export détaillé des `etudiants` (queryset trié) du PV dans `fichier`
+    (chemin ou fichier binaire ouvert)
+    """
+    ues = ColonnesTableau(pv).ues
+    nb_notes = sum(len(ue.ecues_affichees) * len(COLONNES_NOTE) + len(COLONNES_SYNTHESE) for ue in ues)
+    wb = openpyxl.Workbook(write_only=True)
+    feuille = FeuilleExport(wb, "PV Export", largeurs=[5, 15, 35] + [8] * (nb_notes + 3))
+
+    informations = [
+        'UNIVERSITÉ DE DOUALA',
+        'École Nationale Supérieure Polytechnique de Douala',
+        f"Filière: {pv.filiere}",
+        f"Niveau: {pv.niveau} - Semestre: {pv.semestre}",
+        f"Année académique: {pv.annee_academique}",
+    ]
+    if pv.formation:
+        informations.append(f"Formation: {pv.formation}")
+    for information in informations:
+        feuille.ecrire([information])
+    feuille.vide(LIGNE_ENTETES - 1 - feuille.ligne)
+
+    _entetes(feuille, ues)
+    # Toutes les cellules centrées, sauf les noms et prénoms
+    styles = ('pv_centre', 'pv_centre', None) + ('pv_centre',) * (nb_notes + 3)
+    for etudiant in prefetch_tableau(etudiants).iterator(chunk_size=TAILLE_PAQUET):
+        feuille.ecrire(_ligne_etudiant(etudiant, ues), styles)
+
+    wb.save(fichier)
+
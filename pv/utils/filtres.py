@@ -0,0 +1,182 @@
+"""
+Filtres des étudiants d'un PV, partagés par le dashboard, la grille AG Grid,
+les exports et l'impression
+
+Les paramètres GET (decision, ue, ecue, decision_ecue, search, moy_min,
+moy_max) sont normalisés en un FiltreEtudiants, compilé en queryset. Les
+listes d'ids d'étudiants obtenues sont gardées dans un cache LRU par
+(PV, version des données, filtre) : paginer dans le dashboard puis exporter
+la même sélection ne réexécute pas les jointures de filtrage.
+
+Plusieurs conditions ECUE se combinent en ET en répétant les paramètres,
+appariés dans l'ordre : ?ecue=A&decision_ecue=NV&ecue=B&decision_ecue=NV
+sélectionne les étudiants NV en A et NV en B. Chaque condition est un
+sous-select EXISTS corrélé sur les notes, sans jointure ni DISTINCT.
+"""
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from itertools import zip_longest
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from ..models import ECUE, Note
+
+
+def _valeurs(params, nom):
+    """Valeurs (nettoyées) d'un paramètre éventuellement répété"""
+    valeurs = params.getlist(nom) if hasattr(params, 'getlist') else [params.get(nom)]
+    return [(valeur or '').strip() for valeur in valeurs]
+
+
+class FiltreEtudiants(NamedTuple):
+    """Filtre normalisé (hashable : sert de clé de cache)"""
+    decision: str = ''
+    ue: str = ''
+    conditions_ecue: Tuple[Tuple[str, str], ...] = ()  # (code ECUE, décision ou '')
+    search: str = ''
+    moy_min: Optional[Decimal] = None
+    moy_max: Optional[Decimal] = None
+
+    @classmethod
+    def depuis_get(cls, params):
+        """Filtre à partir des paramètres GET ; une moyenne invalide est ignorée"""
+        def texte(nom):
+            valeurs = _valeurs(params, nom)
+            return valeurs[0] if valeurs else ''
+
+        def moyenne(nom):
+            try:
+                valeur = Decimal(texte(nom)) if texte(nom) else None
+            except InvalidOperation:
+                return None
+            # nan, Infinity : non comparables en base, ignorées comme les autres valeurs invalides
+            return valeur if valeur is not None and valeur.is_finite() else None
+
+        conditions = []
+        for code, decision in zip_longest(_valeurs(params, 'ecue'), _valeurs(params, 'decision_ecue')):
+            if code and (code, decision or '') not in conditions:
+                conditions.append((code, decision or ''))
+
+        return cls(
+            decision=texte('decision'),
+            ue=texte('ue'),
+            conditions_ecue=tuple(conditions),
+            search=texte('search'),
+            moy_min=moyenne('moy_min'),
+            moy_max=moyenne('moy_max'),
+        )
+
+    @property
+    def ecue(self):
+        """Code de la première condition ECUE (colonnes et formulaire du dashboard)"""
+        return self.conditions_ecue[0][0] if self.conditions_ecue else ''
+
+    @property
+    def decision_ecue(self):
+        return self.conditions_ecue[0][1] if self.conditions_ecue else ''
+
+    @property
+    def codes_ecue(self):
+        """Codes des ECUE filtrées, dans l'ordre des conditions"""
+        return list(dict.fromkeys(code for code, _ in self.conditions_ecue))
+
+    @property
+    def filtre_etudiants(self):
+        """Le filtre restreint-il la liste des étudiants ? (`ue` ne change que les colonnes)"""
+        return any(valeur not in ('', (), None) for valeur in self._replace(ue=''))
+
+    def contexte(self):
+        """Valeurs des champs du formulaire de filtres, pour les templates"""
+        return {
+            'decision_filter': self.decision,
+            'ue_filter': self.ue,
+            'ecue_filter': self.ecue,
+            'decision_ecue_filter': self.decision_ecue,
+            'search_query': self.search,
+            'moy_min': '' if self.moy_min is None else self.moy_min,
+            'moy_max': '' if self.moy_max is None else self.moy_max,
+        }
+
+    def queryset(self, pv):
+        """Étudiants du PV correspondant au filtre (non triés, sans doublons)"""
+        etudiants = pv.etudiants.all()
+        if self.decision:
+            etudiants = etudiants.filter(decision_generale=self.decision)
+        if self.search:
+            etudiants = etudiants.filter(Q(nom_prenom__icontains=self.search) | Q(matricule__icontains=self.search))
+        if self.moy_min is not None:
+            etudiants = etudiants.filter(moyenne_generale__gte=self.moy_min)
+        if self.moy_max is not None:
+            etudiants = etudiants.filter(moyenne_generale__lte=self.moy_max)
+        for code, decision in self.conditions_ecue:
+            # ECUE du PV en sous-select non corrélé : évalué une fois, pas par étudiant
+            ecues = ECUE.objects.filter(ue__pv=pv, code=code).values('pk')
+            notes = Note.objects.filter(etudiant=OuterRef('pk'), ecue__in=ecues)
+            if decision:
+                notes = notes.filter(decision=decision)
+            etudiants = etudiants.filter(Exists(notes))
+        return etudiants
+
+
+class CacheLRU:
+    """Cache LRU borné, partagé par les threads du processus"""
+
+    def __init__(self, taille):
+        self.taille = taille
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            if cle not in self._entrees:
+                return None
+            self._entrees.move_to_end(cle)
+            return self._entrees[cle]
+
+    def set(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def clear(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+_selections = CacheLRU(getattr(settings, 'PV_FILTRES_CACHE_TAILLE', 128))
+
+
+def requete_cles(pv, filtre):
+    """Requête des clés (numero, pk) des étudiants sélectionnés par le filtre, triées"""
+    return filtre.queryset(pv).order_by('numero', 'pk').values_list('numero', 'pk')
+
+
+def cles_etudiants(pv, filtre):
+    """Clés (numero, pk) des étudiants sélectionnés par le filtre, triées (cache LRU)"""
+    cle = (pv.pk, pv.version_donnees, filtre)
+    cles = _selections.get(cle)
+    if cles is None:
+        cles = tuple(requete_cles(pv, filtre))
+        _selections.set(cle, cles)
+    return cles
+
+
+def ids_etudiants(pv, filtre):
+    """Ids des étudiants sélectionnés par le filtre, par numéro"""
+    return tuple(pk for _, pk in cles_etudiants(pv, filtre))
+
+
+def etudiants_filtres(pv, filtre):
+    """
+    Queryset des étudiants sélectionnés par le filtre, à trier et précharger
+    par l'appelant. Sans filtre, tous les étudiants du PV ; sinon, les ids en
+    cache, sans rejouer les jointures du filtre.
+    """
+    if not filtre.filtre_etudiants:
+        return pv.etudiants.all()
+    return pv.etudiants.filter(pk__in=ids_etudiants(pv, filtre))
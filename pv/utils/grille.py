@@ -0,0 +1,207 @@
+"""
+Données du dashboard AG Grid, servies par fenêtres de lignes
+
+Chaque étudiant devient une ligne à plat : colonnes fixes (numero, matricule,
+nom_prenom, moyenne_generale, credits_acquis, decision_generale), colonnes
+des notes `ecue_<code>_<cc|ex|moy|ca|dec>` et des synthèses
+`ue_<code>_<moy|cred|dec>`, comme dans les columnDefs de
+dashboard_aggrid.html.
+
+Le sortModel et le filterModel envoyés par la grille (modèle de lignes
+« infinite » : startRow, endRow, sortModel, filterModel) sont traduits en
+filtres et tris de l'ORM ; seules les lignes de la fenêtre demandée sont
+lues en base.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Subquery
+
+from ..models import Etudiant, Note, SyntheseUE
+
+
+# Nombre maximal de lignes servies par requête
+TAILLE_FENETRE_MAX = 500
+
+COLONNES_ETUDIANT = {
+    'numero': 'numero',
+    'matricule': 'matricule',
+    'nom_prenom': 'nom_prenom',
+    'moyenne_generale': 'moyenne_generale',
+    'credits_acquis': 'credits_acquis',
+    'decision_generale': 'decision_generale',
+}
+COLONNES_NOTE = {'cc': 'cc', 'ex': 'examen', 'moy': 'moyenne', 'ca': 'credit_attribue', 'dec': 'decision'}
+COLONNES_SYNTHESE = {'moy': 'moyenne_ue', 'cred': 'credits_attribues', 'dec': 'decision'}
+
+# Conditions des filtres texte et nombre d'AG Grid
+CONDITIONS = {
+    'equals': ('exact', False),
+    'notEqual': ('exact', True),
+    'contains': ('icontains', False),
+    'notContains': ('icontains', True),
+    'startsWith': ('istartswith', False),
+    'endsWith': ('iendswith', False),
+    'lessThan': ('lt', False),
+    'lessThanOrEqual': ('lte', False),
+    'greaterThan': ('gt', False),
+    'greaterThanOrEqual': ('gte', False),
+}
+
+
+def _nombre(valeur):
+    return float(valeur) if valeur is not None else None
+
+
+def ligne_grille(etudiant):
+    """Ligne à plat d'un étudiant (notes et synthèses préchargées)"""
+    ligne = {
+        'id': etudiant.pk,
+        'numero': etudiant.numero,
+        'matricule': etudiant.matricule,
+        'nom_prenom': etudiant.nom_prenom,
+        'moyenne_generale': _nombre(etudiant.moyenne_generale),
+        'credits_acquis': etudiant.credits_acquis,
+        'decision_generale': etudiant.decision_generale,
+    }
+    for note in etudiant.notes.all():
+        prefixe = f'ecue_{note.ecue.code}'
+        ligne[f'{prefixe}_cc'] = _nombre(note.cc)
+        ligne[f'{prefixe}_ex'] = _nombre(note.examen)
+        ligne[f'{prefixe}_moy'] = _nombre(note.moyenne)
+        ligne[f'{prefixe}_ca'] = note.credit_attribue
+        ligne[f'{prefixe}_dec'] = note.decision
+    for synthese in etudiant.syntheses_ue.all():
+        prefixe = f'ue_{synthese.ue.code}'
+        ligne[f'{prefixe}_moy'] = _nombre(synthese.moyenne_ue)
+        ligne[f'{prefixe}_cred'] = synthese.credits_attribues
+        ligne[f'{prefixe}_dec'] = synthese.decision
+    return ligne
+
+
+class ColonnesGrille:
+    """Résolution des identifiants de colonnes de la grille pour un PV"""
+
+    def __init__(self, pv):
+        self.pv = pv
+        self._codes = None
+
+    def codes(self):
+        """(codes UE, codes ECUE) du PV, lus en une requête à la première résolution"""
+        if self._codes is None:
+            paires = list(self.pv.ues.values_list('code', 'ecues__code'))
+            self._codes = ({ue for ue, _ in paires}, {ecue for _, ecue in paires if ecue})
+        return self._codes
+
+    def resoudre(self, colonne):
+        """
+        (modèle, code, champ) d'une colonne : modèle None pour un champ de
+        l'étudiant, Note ou SyntheseUE sinon. ValueError si la colonne est inconnue.
+        """
+        if colonne in COLONNES_ETUDIANT:
+            return None, None, COLONNES_ETUDIANT[colonne]
+        prefixe, _, reste = colonne.partition('_')
+        code, _, suffixe = reste.rpartition('_')
+        codes_ue, codes_ecue = self.codes()
+        if prefixe == 'ecue' and code in codes_ecue and suffixe in COLONNES_NOTE:
+            return Note, code, COLONNES_NOTE[suffixe]
+        if prefixe == 'ue' and code in codes_ue and suffixe in COLONNES_SYNTHESE:
+            return SyntheseUE, code, COLONNES_SYNTHESE[suffixe]
+        raise ValueError(f"Colonne inconnue : {colonne}")
+
+
+def _lignes_liees(modele, code):
+    """Note (ou synthèse UE) de l'étudiant courant pour un code ECUE (ou UE)"""
+    if modele is Note:
+        return Note.objects.filter(etudiant=OuterRef('pk'), ecue__code=code)
+    return SyntheseUE.objects.filter(etudiant=OuterRef('pk'), ue__code=code)
+
+
+# Recherches textuelles : la valeur reste une chaîne, quel que soit le type du champ
+LOOKUPS_TEXTE = {'icontains', 'istartswith', 'iendswith'}
+
+
+def _valeur(champ_modele, valeur):
+    """Valeur d'un filtre convertie selon le type du champ ; ValueError si invalide"""
+    try:
+        return champ_modele.to_python(valeur)
+    except ValidationError:
+        raise ValueError(f"Valeur de filtre invalide pour {champ_modele.name} : {valeur!r}")
+
+
+def _condition(champ_modele, condition):
+    """Q d'une condition de filtre AG Grid sur le champ `champ_modele`"""
+    champ = champ_modele.name
+    type_condition = condition.get('type')
+    if type_condition == 'blank':
+        return Q(**{f'{champ}__isnull': True})
+    if type_condition == 'notBlank':
+        return Q(**{f'{champ}__isnull': False})
+    if type_condition == 'inRange':
+        return Q(**{f'{champ}__gte': _valeur(champ_modele, condition.get('filter')),
+                    f'{champ}__lte': _valeur(champ_modele, condition.get('filterTo'))})
+    if type_condition not in CONDITIONS:
+        raise ValueError(f"Condition de filtre non prise en charge : {type_condition}")
+    lookup, negation = CONDITIONS[type_condition]
+    valeur = condition.get('filter')
+    if lookup not in LOOKUPS_TEXTE:
+        valeur = _valeur(champ_modele, valeur)
+    q = Q(**{f'{champ}__{lookup}': valeur})
+    return ~q if negation else q
+
+
+def _filtre(champ_modele, modele_filtre):
+    """Q d'un filtre de colonne, simple ou combiné (operator + conditions)"""
+    conditions = modele_filtre.get('conditions')
+    if conditions is None and 'condition1' in modele_filtre:
+        conditions = [modele_filtre['condition1'], modele_filtre['condition2']]
+    if conditions is None:
+        return _condition(champ_modele, modele_filtre)
+
+    q = Q()
+    for condition in conditions:
+        if modele_filtre.get('operator') == 'OR':
+            q |= _condition(champ_modele, condition)
+        else:
+            q &= _condition(champ_modele, condition)
+    return q
+
+
+def appliquer_modeles(etudiants, colonnes, sort_model=None, filter_model=None):
+    """Applique le filterModel et le sortModel d'AG Grid au queryset des étudiants"""
+    for colonne, modele_filtre in (filter_model or {}).items():
+        modele, code, champ = colonnes.resoudre(colonne)
+        filtre = _filtre((modele or Etudiant)._meta.get_field(champ), modele_filtre)
+        if modele is None:
+            etudiants = etudiants.filter(filtre)
+        else:
+            etudiants = etudiants.filter(Exists(_lignes_liees(modele, code).filter(filtre)))
+
+    tri = []
+    for k, critere in enumerate(sort_model or []):
+        modele, code, champ = colonnes.resoudre(critere['colId'])
+        if modele is not None:
+            alias = f'tri_{k}'
+            etudiants = etudiants.annotate(**{alias: Subquery(_lignes_liees(modele, code).values(champ)[:1])})
+            champ = alias
+        expression = F(champ)
+        tri.append(expression.desc(nulls_last=True) if critere.get('sort') == 'desc'
+                   else expression.asc(nulls_last=True))
+    return etudiants.order_by(*tri, 'numero', 'pk')
+
+
+def fenetre_grille(pv, debut=0, fin=100, sort_model=None, filter_model=None, etudiants=None):
+    """
+    Lignes [debut, fin[ des étudiants du PV (ou du queryset `etudiants`, déjà
+    restreint par les filtres de la page) après filtres et tris de la grille.
+    Retourne {'rows', 'lastRow'} (nombre total de lignes filtrées).
+    """
+    debut = max(int(debut), 0)
+    fin = min(max(int(fin), debut), debut + TAILLE_FENETRE_MAX)
+    if etudiants is None:
+        etudiants = pv.etudiants.all()
+    etudiants = appliquer_modeles(etudiants, ColonnesGrille(pv), sort_model, filter_model)
+
+    fenetre = etudiants.prefetch_related(
+        Prefetch('notes', queryset=Note.objects.select_related('ecue')),
+        Prefetch('syntheses_ue', queryset=SyntheseUE.objects.select_related('ue')),
+    )[debut:fin]
+    return {'rows': [ligne_grille(etudiant) for etudiant in fenetre], 'lastRow': etudiants.count()}
@@ -0,0 +1,223 @@
+"""
+Import en base d'un PV parsé par PVExcelParser, par insertions groupées
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import ProcesVerbal, UE, ECUE, Etudiant, Note, SyntheseUE
+from .resultats import mettre_a_jour_resultats_pv
+from .statistiques import rafraichir_statistiques_pv
+
+
+logger = logging.getLogger(__name__)
+
+
+class PVImporter:
+    """
+    Écrit un PV (dictionnaire retourné par PVExcelParser.parse()) en base.
+
+    Toutes les lignes sont construites en mémoire puis insérées avec
+    bulk_create par lots de `batch_size`, dans l'ordre des dépendances :
+    PV, UE, ECUE, étudiants, puis notes et synthèses UE.
+    La durée de chaque phase est disponible dans `timings` (en secondes), et
+    journalisée après chaque import si PV_IMPORT_JOURNAL_DUREES est activé.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'PV_IMPORT_BATCH_SIZE', 500)
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, nom):
+        """Chronomètre une phase de l'import"""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[nom] = self.timings.get(nom, 0) + time.perf_counter() - debut
+
+    def rapport(self):
+        """Résumé lisible des durées par phase"""
+        total = sum(self.timings.values())
+        details = ', '.join(f"{nom} {duree * 1000:.0f} ms" for nom, duree in self.timings.items())
+        return f"{total * 1000:.0f} ms ({details})"
+
+    def importer(self, data, pv=None, progression=None):
+        """
+        Crée le ProcesVerbal (ou complète l'instance `pv` non sauvegardée, par
+        exemple issue de PVUploadForm) et toutes ses lignes dans une transaction.
+        Retourne le ProcesVerbal.
+
+        `progression`, si fourni, est appelé après chaque insertion groupée avec
+        le nombre de lignes étudiants, notes et synthèses déjà écrites.
+        """
+        pv = pv if pv is not None else ProcesVerbal()
+        progression = progression or (lambda lignes_ecrites: None)
+
+        with transaction.atomic():
+            with self.phase('pv'):
+                metadata = data['metadata']
+                pv.filiere = metadata['filiere']
+                pv.niveau = metadata['niveau']
+                pv.semestre = metadata['semestre']
+                pv.annee_academique = metadata['annee_academique']
+                pv.formation = metadata.get('formation', '')
+                pv.save()
+
+            with self.phase('ues'):
+                ue_objects = self._creer_ues(pv, data['ues'])
+
+            with self.phase('ecues'):
+                ecue_objects = self._creer_ecues(data['ecues'], ue_objects)
+
+            with self.phase('etudiants'):
+                etudiants = self._creer_etudiants(pv, data['etudiants'])
+            progression(len(etudiants))
+
+            with self.phase('notes'):
+                notes = self._creer_notes(data['etudiants'], etudiants, ecue_objects)
+            progression(len(etudiants) + len(notes))
+
+            with self.phase('syntheses'):
+                syntheses = self._creer_syntheses(data['etudiants'], etudiants, ue_objects)
+            progression(len(etudiants) + len(notes) + len(syntheses))
+
+            with self.phase('resultats'):
+                self._calculer_resultats(pv, etudiants, notes, ecue_objects)
+
+            with self.phase('statistiques'):
+                rafraichir_statistiques_pv(pv)
+
+        if getattr(settings, 'PV_IMPORT_JOURNAL_DUREES', False):
+            logger.info(
+                "Import PV %s : %d étudiants en %s",
+                pv.pk, len(etudiants), self.rapport()
+            )
+        return pv
+
+    def importer_classeur(self, feuilles, fichier='', empreinte='', progression=None):
+        """
+        Importe les feuilles PV d'un classeur (résultat de
+        PVExcelParser.parse_classeur) : un ProcesVerbal par feuille, tous
+        rattachés au même `fichier` et à son empreinte SHA-256, dans une seule
+        transaction. Retourne la liste des ProcesVerbal.
+        """
+        if not feuilles:
+            raise ValueError("Aucune feuille PV trouvée dans le classeur")
+
+        pvs = []
+        ecrites = 0
+        with transaction.atomic():
+            for nom_feuille, data in feuilles:
+                pv = ProcesVerbal(
+                    fichier=fichier,
+                    nom_feuille=nom_feuille if len(feuilles) > 1 else None,
+                    empreinte_sha256=empreinte
+                )
+                suivi = progression and (lambda nombre, ecrites=ecrites: progression(ecrites + nombre))
+                pvs.append(self.importer(data, pv, progression=suivi))
+                ecrites += sum(1 + len(e['notes']) + len(e['syntheses_ue']) for e in data['etudiants'])
+        return pvs
+
+    def _creer_ues(self, pv, ues_data):
+        ues = UE.objects.bulk_create([
+            UE(pv=pv, code=ue_data['code'], intitule=ue_data['intitule'], ordre=ue_data['ordre'])
+            for ue_data in ues_data
+        ], batch_size=self.batch_size)
+        return {ue.code: ue for ue in ues}
+
+    def _creer_ecues(self, ecues_data, ue_objects):
+        ecues = []
+        for ecue_data in ecues_data:
+            # Ignorer les synthèses UE (elles ne sont pas des ECUE)
+            if ecue_data.get('is_synthese', False):
+                continue
+
+            ue_parent = ue_objects.get(ecue_data['ue_code'])
+            if ue_parent:
+                ecues.append(ECUE(
+                    ue=ue_parent,
+                    code=ecue_data['code'],
+                    intitule=ecue_data['intitule'],
+                    ordre=ecue_data['ordre']
+                ))
+        ecues = ECUE.objects.bulk_create(ecues, batch_size=self.batch_size)
+        return {ecue.code: ecue for ecue in ecues}
+
+    def _creer_etudiants(self, pv, etudiants_data):
+        # Moyenne, crédits et décision peuvent être vides : ils sont alors
+        # calculés après l'import des notes
+        return Etudiant.objects.bulk_create([
+            Etudiant(
+                pv=pv,
+                numero=etudiant_data['numero'],
+                matricule=etudiant_data['matricule'],
+                nom_prenom=etudiant_data['nom_prenom'],
+                moyenne_generale=etudiant_data.get('moyenne_generale'),
+                credits_acquis=etudiant_data.get('credits_acquis'),
+                decision_generale=etudiant_data.get('decision_generale')
+            )
+            for etudiant_data in etudiants_data
+        ], batch_size=self.batch_size)
+
+    def _creer_notes(self, etudiants_data, etudiants, ecue_objects):
+        notes = []
+        for etudiant_data, etudiant in zip(etudiants_data, etudiants):
+            for note_data in etudiant_data['notes']:
+                ecue = ecue_objects.get(note_data['ecue_code'])
+                if ecue:
+                    notes.append(Note(
+                        etudiant=etudiant,
+                        ecue=ecue,
+                        cc=note_data.get('cc'),
+                        examen=note_data.get('examen'),
+                        moyenne=note_data.get('moyenne'),
+                        credit_attribue=note_data.get('credit_attribue'),
+                        decision=note_data.get('decision')
+                    ))
+        return Note.objects.bulk_create(notes, batch_size=self.batch_size)
+
+    def _creer_syntheses(self, etudiants_data, etudiants, ue_objects):
+        syntheses = []
+        for etudiant_data, etudiant in zip(etudiants_data, etudiants):
+            for synthese_data in etudiant_data.get('syntheses_ue', []):
+                ue = ue_objects.get(synthese_data['ue_code'])
+                if ue:
+                    syntheses.append(SyntheseUE(
+                        etudiant=etudiant,
+                        ue=ue,
+                        moyenne_ue=synthese_data.get('moyenne_ue'),
+                        credits_attribues=synthese_data.get('credits_attribues'),
+                        decision=synthese_data.get('decision')
+                    ))
+        return SyntheseUE.objects.bulk_create(syntheses, batch_size=self.batch_size)
+
+    def _calculer_resultats(self, pv, etudiants, notes, ecue_objects):
+        """
+        Calcule les résultats des étudiants dont la moyenne ou la décision est
+        vide dans le fichier, à partir des notes encore en mémoire
+        """
+        a_calculer = [
+            etudiant for etudiant in etudiants
+            if etudiant.moyenne_generale is None or etudiant.decision_generale is None
+        ]
+        if not a_calculer:
+            return
+
+        notes_par_etudiant = defaultdict(list)
+        for note in notes:
+            notes_par_etudiant[note.etudiant.pk].append((note.moyenne, note.ecue.credits, note.decision))
+
+        mettre_a_jour_resultats_pv(
+            pv,
+            etudiants=a_calculer,
+            notes_par_etudiant=notes_par_etudiant,
+            credits_totaux=sum(ecue.credits for ecue in ecue_objects.values()),
+            batch_size=self.batch_size,
+            statistiques=False
+        )
@@ -0,0 +1,213 @@
+"""
+Import d'un lot de fichiers PV (dossier ou archive ZIP)
+
+Les classeurs sont parsés en parallèle dans un pool de processus : l'analyse
+XML d'openpyxl est limitée par le CPU, et donc par le GIL dans un même
+processus. Les écritures en base passent par un seul écrivain, le processus
+principal, qui importe les PV un par un au fil des parses terminés.
+
+L'extraction d'une archive est bornée (PV_LOT_TAILLE_FICHIER_MAX,
+PV_LOT_TAILLE_TOTALE_MAX, PV_LOT_FICHIERS_MAX) : une archive qui dépasse une
+limite, tailles annoncées ou octets réellement décompressés, est refusée.
+"""
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .empreintes import ecrire_cache, empreinte_fichier, lire_cache, pvs_existants
+from .excel_parser import parser_fichier
+from .importer import PVImporter
+
+
+EXTENSIONS_PV = ('.xlsx', '.xls')
+TAILLE_COPIE = 1024 * 1024
+
+
+def est_fichier_pv(nom):
+    """Classeur PV, hors fichiers temporaires d'Excel et métadonnées macOS"""
+    base = os.path.basename(nom)
+    return (
+        base.lower().endswith(EXTENSIONS_PV)
+        and not base.startswith(('~$', '.'))
+        and '__MACOSX' not in nom
+    )
+
+
+def _limites_zip():
+    return (
+        getattr(settings, 'PV_LOT_TAILLE_FICHIER_MAX', 10 * 1024 * 1024),
+        getattr(settings, 'PV_LOT_TAILLE_TOTALE_MAX', 200 * 1024 * 1024),
+        getattr(settings, 'PV_LOT_FICHIERS_MAX', 100),
+    )
+
+
+def _copier_borne(source, destination, limite, nom):
+    """Copie au plus `limite` octets ; ValueError si la source en contient davantage"""
+    copies = 0
+    while True:
+        bloc = source.read(TAILLE_COPIE)
+        if not bloc:
+            return copies
+        copies += len(bloc)
+        if copies > limite:
+            raise ValueError(f"{nom} : fichier trop volumineux une fois décompressé")
+        destination.write(bloc)
+
+
+def extraire_zip(archive, dossier):
+    """
+    Extrait les classeurs PV d'une archive ZIP (chemin ou fichier ouvert) dans
+    `dossier`, sans reprendre l'arborescence de l'archive. Retourne les chemins.
+
+    ValueError si l'archive dépasse le nombre de classeurs, la taille
+    décompressée par classeur ou la taille décompressée totale autorisés.
+    """
+    taille_fichier_max, taille_totale_max, nb_fichiers_max = _limites_zip()
+    chemins = []
+    total = 0
+    with zipfile.ZipFile(archive) as zf:
+        membres = [info for info in zf.infolist() if not info.is_dir() and est_fichier_pv(info.filename)]
+        if len(membres) > nb_fichiers_max:
+            raise ValueError(f"L'archive contient plus de {nb_fichiers_max} fichiers PV")
+        # Tailles annoncées par l'archive, vérifiées avant toute extraction
+        for info in membres:
+            if info.file_size > taille_fichier_max:
+                raise ValueError(f"{info.filename} : le fichier ne doit pas dépasser "
+                                 f"{taille_fichier_max // (1024 * 1024)} MB une fois décompressé")
+        if sum(info.file_size for info in membres) > taille_totale_max:
+            raise ValueError(f"L'archive ne doit pas dépasser "
+                             f"{taille_totale_max // (1024 * 1024)} MB une fois décompressée")
+
+        for info in membres:
+            nom = os.path.basename(info.filename)
+            chemin = os.path.join(dossier, nom)
+            k = 1
+            while os.path.exists(chemin):
+                racine, extension = os.path.splitext(nom)
+                chemin = os.path.join(dossier, f"{racine}_{k}{extension}")
+                k += 1
+            # Octets réellement décompressés : les tailles annoncées peuvent mentir
+            limite = min(taille_fichier_max, taille_totale_max - total)
+            with zf.open(info) as source, open(chemin, 'wb') as destination:
+                total += _copier_borne(source, destination, limite, info.filename)
+            chemins.append(chemin)
+    return chemins
+
+
+def fichiers_pv(source, dossier_extraction):
+    """
+    Fichiers PV d'une source : dossier (parcouru récursivement), archive ZIP
+    (extraite dans dossier_extraction) ou classeur seul
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(racine, nom)
+            for racine, _, noms in os.walk(source)
+            for nom in noms if est_fichier_pv(os.path.join(racine, nom))
+        )
+    if zipfile.is_zipfile(source):
+        return extraire_zip(source, dossier_extraction)
+    return [source]
+
+
+def parser_en_parallele(chemins, processus=None):
+    """
+    Parse les fichiers dans un pool de processus et génère
+    (chemin, feuilles, erreur, durée de lecture) dans l'ordre de fin des parses
+    """
+    processus = processus or getattr(settings, 'PV_IMPORT_PROCESSUS', None) or os.cpu_count() or 1
+    processus = min(processus, len(chemins))
+
+    if processus <= 1:
+        for chemin in chemins:
+            yield (chemin, *parser_fichier(chemin))
+        return
+
+    # 'spawn' : le pool peut être créé depuis un thread du serveur web
+    # (PV_IMPORT_MODE = 'thread'), où un fork copierait verrous et connexions
+    with ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(parser_fichier, chemin): chemin for chemin in chemins}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+def parser_avec_cache(empreintes, processus=None):
+    """
+    Comme parser_en_parallele, pour {chemin: empreinte SHA-256} : les fichiers
+    présents dans le cache de parse sont servis depuis le cache, les autres
+    parsés en parallèle puis mis en cache.
+    """
+    a_parser = []
+    for chemin, empreinte in empreintes.items():
+        debut = time.perf_counter()
+        feuilles = lire_cache(empreinte)
+        if feuilles is None:
+            a_parser.append(chemin)
+        else:
+            yield chemin, feuilles, None, time.perf_counter() - debut
+
+    for chemin, feuilles, erreur, lecture in parser_en_parallele(a_parser, processus):
+        if feuilles is not None:
+            ecrire_cache(empreintes[chemin], feuilles)
+        yield chemin, feuilles, erreur, lecture
+
+
+def importer_lot(chemins, processus=None, batch_size=None):
+    """
+    Importe un lot de fichiers PV. Une erreur sur un fichier n'interrompt pas
+    les autres ; un fichier identique à un fichier déjà importé (même empreinte
+    SHA-256) n'est pas réimporté.
+
+    Retourne (résultats, durée totale en secondes), un résultat par fichier dans
+    l'ordre de `chemins` : {'fichier', 'pvs' (un par feuille), 'etudiants',
+    'lecture', 'ecriture', 'erreur', 'doublon'}.
+    """
+    debut = time.perf_counter()
+    resultats = {}
+    empreintes = {}
+    copies = {}  # fichier en double dans le lot -> premier fichier identique
+
+    for chemin in chemins:
+        empreinte = empreinte_fichier(chemin)
+        existants = pvs_existants(empreinte)
+        if existants:
+            resultats[chemin] = {
+                'fichier': chemin, 'pvs': existants, 'etudiants': 0,
+                'lecture': 0, 'ecriture': 0, 'erreur': None, 'doublon': True,
+            }
+        elif empreinte in empreintes.values():
+            copies[chemin] = next(c for c, e in empreintes.items() if e == empreinte)
+        else:
+            empreintes[chemin] = empreinte
+
+    for chemin, feuilles, erreur, lecture in parser_avec_cache(empreintes, processus):
+        resultat = {
+            'fichier': chemin, 'pvs': [], 'etudiants': 0,
+            'lecture': lecture, 'ecriture': 0, 'erreur': erreur, 'doublon': False,
+        }
+        if feuilles is not None:
+            importer = PVImporter(batch_size)
+            fichier = None
+            try:
+                with open(chemin, 'rb') as f:
+                    fichier = default_storage.save(f"pv/{os.path.basename(chemin)}", File(f))
+                resultat['pvs'] = importer.importer_classeur(feuilles, fichier, empreintes[chemin])
+                resultat['etudiants'] = sum(len(data['etudiants']) for _, data in feuilles)
+            except Exception as e:
+                resultat['erreur'] = str(e)
+                if fichier:
+                    default_storage.delete(fichier)
+            resultat['ecriture'] = sum(importer.timings.values())
+        resultats[chemin] = resultat
+
+    for chemin, original in copies.items():
+        resultats[chemin] = dict(resultats[original], fichier=chemin, etudiants=0,
+                                 lecture=0, ecriture=0, doublon=True)
+
+    return [resultats[chemin] for chemin in chemins], time.perf_counter() - debut
@@ -0,0 +1,54 @@
+"""
+Pagination du dashboard sur les clés en cache de la sélection
+
+La sélection d'un filtre est gardée triée sous forme de clés (numero, pk)
+(voir pv.utils.filtres.cles_etudiants) : le nombre total d'étudiants est sa
+longueur, et une page est la tranche de clés correspondante, lue par clé
+primaire, sans COUNT ni OFFSET. La page 50 coûte la même requête que la
+page 1.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .filtres import cles_etudiants
+
+
+TAILLE_PAGE_DEFAUT = 20
+
+
+def taille_page(valeur, defaut=TAILLE_PAGE_DEFAUT):
+    """Taille de page demandée, bornée à PV_PAGE_TAILLE_MAX ; défaut si invalide"""
+    try:
+        taille = int(valeur)
+    except (TypeError, ValueError):
+        return defaut
+    return min(max(taille, 1), getattr(settings, 'PV_PAGE_TAILLE_MAX', 100))
+
+
+class PaginateurEtudiants(Paginator):
+    """
+    Paginator des étudiants d'un PV sélectionnés par un FiltreEtudiants.
+    `etudiants` est le queryset de base des pages (préchargements compris).
+    """
+
+    def __init__(self, pv, filtre, per_page, etudiants=None):
+        self.pv = pv
+        self.filtre = filtre
+        if etudiants is None:
+            etudiants = pv.etudiants.all()
+        super().__init__(etudiants.order_by('numero', 'pk'), per_page)
+
+    @cached_property
+    def cles(self):
+        return cles_etudiants(self.pv, self.filtre)
+
+    @cached_property
+    def count(self):
+        return len(self.cles)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        debut = (number - 1) * self.per_page
+        ids = [pk for _, pk in self.cles[debut:debut + self.per_page]]
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
@@ -0,0 +1,215 @@
+"""
+Réimport d'un PV corrigé dans un PV existant
+
+Les étudiants sont rapprochés par matricule, les notes par (étudiant, code
+ECUE) et les synthèses par (étudiant, code UE). Seules les lignes ajoutées,
+modifiées ou supprimées sont écrites, par requêtes groupées, puis les
+résultats des seuls étudiants concernés sont recalculés.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import ECUE, Etudiant, Note, SyntheseUE
+from .cache_pv import invalider_caches_pv
+from .resultats import mettre_a_jour_resultats_pv
+from .statistiques import rafraichir_statistiques_pv
+
+
+CHAMPS_ETUDIANT = ('numero', 'nom_prenom', 'moyenne_generale', 'credits_acquis', 'decision_generale')
+CHAMPS_NOTE = ('cc', 'examen', 'moyenne', 'credit_attribue', 'decision')
+CHAMPS_SYNTHESE = ('moyenne_ue', 'credits_attribues', 'decision')
+
+CENTIEME = Decimal('0.01')
+
+
+def _normaliser(valeur):
+    """Valeur du fichier telle qu'elle est relue en base (décimaux à 2 chiffres)"""
+    if isinstance(valeur, Decimal):
+        return valeur.quantize(CENTIEME)
+    return valeur
+
+
+def _appliquer(objet, valeurs, champs):
+    """Reporte les valeurs du fichier sur l'objet ; retourne True s'il a changé"""
+    modifie = False
+    for champ in champs:
+        valeur = _normaliser(valeurs.get(champ))
+        if getattr(objet, champ) != valeur:
+            setattr(objet, champ, valeur)
+            modifie = True
+    return modifie
+
+
+def choisir_feuille(pv, feuilles):
+    """Données de la feuille correspondant au PV (même nom de feuille)"""
+    if pv.nom_feuille:
+        for nom_feuille, data in feuilles:
+            if nom_feuille == pv.nom_feuille:
+                return data
+        raise ValueError(f"Feuille {pv.nom_feuille} absente du fichier")
+    if len(feuilles) != 1:
+        raise ValueError(f"Le fichier contient {len(feuilles)} PV : impossible de choisir celui à réimporter")
+    return feuilles[0][1]
+
+
+class DiffPV:
+    """Compteurs ajoutés / modifiés / supprimés d'un réimport"""
+
+    def __init__(self):
+        self.compteurs = {
+            modele: {'ajoutes': 0, 'modifies': 0, 'supprimes': 0}
+            for modele in ('etudiants', 'notes', 'syntheses')
+        }
+        self.resultats_recalcules = 0
+
+    @property
+    def lignes(self):
+        return sum(sum(compteurs.values()) for compteurs in self.compteurs.values())
+
+    def resume(self):
+        return dict(self.compteurs, resultats_recalcules=self.resultats_recalcules, lignes=self.lignes)
+
+
+def texte_resume(resume):
+    """Résumé lisible d'un réimport, ex. "3 notes modifiées, 1 étudiant ajouté" """
+    libelles = {'etudiants': ('étudiant', 'étudiants'), 'notes': ('note', 'notes'),
+                'syntheses': ('synthèse UE', 'synthèses UE')}
+    actions = {'ajoutes': 'ajouté', 'modifies': 'modifié', 'supprimes': 'supprimé'}
+    morceaux = []
+    for modele, (singulier, pluriel) in libelles.items():
+        for action, participe in actions.items():
+            nombre = resume.get(modele, {}).get(action, 0)
+            if nombre:
+                feminin = 'e' if modele != 'etudiants' else ''
+                pluriel_participe = 's' if nombre > 1 else ''
+                morceaux.append(
+                    f"{nombre} {pluriel if nombre > 1 else singulier} {participe}{feminin}{pluriel_participe}"
+                )
+    return ', '.join(morceaux) or "aucune modification"
+
+
+def _diff_lignes(data, etudiants, existantes, cibles, cle_lignes, cle_code, champ_cible, modele, champs,
+                 exclus, batch_size):
+    """
+    Rapproche les lignes d'un type (notes ou synthèses UE) du fichier de celles
+    en base, indexées par (etudiant_id, id de l'ECUE ou de l'UE), et écrit les
+    différences. Les lignes des étudiants `exclus` (supprimés) sont ignorées.
+
+    Retourne (ajoutées, modifiées, supprimées, ids des étudiants concernés).
+    """
+    a_creer, a_modifier, vues, touches = [], [], set(), set()
+    for etudiant_data in data['etudiants']:
+        etudiant = etudiants[etudiant_data['matricule']]
+        for ligne_data in etudiant_data.get(cle_lignes, []):
+            cible = cibles.get(ligne_data[cle_code])
+            if cible is None:
+                continue
+            cle = (etudiant.pk, cible.pk)
+            vues.add(cle)
+            ligne = existantes.get(cle)
+            if ligne is None:
+                ligne = modele(etudiant=etudiant, **{champ_cible: cible})
+                _appliquer(ligne, ligne_data, champs)
+                a_creer.append(ligne)
+            elif _appliquer(ligne, ligne_data, champs):
+                a_modifier.append(ligne)
+            else:
+                continue
+            touches.add(etudiant.pk)
+
+    a_supprimer = []
+    for (etudiant_id, cible_id), ligne in existantes.items():
+        if (etudiant_id, cible_id) not in vues and etudiant_id not in exclus:
+            a_supprimer.append(ligne.pk)
+            touches.add(etudiant_id)
+
+    if a_supprimer:
+        modele.objects.filter(pk__in=a_supprimer).delete()
+    modele.objects.bulk_create(a_creer, batch_size=batch_size)
+    modele.objects.bulk_update(a_modifier, champs, batch_size=batch_size)
+    return len(a_creer), len(a_modifier), len(a_supprimer), touches
+
+
+def reimporter(pv, data, batch_size=None):
+    """
+    Applique au PV `pv` les différences avec `data` (sortie du parser pour une
+    feuille). La structure UE/ECUE doit être identique.
+
+    Les résultats (moyenne, crédits, décision) sont ceux du fichier ; ils ne
+    sont recalculés que pour les étudiants dont le fichier ne les donne pas et
+    dont les notes ont changé. S'il y a eu au moins une modification, les
+    caches du PV sont invalidés et ses statistiques recalculées. Retourne le
+    résumé des modifications.
+    """
+    batch_size = batch_size or getattr(settings, 'PV_IMPORT_BATCH_SIZE', 500)
+    diff = DiffPV()
+
+    with transaction.atomic():
+        ues = {ue.code: ue for ue in pv.ues.all()}
+        ecues = {ecue.code: ecue for ecue in ECUE.objects.filter(ue__pv=pv)}
+        codes_ecue = {e['code'] for e in data['ecues'] if not e.get('is_synthese', False)}
+        codes_ue = {ue['code'] for ue in data['ues']}
+        if codes_ecue != set(ecues) or codes_ue != set(ues):
+            raise ValueError(
+                "La structure UE/ECUE du fichier diffère de celle du PV : utilisez un import complet"
+            )
+
+        etudiants = {etudiant.matricule: etudiant for etudiant in pv.etudiants.all()}
+        notes = {(n.etudiant_id, n.ecue_id): n for n in Note.objects.filter(etudiant__pv=pv)}
+        syntheses = {(s.etudiant_id, s.ue_id): s for s in SyntheseUE.objects.filter(etudiant__pv=pv)}
+
+        # Étudiants : rapprochement par matricule
+        etudiants_modifies, nouveaux = [], []
+        calcules = set()  # matricules dont les résultats ne sont pas dans le fichier
+        for etudiant_data in data['etudiants']:
+            matricule = etudiant_data['matricule']
+            a_calculer = (etudiant_data.get('moyenne_generale') is None
+                          or etudiant_data.get('decision_generale') is None)
+            if a_calculer:
+                calcules.add(matricule)
+            champs = CHAMPS_ETUDIANT[:2] if a_calculer else CHAMPS_ETUDIANT
+
+            etudiant = etudiants.get(matricule)
+            if etudiant is None:
+                etudiant = Etudiant(pv=pv, matricule=matricule)
+                _appliquer(etudiant, etudiant_data, CHAMPS_ETUDIANT)
+                etudiants[matricule] = etudiant
+                nouveaux.append(etudiant)
+            elif _appliquer(etudiant, etudiant_data, champs):
+                etudiants_modifies.append(etudiant)
+
+        matricules_fichier = {e['matricule'] for e in data['etudiants']}
+        supprimes = [e.pk for matricule, e in etudiants.items() if e.pk and matricule not in matricules_fichier]
+        if supprimes:
+            Etudiant.objects.filter(pk__in=supprimes).delete()
+        Etudiant.objects.bulk_create(nouveaux, batch_size=batch_size)
+        Etudiant.objects.bulk_update(etudiants_modifies, CHAMPS_ETUDIANT, batch_size=batch_size)
+        diff.compteurs['etudiants'].update(
+            ajoutes=len(nouveaux), modifies=len(etudiants_modifies), supprimes=len(supprimes)
+        )
+
+        # Notes et synthèses : rapprochement par (étudiant, code ECUE / code UE)
+        exclus = set(supprimes)
+        *compteurs, touches = _diff_lignes(
+            data, etudiants, notes, ecues, 'notes', 'ecue_code', 'ecue', Note, CHAMPS_NOTE, exclus, batch_size
+        )
+        diff.compteurs['notes'].update(zip(('ajoutes', 'modifies', 'supprimes'), compteurs))
+        *compteurs, _ = _diff_lignes(
+            data, etudiants, syntheses, ues, 'syntheses_ue', 'ue_code', 'ue', SyntheseUE, CHAMPS_SYNTHESE,
+            exclus, batch_size
+        )
+        diff.compteurs['syntheses'].update(zip(('ajoutes', 'modifies', 'supprimes'), compteurs))
+
+        # Résultats : seulement les étudiants sans résultats dans le fichier dont les notes ont changé
+        a_recalculer = [etudiants[matricule] for matricule in calcules if etudiants[matricule].pk in touches]
+        if a_recalculer:
+            mettre_a_jour_resultats_pv(pv, etudiants=a_recalculer, batch_size=batch_size, statistiques=False)
+        diff.resultats_recalcules = len(a_recalculer)
+
+        if diff.lignes:
+            invalider_caches_pv(pv)
+            rafraichir_statistiques_pv(pv)
+
+    return diff.resume()
@@ -0,0 +1,99 @@
+"""
+Calcul des résultats (moyenne générale, crédits acquis, décision) pour tous
+les étudiants d'un PV à la fois
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+
+from ..models import ECUE, Etudiant, Note
+from .cache_pv import invalider_caches_pv
+from .statistiques import rafraichir_statistiques_pv
+
+
+def credits_totaux_semestre(pv):
+    """Somme des crédits des ECUE du PV"""
+    return ECUE.objects.filter(ue__pv=pv).aggregate(total=Sum('credits'))['total'] or 0
+
+
+def resultats_etudiant(notes, credits_totaux):
+    """
+    Applique les règles de Etudiant.mettre_a_jour_resultats() à une liste de
+    notes (moyenne, crédits de l'ECUE, décision) :
+    - moyenne générale pondérée par les crédits des ECUE notées, None sans note
+    - crédits acquis : ECUE avec moyenne >= 10 ou décision V/VC
+    - décision : V (moyenne >= 10 et tous les crédits), VC (moyenne >= 10 et
+      crédits partiels), NV (moyenne < 10), None sans moyenne
+    Retourne (moyenne_generale, credits_acquis, decision_generale).
+    """
+    somme_ponderee = Decimal('0')
+    credits_notes = 0
+    credits_acquis = 0
+
+    for moyenne, credits, decision in notes:
+        if moyenne is not None and credits:
+            somme_ponderee += moyenne * credits
+            credits_notes += credits
+        if (moyenne is not None and moyenne >= 10) or decision in ('V', 'VC'):
+            credits_acquis += credits or 0
+
+    moyenne_generale = round(somme_ponderee / credits_notes, 2) if credits_notes else None
+
+    if moyenne_generale is None:
+        decision_generale = None
+    elif moyenne_generale >= Decimal('10'):
+        decision_generale = 'V' if credits_acquis >= credits_totaux else 'VC'
+    else:
+        decision_generale = 'NV'
+
+    return moyenne_generale, credits_acquis, decision_generale
+
+
+def mettre_a_jour_resultats_pv(pv, etudiants=None, notes_par_etudiant=None, credits_totaux=None,
+                               batch_size=None, statistiques=True):
+    """
+    Recalcule et enregistre les résultats de plusieurs étudiants d'un PV.
+
+    - etudiants : étudiants à mettre à jour (par défaut tous ceux du PV)
+    - notes_par_etudiant : {etudiant.pk: [(moyenne, crédits ECUE, décision), ...]}
+      déjà en mémoire (import) ; à défaut, les notes sont lues en une requête
+    - credits_totaux : crédits du semestre, lus en base à défaut
+    - statistiques : invalider ensuite les caches du PV et recalculer ses
+      statistiques (False quand l'appelant s'en charge lui-même, après
+      d'autres écritures)
+
+    Les résultats sont écrits avec bulk_update. Retourne la liste des étudiants.
+    """
+    if etudiants is None:
+        etudiants = list(pv.etudiants.all())
+    if not etudiants:
+        return etudiants
+
+    if credits_totaux is None:
+        credits_totaux = credits_totaux_semestre(pv)
+
+    if notes_par_etudiant is None:
+        notes_par_etudiant = defaultdict(list)
+        notes = Note.objects.filter(etudiant__in=[etudiant.pk for etudiant in etudiants]) \
+            .values_list('etudiant_id', 'moyenne', 'ecue__credits', 'decision')
+        for etudiant_id, moyenne, credits, decision in notes:
+            notes_par_etudiant[etudiant_id].append((moyenne, credits, decision))
+
+    for etudiant in etudiants:
+        (
+            etudiant.moyenne_generale,
+            etudiant.credits_acquis,
+            etudiant.decision_generale,
+        ) = resultats_etudiant(notes_par_etudiant.get(etudiant.pk, ()), credits_totaux)
+
+    Etudiant.objects.bulk_update(
+        etudiants,
+        ['moyenne_generale', 'credits_acquis', 'decision_generale'],
+        batch_size=batch_size or getattr(settings, 'PV_IMPORT_BATCH_SIZE', 500)
+    )
+    if statistiques:
+        invalider_caches_pv(pv)
+        rafraichir_statistiques_pv(pv)
+    return etudiants
@@ -0,0 +1,69 @@
+"""
+Statistiques enregistrées par PV (StatistiquesPV)
+
+Les effectifs par décision, le taux de réussite, les moyennes extrêmes et la
+répartition des moyennes générales sont calculés en une seule requête
+d'agrégation, à l'import, au réimport et au recalcul des résultats. Les
+listes de PV les lisent ensuite avec select_related('statistiques') au lieu
+de compter les étudiants de chaque PV.
+"""
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+
+from ..models import Etudiant, StatistiquesPV
+
+
+# Tranches d'un point de moyenne générale : [0, 1[, [1, 2[, ..., [19, 20]
+TRANCHES = 20
+
+
+def calculer_statistiques(pv):
+    """Statistiques des étudiants d'un PV, en une requête"""
+    tranches = {
+        f'tranche_{k}': Count('pk', filter=Q(
+            moyenne_generale__gte=k,
+            **({'moyenne_generale__lt': k + 1} if k < TRANCHES - 1 else {})
+        ))
+        for k in range(TRANCHES)
+    }
+    agregats = Etudiant.objects.filter(pv=pv).aggregate(
+        nombre_etudiants=Count('pk'),
+        nombre_valides=Count('pk', filter=Q(decision_generale='V')),
+        nombre_non_valides=Count('pk', filter=Q(decision_generale='NV')),
+        nombre_valides_compensation=Count('pk', filter=Q(decision_generale='VC')),
+        moyenne_min=Min('moyenne_generale'),
+        moyenne_max=Max('moyenne_generale'),
+        moyenne_moyenne=Avg('moyenne_generale'),
+        **tranches
+    )
+
+    total = agregats['nombre_etudiants']
+    reussite = agregats['nombre_valides'] + agregats['nombre_valides_compensation']
+    agregats['taux_reussite'] = round(Decimal(reussite * 100) / total, 2) if total else Decimal('0')
+    if agregats['moyenne_moyenne'] is not None:
+        agregats['moyenne_moyenne'] = round(Decimal(agregats['moyenne_moyenne']), 2)
+    agregats['repartition'] = [agregats.pop(f'tranche_{k}') for k in range(TRANCHES)]
+    return agregats
+
+
+def rafraichir_statistiques_pv(pv):
+    """Recalcule et enregistre les statistiques d'un PV ; retourne le StatistiquesPV"""
+    valeurs = dict(calculer_statistiques(pv), version_donnees=pv.version_donnees, date_calcul=timezone.now())
+    statistiques = StatistiquesPV(pv=pv, **valeurs)
+    if not StatistiquesPV.objects.filter(pv=pv).update(**valeurs):
+        statistiques.save(force_insert=True)
+    pv.statistiques = statistiques
+    return statistiques
+
+
+def statistiques_pv(pv):
+    """Statistiques enregistrées du PV, recalculées si absentes ou périmées"""
+    try:
+        statistiques = pv.statistiques
+    except StatistiquesPV.DoesNotExist:
+        statistiques = None
+    if statistiques is None or statistiques.version_donnees != pv.version_donnees:
+        statistiques = rafraichir_statistiques_pv(pv)
+    return statistiques
@@ -0,0 +1,137 @@
+"""
+Statistiques par ECUE et par UE d'un PV (effectifs par décision, moyenne,
+médiane et écart-type des notes, histogramme des moyennes)
+
+Les notes du PV sont lues en une requête (values_list) puis agrégées en une
+passe vectorisée avec pandas. Le résultat est mis en cache sous une clé
+propre à la version des données du PV (voir pv.utils.cache_pv) : il est
+recalculé après un réimport, sans invalider les autres PV.
+"""
+import math
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import ECUE, Note, SyntheseUE
+from .cache_pv import cle_cache
+from .statistiques import TRANCHES
+
+
+DECISIONS = ['V', 'VC', 'NV']
+BORNES = list(range(TRANCHES)) + [math.inf]
+
+
+def _nombre(valeur, chiffres=2):
+    """Valeur JSON : arrondie, None pour NaN"""
+    if valeur is None or pd.isna(valeur):
+        return None
+    return round(float(valeur), chiffres)
+
+
+def _descriptif(groupes, colonne):
+    """{id: {effectif, moyenne, mediane, ecart_type, min, max}} d'une colonne, par groupe"""
+    agregats = groupes[colonne].agg(['count', 'mean', 'median', 'min', 'max'])
+    agregats['ecart_type'] = groupes[colonne].std(ddof=0)
+    return {
+        cle: {
+            'effectif': int(ligne['count']),
+            'moyenne': _nombre(ligne['mean']),
+            'mediane': _nombre(ligne['median']),
+            'ecart_type': _nombre(ligne['ecart_type']),
+            'min': _nombre(ligne['min']),
+            'max': _nombre(ligne['max']),
+        }
+        for cle, ligne in agregats.iterrows()
+    }
+
+
+def _decisions(df, cle):
+    """{id: {'V': n, 'VC': n, 'NV': n, 'aucune': n}}"""
+    comptes = df.groupby([cle, df['decision'].fillna('aucune')]).size().unstack(fill_value=0)
+    return {
+        identifiant: {decision: int(ligne.get(decision, 0)) for decision in DECISIONS + ['aucune']}
+        for identifiant, ligne in comptes.iterrows()
+    }
+
+
+def _histogrammes(df, cle, colonne):
+    """{id: [effectif par tranche d'un point]}, de [0, 1[ à [19, 20]"""
+    tranches = pd.cut(df[colonne], bins=BORNES, right=False, labels=False)
+    comptes = df.assign(tranche=tranches).dropna(subset=['tranche']) \
+        .groupby([cle, 'tranche']).size().unstack(fill_value=0)
+    return {
+        identifiant: [int(ligne.get(k, 0)) for k in range(TRANCHES)]
+        for identifiant, ligne in comptes.iterrows()
+    }
+
+
+def _agreger(df, cle, colonnes, colonne_histogramme):
+    """Statistiques de chaque groupe de `df` (une ligne par note ou synthèse)"""
+    if df.empty:
+        return {}
+    for colonne in colonnes:
+        df[colonne] = pd.to_numeric(df[colonne], errors='coerce').astype(float)
+    groupes = df.groupby(cle)
+    descriptifs = {colonne: _descriptif(groupes, colonne) for colonne in colonnes}
+    decisions = _decisions(df, cle)
+    histogrammes = _histogrammes(df, cle, colonne_histogramme)
+
+    resultats = {}
+    for identifiant, effectif in groupes.size().items():
+        comptes = decisions.get(identifiant, {})
+        decides = sum(comptes.get(decision, 0) for decision in DECISIONS)
+        resultats[identifiant] = {
+            'effectif': int(effectif),
+            'decisions': comptes,
+            'taux_reussite': _nombre(
+                (comptes.get('V', 0) + comptes.get('VC', 0)) * 100 / decides if decides else None
+            ),
+            **{colonne: descriptifs[colonne].get(identifiant) for colonne in colonnes},
+            'histogramme': histogrammes.get(identifiant, [0] * TRANCHES),
+        }
+    return resultats
+
+
+def calculer_statistiques_ecues(pv):
+    """Statistiques de toutes les ECUE et UE du PV (3 requêtes, une passe pandas)"""
+    ecues = list(ECUE.objects.filter(ue__pv=pv).select_related('ue').order_by('ue__ordre', 'ordre'))
+    ues = list(pv.ues.order_by('ordre'))
+
+    notes = pd.DataFrame.from_records(
+        Note.objects.filter(etudiant__pv=pv).values_list('ecue_id', 'cc', 'examen', 'moyenne', 'decision'),
+        columns=['ecue_id', 'cc', 'examen', 'moyenne', 'decision']
+    )
+    syntheses = pd.DataFrame.from_records(
+        SyntheseUE.objects.filter(etudiant__pv=pv).values_list('ue_id', 'moyenne_ue', 'decision'),
+        columns=['ue_id', 'moyenne_ue', 'decision']
+    )
+    par_ecue = _agreger(notes, 'ecue_id', ['cc', 'examen', 'moyenne'], 'moyenne')
+    par_ue = _agreger(syntheses, 'ue_id', ['moyenne_ue'], 'moyenne_ue')
+
+    vide = {'effectif': 0, 'decisions': dict.fromkeys(DECISIONS + ['aucune'], 0), 'taux_reussite': None,
+            'histogramme': [0] * TRANCHES}
+    return {
+        'pv': pv.pk,
+        'version': pv.version_donnees,
+        'tranches': [[k, k + 1] for k in range(TRANCHES)],
+        'ecues': [
+            {'code': ecue.code, 'intitule': ecue.intitule, 'ue': ecue.ue.code, 'credits': ecue.credits,
+             **par_ecue.get(ecue.pk, dict(vide, cc=None, examen=None, moyenne=None))}
+            for ecue in ecues
+        ],
+        'ues': [
+            {'code': ue.code, 'intitule': ue.intitule, **par_ue.get(ue.pk, dict(vide, moyenne_ue=None))}
+            for ue in ues
+        ],
+    }
+
+
+def statistiques_ecues(pv):
+    """Statistiques par ECUE et UE du PV, depuis le cache si la version des données n'a pas changé"""
+    cle = cle_cache(pv, 'statistiques_ecues')
+    statistiques = cache.get(cle)
+    if statistiques is None:
+        statistiques = calculer_statistiques_ecues(pv)
+        cache.set(cle, statistiques, getattr(settings, 'PV_CACHE_TIMEOUT', 24 * 60 * 60))
+    return statistiques
@@ -0,0 +1,109 @@
+"""
+Styles nommés et écriture par lignes des exports Excel
+
+Chaque style est enregistré une fois par classeur (NamedStyle) puis
+référencé par son nom sur les cellules : le classeur ne contient qu'une
+entrée de style par nom, au lieu d'une police, d'un remplissage, d'une
+bordure et d'un alignement assignés cellule par cellule.
+
+FeuilleExport écrit une feuille de classeur write-only ligne par ligne :
+une ligne reçoit ses valeurs et un style (le même pour toutes ses
+cellules) ou un tuple de styles par colonne, comme LIGNE_EMARGEMENT.
+"""
+
+from openpyxl.cell import Cell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+
+BORDURE = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+CENTRE = Alignment(horizontal='center', vertical='center', wrap_text=True)
+GAUCHE = Alignment(horizontal='left', vertical='center')
+
+
+def _fond(couleur):
+    return PatternFill(start_color=couleur, end_color=couleur, fill_type='solid')
+
+
+# nom -> attributs du NamedStyle
+STYLES = {
+    # Export détaillé du PV
+    'pv_entete_bleu': dict(font=Font(bold=True, color='FFFFFF'), fill=_fond('0066CC'), border=BORDURE,
+                           alignment=CENTRE),
+    'pv_entete_info': dict(font=Font(bold=True, color='FFFFFF'), fill=_fond('17A2B8'), border=BORDURE,
+                           alignment=CENTRE),
+    'pv_entete_orange': dict(font=Font(bold=True, color='000000'), fill=_fond('FFC107'), border=BORDURE,
+                             alignment=CENTRE),
+    'pv_entete_vert': dict(font=Font(bold=True, color='FFFFFF'), fill=_fond('28A745'), border=BORDURE,
+                           alignment=CENTRE),
+    'pv_centre': dict(alignment=CENTRE),
+
+    # Feuilles d'émargement
+    'pv_titre': dict(font=Font(bold=True, size=14), alignment=CENTRE),
+    'pv_sous_titre': dict(font=Font(bold=True, size=12), alignment=CENTRE),
+    'pv_info_gras': dict(font=Font(bold=True, size=11), alignment=GAUCHE),
+    'pv_info': dict(font=Font(size=10), alignment=GAUCHE),
+    'pv_info_centre': dict(font=Font(size=10), alignment=CENTRE),
+    'pv_entete_gris': dict(font=Font(bold=True, size=11), fill=_fond('D3D3D3'), border=BORDURE, alignment=CENTRE),
+    'pv_cellule_centre': dict(border=BORDURE, alignment=CENTRE),
+    'pv_cellule': dict(border=BORDURE, alignment=GAUCHE),
+}
+
+# Ligne d'émargement : N°, matricule, noms et prénoms, signature
+LIGNE_EMARGEMENT = ('pv_cellule_centre', 'pv_cellule_centre', 'pv_cellule', 'pv_cellule')
+
+
+def enregistrer_styles(wb):
+    """Enregistre les styles nommés dans le classeur (un NamedStyle neuf par classeur)"""
+    for nom, attributs in STYLES.items():
+        if nom not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=nom, **attributs))
+
+
+class FeuilleExport:
+    """
+    Feuille d'un classeur write-only écrite ligne par ligne. Les fusions et
+    les hauteurs sont déclarées au fil des lignes, les largeurs à la création.
+    """
+
+    def __init__(self, wb, titre, largeurs=()):
+        enregistrer_styles(wb)
+        self.ws = wb.create_sheet(titre)
+        self.ligne = 0
+        # Tableau de style (StyleArray) de chaque style nommé, copié sur les cellules
+        self._styles = {style.name: style.as_tuple() for style in wb._named_styles}
+        for colonne, largeur in enumerate(largeurs, start=1):
+            self.ws.column_dimensions[get_column_letter(colonne)].width = largeur
+
+    def cellule(self, valeur=None, style=None):
+        """Cellule write-only ; `style` : nom d'un style nommé enregistré"""
+        return Cell(self.ws, row=1, column=1, value=valeur,
+                    style_array=self._styles[style] if style else None)
+
+    def ajouter(self, cellules=()):
+        """Ajoute une ligne de cellules (ou de valeurs brutes) ; retourne son numéro"""
+        self.ws.append(list(cellules))
+        self.ligne += 1
+        return self.ligne
+
+    def ecrire(self, valeurs, style=None, hauteur=None, fusion=None):
+        """
+        Ajoute une ligne de valeurs. `style` : nom d'un style pour toutes les
+        cellules, ou tuple d'un style par colonne. `fusion` : nombre de
+        colonnes fusionnées à partir de la première. Retourne le numéro de ligne.
+        """
+        styles = style if isinstance(style, tuple) else (style,) * len(valeurs)
+        numero = self.ligne + 1
+        if hauteur:
+            self.ws.row_dimensions[numero].height = hauteur
+        if fusion:
+            self.fusionner(numero, 1, numero, fusion)
+        return self.ajouter(self.cellule(valeur, nom) for valeur, nom in zip(valeurs, styles))
+
+    def vide(self, nombre=1):
+        for _ in range(nombre):
+            self.ajouter()
+
+    def fusionner(self, ligne, colonne, ligne_fin, colonne_fin):
+        self.ws.merged_cells.add(CellRange(min_row=ligne, min_col=colonne, max_row=ligne_fin, max_col=colonne_fin))
@@ -0,0 +1,177 @@
+"""
+Tableau détaillé du dashboard : modèle de colonnes et matrice des cellules
+
+Le modèle de colonnes (UE -> ECUE affichées -> colspan) est construit une
+fois par requête, en deux requêtes quel que soit le nombre d'UE et d'ECUE.
+Les trois lignes d'en-tête et les cellules de chaque étudiant de la page
+sont calculées ici, en listes à plat : dashboard.html n'a plus qu'à les
+parcourir, sans accès aux relations ni requêtes.
+
+Par ECUE : 8 colonnes (espace, CC, EX, MOY, espace, CA, espace, DEC) ; par
+UE : 7 colonnes de synthèse (espace, MOY, espace, CRED, espace, DEC, espace).
+"""
+from django.db.models import Prefetch
+from django.template.defaultfilters import floatformat
+
+from ..models import ECUE, Note, SyntheseUE
+
+
+COLONNES_PAR_ECUE = 8
+COLONNES_SYNTHESE_UE = 7
+COLONNES_FIXES = 3  # N°, matricule, noms et prénoms
+COLONNES_SYNTHESE_GENERALE = 3
+
+ESPACE = 'col-spacer-excel'
+ESPACE_UE = 'col-spacer-excel bg-warning bg-opacity-10'
+FOND_UE = 'bg-warning bg-opacity-25'
+
+DETAILS_ECUE = [
+    {'classe': ESPACE, 'libelle': ''},
+    {'classe': 'text-center small col-cc', 'libelle': 'CC'},
+    {'classe': 'text-center small col-ex', 'libelle': 'EX'},
+    {'classe': 'text-center small col-moy', 'libelle': 'MOY'},
+    {'classe': ESPACE, 'libelle': ''},
+    {'classe': 'text-center small col-ca', 'libelle': 'CA'},
+    {'classe': ESPACE, 'libelle': ''},
+    {'classe': 'text-center small col-dec', 'libelle': 'DEC'},
+]
+DETAILS_SYNTHESE_UE = [
+    {'classe': 'col-spacer-excel bg-warning bg-opacity-25', 'libelle': ''},
+    {'classe': 'text-center small bg-warning bg-opacity-50', 'libelle': 'MOY'},
+    {'classe': 'col-spacer-excel bg-warning bg-opacity-25', 'libelle': ''},
+    {'classe': 'text-center small bg-warning bg-opacity-50', 'libelle': 'CRED'},
+    {'classe': 'col-spacer-excel bg-warning bg-opacity-25', 'libelle': ''},
+    {'classe': 'text-center small bg-warning bg-opacity-50', 'libelle': 'DEC'},
+    {'classe': 'col-spacer-excel bg-warning bg-opacity-25', 'libelle': ''},
+]
+
+
+class ColonnesTableau:
+    """
+    Colonnes du tableau détaillé : UE affichées (toutes, celle du filtre `ue`,
+    ou celles des ECUE filtrées) et, pour chacune, ses ECUE affichées.
+    """
+
+    def __init__(self, pv, codes_ecue=(), ue=''):
+        ecues = ECUE.objects.filter(ue__pv=pv).order_by('ordre')
+        ues = pv.ues.order_by('ordre')
+        if codes_ecue:
+            ecues = ecues.filter(code__in=codes_ecue)
+            ues = ues.filter(ecues__code__in=codes_ecue).distinct()
+        elif ue:
+            ues = ues.filter(code=ue)
+        self.ues = list(ues.prefetch_related(Prefetch('ecues', queryset=ecues, to_attr='ecues_affichees')))
+        self.ecues = [ecue for ue in self.ues for ecue in ue.ecues_affichees]
+
+    @property
+    def ligne_ue(self):
+        """Ligne 1 des en-têtes : une cellule par UE"""
+        return [
+            {'ue': ue, 'colspan': len(ue.ecues_affichees) * COLONNES_PAR_ECUE + COLONNES_SYNTHESE_UE}
+            for ue in self.ues
+        ]
+
+    @property
+    def ligne_ecue(self):
+        """Ligne 2 des en-têtes : une cellule par ECUE, puis la synthèse de chaque UE"""
+        ligne = []
+        for ue in self.ues:
+            ligne += [{'ecue': ecue, 'colspan': COLONNES_PAR_ECUE} for ecue in ue.ecues_affichees]
+            ligne.append({'ue': ue, 'colspan': COLONNES_SYNTHESE_UE})
+        return ligne
+
+    @property
+    def ligne_details(self):
+        """Ligne 3 des en-têtes : libellé de chaque colonne"""
+        ligne = []
+        for ue in self.ues:
+            ligne += DETAILS_ECUE * len(ue.ecues_affichees) + DETAILS_SYNTHESE_UE
+        return ligne
+
+    @property
+    def total_colonnes(self):
+        return (COLONNES_FIXES + COLONNES_SYNTHESE_GENERALE
+                + sum(colonne['colspan'] for colonne in self.ligne_ue))
+
+
+def prefetch_tableau(etudiants):
+    """Précharge les notes et synthèses des étudiants (deux requêtes par page)"""
+    return etudiants.prefetch_related(
+        Prefetch('notes', queryset=Note.objects.only(
+            'etudiant_id', 'ecue_id', 'cc', 'examen', 'moyenne', 'credit_attribue', 'decision')),
+        Prefetch('syntheses_ue', queryset=SyntheseUE.objects.only(
+            'etudiant_id', 'ue_id', 'moyenne_ue', 'credits_attribues', 'decision')),
+    )
+
+
+# Une note, un crédit ou une moyenne nuls (0) ne sont ni affichés ni colorés,
+# comme une valeur absente
+def _nombre(valeur):
+    return floatformat(valeur, 2) if valeur else None
+
+
+def _couleur(valeur, valide, non_valide):
+    if not valeur:
+        return ''
+    return valide if valeur >= 10 else non_valide
+
+
+def _cellule(classe, valeur=None, badge=''):
+    return {'classe': classe, 'valeur': valeur, 'badge': badge}
+
+
+def cellules_note(note):
+    """Les 8 cellules d'une ECUE (note absente : cellules vides)"""
+    if note is None:
+        return [_cellule(ESPACE if k in (0, 4, 6) else 'text-center small') for k in range(COLONNES_PAR_ECUE)]
+    fond = ('bg-success bg-opacity-10', 'bg-danger bg-opacity-10')
+    return [
+        _cellule(ESPACE),
+        _cellule(f"text-center small {_couleur(note.cc, *fond)}", _nombre(note.cc)),
+        _cellule(f"text-center small {_couleur(note.examen, *fond)}", _nombre(note.examen)),
+        _cellule(f"text-center fw-bold small {_couleur(note.moyenne, 'text-success', 'text-danger')}",
+                 _nombre(note.moyenne)),
+        _cellule(ESPACE),
+        _cellule('text-center small', note.credit_attribue or None),
+        _cellule(ESPACE),
+        _cellule('text-center small', note.decision, note.get_decision_badge_class() if note.decision else ''),
+    ]
+
+
+def cellules_synthese(synthese):
+    """Les 7 cellules de synthèse d'une UE"""
+    if synthese is None:
+        return [_cellule(ESPACE_UE if k % 2 == 0 else f'text-center small {FOND_UE}')
+                for k in range(COLONNES_SYNTHESE_UE)]
+    return [
+        _cellule(ESPACE_UE),
+        _cellule(
+            f"text-center fw-bold small {FOND_UE} "
+            f"{_couleur(synthese.moyenne_ue, 'text-success', 'text-danger')}",
+            _nombre(synthese.moyenne_ue)
+        ),
+        _cellule(ESPACE_UE),
+        _cellule(f'text-center small {FOND_UE}', synthese.credits_attribues or None),
+        _cellule(ESPACE_UE),
+        _cellule(f'text-center small {FOND_UE}', synthese.decision,
+                 synthese.get_decision_badge_class() if synthese.decision else ''),
+        _cellule(ESPACE_UE),
+    ]
+
+
+def lignes_tableau(etudiants, colonnes):
+    """
+    Matrice de la page : pour chaque étudiant (notes et synthèses
+    préchargées par prefetch_tableau), ses cellules dans l'ordre des colonnes
+    """
+    lignes = []
+    for etudiant in etudiants:
+        notes = {note.ecue_id: note for note in etudiant.notes.all()}
+        syntheses = {synthese.ue_id: synthese for synthese in etudiant.syntheses_ue.all()}
+        cellules = []
+        for ue in colonnes.ues:
+            for ecue in ue.ecues_affichees:
+                cellules += cellules_note(notes.get(ecue.pk))
+            cellules += cellules_synthese(syntheses.get(ue.pk))
+        lignes.append({'etudiant': etudiant, 'cellules': cellules})
+    return lignes
@@ -0,0 +1,377 @@
+"""
+Exécution des imports de PV hors de la requête HTTP
+
+Le mode est choisi par le réglage PV_IMPORT_MODE :
+- 'thread' : la tâche est confiée à un pool de threads du processus web
+  (PV_IMPORT_WORKERS threads) dès la validation de la transaction ;
+- 'file' : la tâche reste en attente en base et est traitée par la commande
+  `python manage.py traiter_imports` ;
+- 'sync' : la tâche est exécutée immédiatement, dans la requête (tests,
+  développement).
+
+Les tâches créées ensemble (archive ZIP, dossier) sont soumises en un lot
+avec soumettre_lot : parse en parallèle dans un pool de processus, écriture
+en base par un seul thread.
+
+Les lignes écrites le sont dans la transaction de l'import, invisible des
+autres connexions jusqu'à sa validation : leur nombre est publié dans le
+cache 'imports' (sur disque, partagé par les processus web et
+`traiter_imports`, voir CACHES). Le processus qui exécute une tâche y publie
+aussi un battement toutes les PV_IMPORT_BATTEMENT secondes ; une tâche en
+cours sans battement depuis PV_IMPORT_DELAI_REPRISE (processus arrêté pendant
+l'import) est remise en attente par reprendre_taches_bloquees, appelée par
+`traiter_imports`, qui traite aussi les tâches en attente soumises à un pool
+de threads disparu.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import TacheImport
+from .excel_parser import PVExcelParser
+from .importer import PVImporter
+from .empreintes import FichierEmpreinte, ecrire_cache, lire_cache, pvs_existants
+from .lot import parser_avec_cache
+from .reimport import choisir_feuille, reimporter
+
+
+logger = logging.getLogger(__name__)
+
+DUREE_PROGRESSION = 60 * 60  # durée de vie (s) de la progression et des battements dans le cache
+
+_verrou = threading.Lock()
+_executeur = None
+
+
+def _pool():
+    global _executeur
+    with _verrou:
+        if _executeur is None:
+            _executeur = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PV_IMPORT_WORKERS', 2),
+                thread_name_prefix='import-pv'
+            )
+        return _executeur
+
+
+def _executer_dans_thread(tache_id):
+    try:
+        executer_import(tache_id)
+    finally:
+        close_old_connections()
+
+
+def soumettre_import(tache):
+    """Lance (ou met en file) l'import d'une tâche qui vient d'être créée"""
+    mode = getattr(settings, 'PV_IMPORT_MODE', 'thread')
+    if mode == 'sync':
+        executer_import(tache.pk)
+        tache.refresh_from_db()
+    elif mode == 'thread':
+        # Le thread utilise sa propre connexion : la tâche doit être validée en base
+        transaction.on_commit(lambda: _pool().submit(_executer_dans_thread, tache.pk))
+
+
+def creer_tache(fichier, nom_fichier=None, pv_cible=None):
+    """
+    Enregistre un fichier envoyé dans une nouvelle TacheImport, en calculant
+    son empreinte SHA-256 pendant l'écriture.
+
+    Avec `pv_cible`, la tâche est un réimport : le fichier corrigé est appliqué
+    à ce PV (voir pv.utils.reimport) au lieu de créer de nouveaux PV.
+
+    Retourne (tache, pvs_existants) : si des PV ont déjà été importés depuis un
+    fichier identique (ou, pour un réimport, si le PV cible en provient déjà),
+    le fichier n'est pas conservé, aucune tâche n'est créée (tache vaut None)
+    et ces PV sont retournés. Si un fichier identique attend ou est en cours
+    d'import (même PV cible), aucune tâche n'est créée non plus : la tâche
+    existante est retournée, à suivre à la place d'une nouvelle.
+    """
+    nom_fichier = nom_fichier or os.path.basename(fichier.name)
+    contenu = FichierEmpreinte(fichier)
+    tache = TacheImport(nom_fichier=nom_fichier, pv_cible=pv_cible)
+    tache.fichier.save(nom_fichier, contenu, save=False)
+    tache.empreinte_sha256 = contenu.empreinte
+
+    if pv_cible is not None:
+        existants = [pv_cible] if pv_cible.empreinte_sha256 == tache.empreinte_sha256 else []
+    else:
+        existants = pvs_existants(tache.empreinte_sha256)
+    if existants:
+        tache.fichier.delete(save=False)
+        return None, existants
+
+    en_cours = TacheImport.objects.filter(
+        empreinte_sha256=tache.empreinte_sha256, pv_cible=pv_cible,
+        statut__in=[TacheImport.EN_ATTENTE, TacheImport.EN_COURS],
+    ).order_by('pk').first()
+    if en_cours is not None:
+        tache.fichier.delete(save=False)
+        return en_cours, []
+
+    tache.save()
+    return tache, []
+
+
+def prendre_tache(tache_id):
+    """
+    Réserve une tâche en attente (une seule exécution même avec plusieurs
+    workers). Retourne True si la tâche a été réservée.
+    """
+    return TacheImport.objects.filter(pk=tache_id, statut=TacheImport.EN_ATTENTE).update(
+        statut=TacheImport.EN_COURS, date_debut=timezone.now()
+    ) == 1
+
+
+def prochaine_tache():
+    """Réserve la plus ancienne tâche en attente et retourne son id (ou None)"""
+    ids = TacheImport.objects.filter(statut=TacheImport.EN_ATTENTE) \
+        .order_by('date_creation').values_list('pk', flat=True)
+    for tache_id in ids[:10]:
+        if prendre_tache(tache_id):
+            return tache_id
+    return None
+
+
+def _cache():
+    """Cache partagé entre processus de la progression et des battements des tâches"""
+    return caches['imports'] if 'imports' in settings.CACHES else caches['default']
+
+
+def _cle_progression(tache_id):
+    return f"import:{tache_id}:lignes_ecrites"
+
+
+def _cle_battement(tache_id):
+    return f"import:{tache_id}:battement"
+
+
+class _Battements:
+    """
+    Publie l'heure courante pour chaque tâche de `tache_ids`, à l'entrée puis
+    toutes les PV_IMPORT_BATTEMENT secondes depuis un thread, jusqu'à la sortie
+    du bloc `with`
+    """
+
+    def __init__(self, tache_ids):
+        self.tache_ids = list(tache_ids)
+        self.intervalle = getattr(settings, 'PV_IMPORT_BATTEMENT', 30)
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._battre, name='import-pv-battement', daemon=True)
+
+    def _publier(self):
+        _cache().set_many({_cle_battement(pk): time.time() for pk in self.tache_ids}, DUREE_PROGRESSION)
+
+    def _battre(self):
+        while not self._arret.wait(self.intervalle):
+            self._publier()
+
+    def __enter__(self):
+        self._publier()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._arret.set()
+        self._thread.join()
+        _cache().delete_many([_cle_battement(pk) for pk in self.tache_ids])
+
+
+def reprendre_taches_bloquees(delai=None):
+    """
+    Remet en attente les tâches en cours depuis plus de `delai` secondes
+    (PV_IMPORT_DELAI_REPRISE par défaut) dont le processus n'a publié aucun
+    battement depuis `delai` secondes : l'import, transactionnel, n'a rien
+    laissé en base. Retourne le nombre de tâches reprises.
+    """
+    delai = getattr(settings, 'PV_IMPORT_DELAI_REPRISE', 30 * 60) if delai is None else delai
+    en_cours = TacheImport.objects.filter(
+        statut=TacheImport.EN_COURS, date_debut__lt=timezone.now() - timedelta(seconds=delai)
+    )
+    ids = list(en_cours.values_list('pk', flat=True))
+    battements = _cache().get_many([_cle_battement(pk) for pk in ids])
+    ids = [pk for pk in ids if battements.get(_cle_battement(pk), 0) < time.time() - delai]
+    if not ids:
+        return 0
+
+    reprises = en_cours.filter(pk__in=ids).update(
+        statut=TacheImport.EN_ATTENTE, date_debut=None, lignes_lues=0, lignes_ecrites=0, lignes_a_ecrire=0
+    )
+    _cache().delete_many([_cle_progression(pk) for pk in ids])
+    if reprises:
+        logger.warning("%d tâche(s) d'import bloquée(s) remise(s) en attente", reprises)
+    return reprises
+
+
+def _suivi(tache_id):
+    """Fonctions de progression (lignes lues, lignes écrites) d'une tâche"""
+    taches = TacheImport.objects.filter(pk=tache_id)
+
+    def lignes_lues(nombre):
+        taches.update(lignes_lues=nombre)
+
+    def lignes_ecrites(nombre):
+        _cache().set(_cle_progression(tache_id), nombre, DUREE_PROGRESSION)
+
+    return lignes_lues, lignes_ecrites
+
+
+def _reimporter(tache, feuilles):
+    """Applique le fichier d'une tâche de réimport à son PV cible"""
+    pv = tache.pv_cible
+    data = choisir_feuille(pv, feuilles)
+    TacheImport.objects.filter(pk=tache.pk).update(lignes_lues=len(data['etudiants']))
+
+    with transaction.atomic():
+        resume = reimporter(pv, data)
+        pv.fichier = tache.fichier.name
+        pv.empreinte_sha256 = tache.empreinte_sha256
+        pv.save(update_fields=['fichier', 'empreinte_sha256'])
+        tache.pvs.set([pv])
+        TacheImport.objects.filter(pk=tache.pk).update(
+            statut=TacheImport.TERMINE, resume=resume, lignes_ecrites=resume['lignes'],
+            lignes_a_ecrire=resume['lignes'], date_fin=timezone.now()
+        )
+
+
+def _ecrire(tache, feuilles, importer, lignes_ecrites):
+    """Écrit en base les PV parsés d'une tâche (un par feuille) et la marque terminée"""
+    if tache.pv_cible_id:
+        _reimporter(tache, feuilles)
+        return
+
+    taches = TacheImport.objects.filter(pk=tache.pk)
+    etudiants = [e for _, data in feuilles for e in data['etudiants']]
+    a_ecrire = sum(1 + len(e['notes']) + len(e['syntheses_ue']) for e in etudiants)
+    taches.update(lignes_lues=len(etudiants), lignes_a_ecrire=a_ecrire)
+
+    pvs = importer.importer_classeur(
+        feuilles, tache.fichier.name, tache.empreinte_sha256, progression=lignes_ecrites
+    )
+
+    tache.pvs.set(pvs)
+    taches.update(statut=TacheImport.TERMINE, lignes_ecrites=a_ecrire, date_fin=timezone.now())
+
+
+def _echec(tache, erreur):
+    TacheImport.objects.filter(pk=tache.pk).update(
+        statut=TacheImport.ECHEC, erreur=erreur, date_fin=timezone.now()
+    )
+
+
+def executer_import(tache_id, reservee=False):
+    """
+    Parse le fichier de la tâche puis l'écrit en base, en mettant à jour la
+    progression. Les erreurs sont enregistrées sur la tâche (statut ECHEC).
+    """
+    if not reservee and not prendre_tache(tache_id):
+        return
+    tache = TacheImport.objects.get(pk=tache_id)
+    lignes_lues, lignes_ecrites = _suivi(tache_id)
+
+    try:
+        with _Battements([tache_id]):
+            importer = PVImporter()
+            with importer.phase('lecture'):
+                feuilles = lire_cache(tache.empreinte_sha256)
+                if feuilles is None:
+                    parser = PVExcelParser(tache.fichier.path)
+                    parser.TAILLE_BLOC = 100  # progression plus fine, sans effet sur le résultat
+                    feuilles = parser.parse_classeur(progression=lignes_lues)
+                    ecrire_cache(tache.empreinte_sha256, feuilles)
+            _ecrire(tache, feuilles, importer, lignes_ecrites)
+    except Exception as e:
+        logger.exception("Échec de l'import %s (%s)", tache_id, tache.nom_fichier)
+        _echec(tache, str(e))
+    finally:
+        _cache().delete(_cle_progression(tache_id))
+
+
+def executer_lot(tache_ids, processus=None):
+    """
+    Importe plusieurs tâches en un lot : les fichiers absents du cache de
+    parse sont parsés en parallèle dans un pool de processus (voir
+    pv.utils.lot), puis tous sont écrits en base un par un, au fil des parses
+    terminés, par le thread appelant.
+    """
+    taches = {
+        tache.fichier.path: tache
+        for tache in TacheImport.objects.filter(pk__in=[pk for pk in tache_ids if prendre_tache(pk)])
+    }
+    if not taches:
+        return
+
+    with _Battements([tache.pk for tache in taches.values()]):
+        for chemin, feuilles, erreur, lecture in parser_avec_cache(
+                {chemin: tache.empreinte_sha256 for chemin, tache in taches.items()}, processus):
+            tache = taches[chemin]
+            if feuilles is None:
+                logger.error("Échec de la lecture de %s : %s", tache.nom_fichier, erreur)
+                _echec(tache, erreur)
+                continue
+
+            importer = PVImporter()
+            importer.timings['lecture'] = lecture
+            try:
+                _ecrire(tache, feuilles, importer, _suivi(tache.pk)[1])
+            except Exception as e:
+                logger.exception("Échec de l'import %s (%s)", tache.pk, tache.nom_fichier)
+                _echec(tache, str(e))
+            finally:
+                _cache().delete(_cle_progression(tache.pk))
+
+
+def _executer_lot_dans_thread(tache_ids):
+    try:
+        executer_lot(tache_ids)
+    finally:
+        close_old_connections()
+
+
+def soumettre_lot(taches):
+    """Équivalent de soumettre_import pour un lot de tâches créées ensemble"""
+    mode = getattr(settings, 'PV_IMPORT_MODE', 'thread')
+    tache_ids = [tache.pk for tache in taches]
+    if mode == 'sync':
+        executer_lot(tache_ids)
+        for tache in taches:
+            tache.refresh_from_db()
+    elif mode == 'thread':
+        transaction.on_commit(lambda: _pool().submit(_executer_lot_dans_thread, tache_ids))
+
+
+def etat_import(tache):
+    """
+    État d'une tâche pour l'endpoint JSON de suivi. `url_suite` est la page à
+    ouvrir une fois l'import terminé : le dashboard du PV, ou l'accueil si le
+    classeur contenait plusieurs PV.
+    """
+    pvs = [
+        {'id': pv.pk, 'feuille': pv.nom_feuille, 'url': reverse('pv:dashboard', args=[pv.pk])}
+        for pv in tache.pvs.order_by('pk')
+    ] if tache.statut == TacheImport.TERMINE else []
+    etat = {
+        'id': tache.pk,
+        'fichier': tache.nom_fichier,
+        'statut': tache.statut,
+        'statut_display': tache.get_statut_display(),
+        'lignes_lues': tache.lignes_lues,
+        'lignes_ecrites': tache.lignes_ecrites,
+        'lignes_a_ecrire': tache.lignes_a_ecrire,
+        'erreur': tache.erreur,
+        'resume': tache.resume,
+        'pvs': pvs,
+        'url_suite': (pvs[0]['url'] if len(pvs) == 1 else reverse('pv:home')) if pvs else None,
+    }
+    if tache.statut == TacheImport.EN_COURS:
+        etat['lignes_ecrites'] = _cache().get(_cle_progression(tache.pk), tache.lignes_ecrites)
+    return etat
@@ -123,6 +123,81 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Import des PV : taille des lots d'insertions groupées (bulk_create)
+PV_IMPORT_BATCH_SIZE = 500
+
+# Exécution des imports hors requête : 'thread' (pool de threads du serveur web),
+# 'file' (file d'attente en base traitée par `manage.py traiter_imports`) ou 'sync'
+PV_IMPORT_MODE = 'thread'
+PV_IMPORT_WORKERS = 2
+# Durée (s) sans battement au-delà de laquelle `traiter_imports` remet en
+# attente une tâche restée en cours (processus arrêté pendant l'import), et
+# intervalle (s) des battements publiés par le processus qui l'exécute
+PV_IMPORT_DELAI_REPRISE = 30 * 60
+PV_IMPORT_BATTEMENT = 30
+# Processus de parse pour les imports par lot (None : nombre de CPU)
+PV_IMPORT_PROCESSUS = None
+# Limites d'extraction des archives ZIP d'un lot (tailles décompressées) :
+# par classeur (comme l'import d'un fichier seul), pour l'archive, nombre de classeurs
+PV_LOT_TAILLE_FICHIER_MAX = 10 * 1024 * 1024
+PV_LOT_TAILLE_TOTALE_MAX = 200 * 1024 * 1024
+PV_LOT_FICHIERS_MAX = 100
+
+# Cache disque des résultats du parser, par empreinte SHA-256 du fichier
+PV_PARSE_CACHE_DIR = BASE_DIR / 'cache' / 'parse'
+
+# Cache des calculs par PV (statistiques...), clés versionnées par PV
+# (voir pv.utils.cache_pv). En production avec plusieurs processus, préférer
+# un cache partagé (Redis, Memcached, base de données).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pv',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Progression et battements des tâches d'import (voir pv.utils.taches) :
+    # partagés par les processus web et `traiter_imports` d'un même serveur.
+    # Pas de cache en base : écrit pendant la transaction de l'import.
+    'imports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'imports',
+    },
+}
+PV_CACHE_TIMEOUT = 24 * 60 * 60
+# Sélections d'étudiants filtrées gardées en mémoire (cache LRU par processus)
+PV_FILTRES_CACHE_TAILLE = 128
+# Taille de page maximale du dashboard (paramètre per_page)
+PV_PAGE_TAILLE_MAX = 100
+# Cache disque des exports Excel, sous MEDIA_ROOT (voir pv.utils.cache_exports) :
+# une entrée par PV, version des données et paramètres, supprimée au-delà de
+# l'âge maximal, ou (les moins récemment servies) de la taille totale maximale
+PV_EXPORT_CACHE_DIR = 'exports'
+PV_EXPORT_CACHE_TAILLE_MAX = 500 * 1024 * 1024
+PV_EXPORT_CACHE_AGE_MAX = 7 * 24 * 60 * 60
+
+# Journalise la durée de chaque phase de chaque import (logger pv.utils.importer)
+PV_IMPORT_JOURNAL_DUREES = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'pv': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        # Durées par import, émises seulement avec PV_IMPORT_JOURNAL_DUREES
+        'pv.utils.importer': {
+            'level': 'INFO',
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 